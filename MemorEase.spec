@@ -22,12 +22,31 @@ a = Analysis(
     hiddenimports=[
         'sort_tools',
         'mtp_tools',
+        'device_monitor',
+        'inotify_tools',
+        'pipeline',
+        'scheduler',
+        'metrics',
+        'profiler',
+        'config',
+        'catalog',
+        'dedup',
+        'media_formats',
+        'watcher',
+        'journal',
+        'merkle',
+        'hamming',
+        'video_fingerprint',
         'backup',
+        'transfer',
+        'progress',
         'spinner_widget',
+        'log_sink',
         'requests',
         'CTkMessagebox',
         'update_maker',
         'utils',
+        'startup_bench',
         'shutil',
         'subprocess',
     ],
@@ -1,142 +1,360 @@
 import os
-import shutil
-import hashlib
+from transfer import copy_file, configured_writeback, TransferCancelled
+from metrics import NULL_METRICS
+from utils import get_hash_service
+from catalog import get_catalog
+from config import get_config
+from journal import get_journal
+import merkle
 
-def md5sum(path, block_size=65536):
-    h = hashlib.md5()
-    with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(block_size), b''):
-            h.update(chunk)
-    return h.hexdigest()
+# Paires source / backup hachées d'avance sur le pool du service de hachage
+PREFETCH_PAIRS = 8
+
+
+def _inside(path, directories):
+    """path est-il situé sous l'un des dossiers de directories ?"""
+    parent = os.path.dirname(path)
+    while parent and parent not in directories:
+        if parent == os.path.dirname(parent):
+            return False
+        parent = os.path.dirname(parent)
+    return bool(parent)
+
+
+def _walk_files(top, skip=()):
+    """(chemin relatif, chemin) des fichiers sous top, sans descendre dans les dossiers relatifs de skip."""
+    for root, dirs, files in os.walk(top):
+        if skip:
+            dirs[:] = [d for d in dirs if os.path.relpath(os.path.join(root, d), top) not in skip]
+        for f in files:
+            path = os.path.join(root, f)
+            yield os.path.relpath(path, top), path
 
 def run_backup(photo_src, video_src, backup_dest,
                log_callback=None, progress_callback=None, cancel_flag=None,
-               backup_photos=True, backup_videos=True):
+               backup_photos=True, backup_videos=True, transfer_callback=None,
+               metrics=NULL_METRICS, incremental=True, streaming=None):
+    """
+    Copie miroir des photos / vidéos vers backup_dest/MemorEase_backup. Retourne (succès, faits, total).
+    Avec le journal des changements (journal.py) tenu sans interruption depuis le dernier backup
+    complet vers cette destination, seuls les chemins notés sont traités, sans parcourir les
+    arborescences. Sans journal, les dossiers dont l'empreinte (merkle.py) n'a pas changé depuis
+    le dernier backup sont sautés d'un bloc. Un backup complet imposé par le journal (surveillance
+    interrompue, réconciliation périodique...) ne saute aucun dossier : un fichier modifié sur place
+    dans le backup ne change pas le mtime de son dossier et ne serait jamais réparé.
+    incremental=False force la comparaison de tous les fichiers.
+    Un fichier déjà présent est comparé par taille puis condensat ; un condensat du cache (même
+    taille et même mtime depuis son calcul) est cru sans relire le fichier, si bien qu'une altération
+    du contenu dans le backup (secteur défectueux, modification qui garde le mtime) passe inaperçue.
+    incremental=False et la réconciliation périodique du journal (journal.full_every_days) relisent
+    aussi les deux côtés pour la vérifier.
+    streaming : copies en mode flux (transfer.Writeback), None = valeur de config.json (transfer.streaming).
+    """
 
-    def count_files(path):
-        total = 0
-        for _, _, files in os.walk(path):
-            total += len(files)
-        return total
+    def count_files(path, skip=()):
+        with metrics.timer("walk"):
+            return sum(1 for _ in _walk_files(path, skip))
 
     base_dest = os.path.join(backup_dest, "MemorEase_backup")
     photos_dst = os.path.join(base_dest, "Photos")
     videos_dst = os.path.join(base_dest, "Videos")
 
-    src_count = (count_files(photo_src) if backup_photos else 0) \
-              + (count_files(video_src) if backup_videos else 0)
-    dst_count = (count_files(photos_dst) if backup_photos and os.path.isdir(photos_dst) else 0) \
-              + (count_files(videos_dst) if backup_videos and os.path.isdir(videos_dst) else 0)
-    total = src_count + dst_count
+    config = get_config().journal
+    journal = get_journal() if config.enabled else None
+    trees, source_trees = merkle.backup_store(backup_dest), merkle.source_store()
+
+    def plan(label, src_root, dst_root):
+        """
+        (session, numéro du journal, chemins notés, saut des dossiers inchangés permis, condensats
+        relus) ; chemins à None pour un parcours complet.
+        """
+        if journal is None:
+            return None, 0, None, incremental, not incremental
+        verify = not incremental
+        if incremental and os.path.isdir(src_root):
+            found, reason = journal.plan(src_root, dst_root, config.full_every_days)
+            if found:
+                return found + (False, False)
+            verify = journal.full_due(src_root, dst_root, config.full_every_days)
+            if log_callback:
+                log_callback(f"[INFO] {label} : backup complet, {reason}"
+                             f"{', condensats relus des deux côtés' if verify else ''}.")
+        # Relevé pris avant le parcours : un changement pendant le backup reste au journal
+        session, upto = journal.snapshot(src_root)
+        return session, upto, None, False, verify
+
+    def survey(label, src_root, dst_root, prune):
+        """
+        Empreintes des dossiers de la source et, si prune, dossiers inchangés depuis le dernier
+        backup (sautés).
+        """
+        with metrics.timer("walk"):
+            tree = merkle.scan(src_root)
+        if not prune:
+            return tree, set()
+        with metrics.timer("stat"):
+            stored = trees.load(os.path.basename(dst_root), dst_root)
+        skip = set(merkle.unchanged_subtrees(tree, stored))
+        if skip:
+            metrics.count("dossiers inchangés", len(skip))
+            if log_callback:
+                names = sorted(skip)
+                shown = ", ".join(names[:5]) + (f"... (+{len(names) - 5})" if len(names) > 5 else "")
+                log_callback(f"[INFO] {label} : aucun changement depuis le dernier backup."
+                             if "" in skip else
+                             f"[INFO] {label} : {len(names)} dossier(s) inchangé(s) depuis le dernier backup, "
+                             f"non comparés ({shown}).")
+        return tree, skip
+
+    roots = []
+    for enabled, label, src_root, dst_root in ((backup_photos, "Photos", photo_src, photos_dst),
+                                               (backup_videos, "Vidéos", video_src, videos_dst)):
+        if enabled:
+            session, upto, paths, prune, verify = plan(label, src_root, dst_root)
+            tree, skip = survey(label, src_root, dst_root, prune) if paths is None else ({}, set())
+            roots.append((label, src_root, dst_root, session, upto, paths, tree, skip, verify))
+
+    total = 0
+    for _, src_root, dst_root, _, _, paths, _, skip, _ in roots:
+        if paths is not None:
+            total += len(paths)
+        elif "" not in skip:
+            total += count_files(src_root, skip) + (count_files(dst_root, skip) if os.path.isdir(dst_root) else 0)
     done = 0
+    problems = 0                # suppressions refusées : le backup n'est pas un miroir exact
 
     if progress_callback:
         progress_callback(0, total)
 
     # Largeur fixe pour aligner les colonnes
     name_col_width = 50
+    hashes = get_hash_service()
+    writeback = configured_writeback(streaming)
+    catalog = get_catalog()
 
-    def mirror(src_root, dst_root):
+    def report(step=1):
         nonlocal done
+        done += step
+        if progress_callback:
+            progress_callback(done, total)
+
+    def stopped():
+        if cancel_flag and cancel_flag.cancelled:
+            if log_callback:
+                log_callback("[STOP] Le backup a été interrompu par l'utilisateur.")
+            return True
+        return False
 
-        src_files = {}
-        for root, _, files in os.walk(src_root):
-            for f in files:
-                rel = os.path.relpath(os.path.join(root, f), src_root)
-                src_files[rel] = os.path.join(root, f)
+    def unchanged(rel, src_path, dst_path, digests):
+        """Fichier déjà identique dans le backup (taille puis condensat) : noté comme sauvegardé et ignoré."""
+        src_digest, dst_digest = digests
+        try:
+            with metrics.timer("stat", files=2):
+                src_size, dst_size = os.path.getsize(src_path), os.path.getsize(dst_path)
+            same = src_size == dst_size
+            if same:
+                with metrics.timer("hash", files=2, nbytes=src_size + dst_size):
+                    same = src_digest.result() == dst_digest.result()
+        except FileNotFoundError:
+            same = False
+        if same:
+            catalog.mark_backed_up(src_path, dst_path, digest=src_digest.result(), digest_algo=hashes.algo)
+            metrics.count("ignorés")
+            report(2)
+            if log_callback:
+                log_callback(f"[IGNORÉ]\t{rel.ljust(name_col_width)}\t déjà présent")
+        return same
 
-        dst_files = {}
-        if os.path.isdir(dst_root):
-            for root, _, files in os.walk(dst_root):
-                for f in files:
-                    rel = os.path.relpath(os.path.join(root, f), dst_root)
-                    dst_files[rel] = os.path.join(root, f)
+    def copy(rel, src_path, dst_path):
+        """Copie (ou remplace) le fichier dans le backup. Retourne False si le backup a été interrompu."""
+        on_bytes = None
+        if transfer_callback:
+            on_bytes = lambda c, t, r, e, name=rel: transfer_callback(name, c, t, r, e)
+        try:
+            src_stat = os.stat(src_path)
+            with metrics.timer("copy", files=1, nbytes=src_stat.st_size):
+                digest = copy_file(src_path, dst_path, cancel_flag=cancel_flag, progress_callback=on_bytes,
+                                   hash_algo=hashes.algo, writeback=writeback)
+            # Condensat obtenu pendant la copie : le prochain backup n'aura rien à relire
+            hashes.remember(dst_path, digest)
+            hashes.remember(src_path, digest, before=src_stat)
+            catalog.mark_backed_up(src_path, dst_path, digest=digest, digest_algo=hashes.algo)
+            metrics.count("copiés")
+        except TransferCancelled:
+            if log_callback:
+                log_callback(f"[STOP]\t{rel.ljust(name_col_width)}\tcopie interrompue, fichier partiel supprimé")
+                log_callback("[STOP] Le backup a été interrompu par l'utilisateur.")
+            return False
+        report()
+        if log_callback:
+            log_callback(f"[COPIÉ]\t{rel.ljust(name_col_width)}")
+        return True
 
+    def delete(rel, dst_path):
+        nonlocal problems
+        try:
+            with metrics.timer("delete", files=1):
+                os.chmod(dst_path, 0o666)
+                os.remove(dst_path)
+            metrics.count("supprimés")
+            report()
+            if log_callback:
+                log_callback(f"[SUPPRIMÉ]\t{rel.ljust(name_col_width)}\t absent du dossier source")
+        except PermissionError:
+            problems += 1
+            report()
+            if log_callback:
+                log_callback(f"[WARN]\t{rel.ljust(name_col_width)}\tLe fichier n'a pas pu être supprimé (accès refusé)")
+        except Exception as e:
+            problems += 1
+            report()
+            if log_callback:
+                log_callback(f"[WARN]\t{rel.ljust(name_col_width)}\tLe fichier n'a pas pu être supprimé ({type(e).__name__}: {e})")
+
+    def mirror(src_root, dst_root, partial=False, skip=(), verify=False):
+        """
+        Copie miroir de src_root vers dst_root, sans descendre dans les dossiers relatifs de skip.
+        partial : sous-dossier noté au journal, compté dans total après le parcours et vidé dans
+        le backup même si la source est vide.
+        verify : condensats relus des deux côtés, cache ignoré.
+        """
+        nonlocal total, problems
+
+        with metrics.timer("walk"):
+            src_files = dict(_walk_files(src_root, skip))
+            dst_files = dict(_walk_files(dst_root, skip)) if os.path.isdir(dst_root) else {}
+
+        if partial:
+            # L'entrée du journal comptait pour un
+            total += len(src_files) + len(dst_files) - 1
+            if not src_files and not dst_files:
+                report()
         os.makedirs(dst_root, exist_ok=True)
 
+        # Les fichiers présents des deux côtés sont comparés par condensat : on les hache
+        # en avance (cache d'abord, puis pool de threads) pendant que la boucle avance
+        pending = iter([rel for rel in src_files if rel in dst_files])
+        futures = {}
+
+        def prefetch():
+            while len(futures) < PREFETCH_PAIRS:
+                rel = next(pending, None)
+                if rel is None:
+                    return
+                futures[rel] = (hashes.submit(src_files[rel], refresh=verify),
+                                hashes.submit(dst_files[rel], refresh=verify))
+
         for rel, src_path in src_files.items():
-            if cancel_flag and cancel_flag.cancelled:
-                if log_callback:
-                    log_callback("[STOP] Le backup a été interrompu par l'utilisateur.")
+            if stopped():
                 return False
 
             dst_path = os.path.join(dst_root, rel)
             os.makedirs(os.path.dirname(dst_path), exist_ok=True)
 
             if rel in dst_files:
-                try:
-                    same = md5sum(src_path) == md5sum(dst_path)
-                except FileNotFoundError:
-                    same = False
-                if same:
-                    done += 2
-                    if progress_callback:
-                        progress_callback(done, total)
-                    if log_callback:
-                        log_callback(f"[IGNORÉ]\t{rel.ljust(name_col_width)}\t déjà présent")
+                prefetch()
+                if unchanged(rel, src_path, dst_path, futures.pop(rel)):
                     continue
 
-            shutil.copy2(src_path, dst_path)
-            done += 1
-            if progress_callback:
-                progress_callback(done, total)
-            if log_callback:
-                log_callback(f"[COPIÉ]\t{rel.ljust(name_col_width)}")
+            if not copy(rel, src_path, dst_path):
+                return False
 
         to_delete = [rel for rel in dst_files if rel not in src_files]
         if to_delete:
-            if not src_files:
+            if not src_files and not partial:
                 if log_callback:
                     log_callback(f"[WARN] Dossier source vide ou introuvable ({src_root}). "
                                  f"Suppression des {len(to_delete)} fichier(s) du backup annulée par sécurité.")
-                done += len(to_delete)
-                if progress_callback:
-                    progress_callback(done, total)
+                problems += 1
+                report(len(to_delete))
                 return True
             if log_callback:
                 log_callback(f"[INFO] {len(to_delete)} fichier(s) absent(s) de la source vont être supprimés du backup.")
 
         for rel, dst_path in dst_files.items():
-            if cancel_flag and cancel_flag.cancelled:
-                if log_callback:
-                    log_callback("[STOP] Le backup a été interrompu par l'utilisateur.")
+            if stopped():
                 return False
             if rel not in src_files:
-                try:
-                    os.chmod(dst_path, 0o666)
-                    os.remove(dst_path)
-                    done += 1
-                    if progress_callback:
-                        progress_callback(done, total)
-                    if log_callback:
-                        log_callback(f"[SUPPRIMÉ]\t{rel.ljust(name_col_width)}\t absent du dossier source")
-                except PermissionError:
-                    done += 1
-                    if progress_callback:
-                        progress_callback(done, total)
-                    if log_callback:
-                        log_callback(f"[WARN]\t{rel.ljust(name_col_width)}\tLe fichier n'a pas pu être supprimé (accès refusé)")
-                except Exception as e:
-                    done += 1
-                    if progress_callback:
-                        progress_callback(done, total)
-                    if log_callback:
-                        log_callback(f"[WARN]\t{rel.ljust(name_col_width)}\tLe fichier n'a pas pu être supprimé ({type(e).__name__}: {e})")
+                delete(rel, dst_path)
         return True
 
+    def sync_changes(src_root, dst_root, paths):
+        """
+        Backup incrémental : seuls les chemins notés au journal sont traités. Un dossier noté
+        (créé, déplacé, supprimé) est repris en entier par mirror(), ses descendants avec lui.
+        """
+        nonlocal total
+        covered = set()
+        for path in paths:
+            if stopped():
+                return False
+            if _inside(path, covered):
+                report()
+                continue
+            rel = os.path.relpath(path, src_root)
+            dst_path = os.path.join(dst_root, rel)
+            if os.path.isdir(path) and not os.path.islink(path):
+                covered.add(path)
+                if not mirror(path, dst_path, partial=True):
+                    return False
+            elif os.path.isfile(path):
+                os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+                if os.path.isfile(dst_path):
+                    total += 1          # paire source / backup : deux fichiers comptés
+                    if unchanged(rel, path, dst_path, (hashes.submit(path), hashes.submit(dst_path))):
+                        continue
+                    total -= 1
+                if not copy(rel, path, dst_path):
+                    return False
+            elif os.path.isdir(dst_path) and not os.path.islink(dst_path):
+                # Dossier disparu de la source : ses fichiers sont supprimés du backup
+                covered.add(path)
+                removed = [os.path.join(root, f) for root, _, files in os.walk(dst_path) for f in files]
+                total += len(removed) - 1
+                if not removed:
+                    report()
+                for file_path in removed:
+                    if stopped():
+                        return False
+                    delete(os.path.relpath(file_path, dst_root), file_path)
+            elif os.path.lexists(dst_path):
+                delete(rel, dst_path)
+            else:
+                report()            # créé puis supprimé entre deux backups : rien à faire
+        return True
 
+    def settle():
+        """Attend les dernières écritures du mode flux : le backup n'est enregistré qu'une fois sur le disque."""
+        if writeback:
+            with metrics.timer("sync"):
+                writeback.close()
 
-    ok1 = True
-    if backup_photos:
-        ok1 = mirror(photo_src, photos_dst)
-        if not ok1:
-            return False, done, total
-
-    ok2 = True
-    if backup_videos:
-        ok2 = mirror(video_src, videos_dst)
-        if not ok2:
+    for label, src_root, dst_root, session, upto, paths, tree, skip, verify in roots:
+        if paths is None:
+            before = problems
+            ok = "" in skip or mirror(src_root, dst_root, skip=skip, verify=verify)
+            settle()
+            if ok and journal is not None:
+                journal.advance(src_root, dst_root, session, upto, full=True)
+            # Backup conforme à la source : ses empreintes deviennent la référence des deux côtés
+            if ok and problems == before and "" not in skip:
+                trees.save(os.path.basename(dst_root), tree, dst_root)
+                source_trees.save(os.path.abspath(src_root), tree, src_root)
+            elif problems != before:
+                trees.clear(os.path.basename(dst_root))
+        else:
+            metrics.count("chemins du journal", len(paths))
+            if log_callback:
+                log_callback(f"[INFO] {label} : backup incrémental, {len(paths)} chemin(s) noté(s) au journal."
+                             if paths else f"[INFO] {label} : aucun changement noté au journal depuis le dernier backup.")
+            ok = sync_changes(src_root, dst_root, paths)
+            settle()
+            if ok:
+                journal.advance(src_root, dst_root, session, upto)
+        hashes.flush()
+        catalog.flush()
+        if not ok:
             return False, done, total
 
-    success = ok1 and ok2 and not (cancel_flag and cancel_flag.cancelled)
-    return success, done, total
\ No newline at end of file
+    success = not (cancel_flag and cancel_flag.cancelled)
+    return success, done, total
@@ -0,0 +1,179 @@
+"""
+Générateur déterministe de bibliothèques de médias synthétiques pour les benchmarks.
+
+Pour une graine et une taille données, produit toujours les mêmes fichiers :
+- JPEG avec date EXIF (DateTimeOriginal), sous des noms de style appareil photo, Pixel, Samsung ou WhatsApp ;
+- quasi-doublons : même image tournée de 90° ou ré-encodée en qualité inférieure ;
+- PNG sans EXIF ;
+- MP4 minimaux mais valides (ftyp + moov/mvhd avec date de création + mdat) ;
+- quelques fichiers sans date exploitable.
+Le tout peut être placé dans un faux arbre GVFS (mtp:host=.../Internal storage/DCIM/Camera).
+"""
+import io
+import os
+import random
+import struct
+from datetime import datetime, timedelta
+from PIL import Image                   # pyright: ignore[reportMissingImports]
+
+EXIF_IFD = 0x8769
+TAG_DATETIME = 0x0132
+TAG_DATETIME_ORIGINAL = 0x9003
+
+# Secondes entre 1904-01-01 (origine des dates MP4) et 1970-01-01
+MP4_EPOCH_OFFSET = 2082844800
+
+IMAGE_SIZE = (640, 480)
+VIDEO_PAYLOAD = (64 * 1024, 512 * 1024)
+
+# Répartition du corpus (fractions du nombre total de fichiers)
+MIX = {
+    "jpeg": 0.55,
+    "near_duplicate": 0.15,
+    "png": 0.08,
+    "video": 0.17,
+    "undated": 0.05,
+}
+
+
+def _photo_name(rng, dt, index):
+    style = rng.choice(("camera", "pixel", "samsung", "whatsapp"))
+    if style == "camera":
+        return f"IMG_{dt:%Y%m%d_%H%M%S}.jpg"
+    if style == "pixel":
+        return f"PXL_{dt:%Y%m%d_%H%M%S}{rng.randrange(1000):03d}.jpg"
+    if style == "samsung":
+        return f"{dt:%Y%m%d_%H%M%S}.jpg"
+    return f"IMG-{dt:%Y%m%d}-WA{index:04d}.jpg"
+
+
+def _video_name(rng, dt, index):
+    style = rng.choice(("camera", "pixel", "whatsapp"))
+    if style == "camera":
+        return f"VID_{dt:%Y%m%d_%H%M%S}.mp4"
+    if style == "pixel":
+        return f"PXL_{dt:%Y%m%d_%H%M%S}{rng.randrange(1000):03d}.mp4"
+    return f"VID-{dt:%Y%m%d}-WA{index:04d}.mp4"
+
+
+def make_image(rng):
+    """Image 640x480 à motif aléatoire (grille de blocs lissée + bruit), pHash distincts d'une image à l'autre."""
+    grid = Image.frombytes("RGB", (8, 6), bytes(rng.randrange(256) for _ in range(8 * 6 * 3)))
+    img = grid.resize(IMAGE_SIZE, Image.BICUBIC)
+    noise = Image.frombytes("L", (160, 120), bytes(rng.randrange(256) for _ in range(160 * 120)))
+    return Image.blend(img, noise.resize(IMAGE_SIZE).convert("RGB"), 0.08)
+
+
+def jpeg_bytes(img, dt=None, quality=90):
+    exif = Image.Exif()
+    if dt is not None:
+        stamp = dt.strftime("%Y:%m:%d %H:%M:%S")
+        exif[TAG_DATETIME] = stamp
+        exif.get_ifd(EXIF_IFD)[TAG_DATETIME_ORIGINAL] = stamp
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality, exif=exif.tobytes())
+    return out.getvalue()
+
+
+def png_bytes(img):
+    out = io.BytesIO()
+    img.save(out, "PNG")
+    return out.getvalue()
+
+
+def _box(kind, payload):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def mp4_bytes(rng, dt):
+    """MP4 minimal : ftyp, moov/mvhd (version 0, dates depuis 1904) et un mdat de données aléatoires."""
+    created = int(dt.timestamp()) + MP4_EPOCH_OFFSET
+    timescale, duration = 1000, rng.randrange(1000, 60000)
+    mvhd = struct.pack(
+        ">B3sIIII4s2s10s36s24sI",
+        0, b"\0\0\0", created, created, timescale, duration,
+        b"\x00\x01\x00\x00",            # vitesse 1.0
+        b"\x01\x00",                    # volume 1.0
+        b"\0" * 10,
+        struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000),
+        b"\0" * 24,
+        2,                              # next_track_ID
+    )
+    ftyp = _box(b"ftyp", b"isom" + struct.pack(">I", 512) + b"isomiso2mp41")
+    moov = _box(b"moov", _box(b"mvhd", mvhd))
+    mdat = _box(b"mdat", rng.randbytes(rng.randrange(*VIDEO_PAYLOAD)))
+    return ftyp + moov + mdat
+
+
+def _write(path, data, dt=None):
+    with open(path, "wb") as f:
+        f.write(data)
+    if dt is not None:
+        ts = dt.timestamp()
+        os.utime(path, (ts, ts))
+
+
+def generate(dest, count, seed=0):
+    """
+    Écrit `count` fichiers dans dest (créé si besoin) et retourne un manifeste :
+    {"files": [...], "bytes": n, "duplicates": [(copie, original), ...], "counts": {type: n}}.
+    """
+    rng = random.Random(seed)
+    os.makedirs(dest, exist_ok=True)
+    start = datetime(2019, 1, 1, 8, 0, 0)
+    manifest = {"files": [], "bytes": 0, "duplicates": [], "counts": {k: 0 for k in MIX}}
+    originals = []  # (nom, image) des JPEG, sources des quasi-doublons
+
+    kinds = []
+    for kind, share in MIX.items():
+        kinds += [kind] * round(count * share)
+    kinds = (kinds + ["jpeg"] * count)[:count]
+    rng.shuffle(kinds)
+
+    used = set()
+    for index, kind in enumerate(kinds):
+        dt = start + timedelta(seconds=rng.randrange(0, 5 * 365 * 86400))
+        if kind == "near_duplicate" and not originals:
+            kind = "jpeg"
+
+        if kind == "jpeg":
+            img = make_image(rng)
+            name, data = _photo_name(rng, dt, index), jpeg_bytes(img, dt)
+            originals.append((name, img, dt))
+        elif kind == "near_duplicate":
+            source, img, dt = rng.choice(originals)
+            if rng.random() < 0.5:
+                img = img.rotate(90, expand=True)
+            name = _photo_name(rng, dt + timedelta(seconds=1), index)
+            data = jpeg_bytes(img, dt, quality=rng.choice((60, 70, 80)))
+            manifest["duplicates"].append((name, source))
+        elif kind == "png":
+            name, data = f"Screenshot_{dt:%Y%m%d-%H%M%S}.png", png_bytes(make_image(rng))
+        elif kind == "video":
+            name, data = _video_name(rng, dt, index), mp4_bytes(rng, dt)
+        else:
+            name, data = f"photo_{rng.randrange(16 ** 6):06x}.jpg", jpeg_bytes(make_image(rng))
+
+        # Noms uniques (deux fichiers générés à la même seconde)
+        base, ext = os.path.splitext(name)
+        suffix = 1
+        while name in used:
+            name = f"{base}_{suffix}{ext}"
+            suffix += 1
+        used.add(name)
+
+        _write(os.path.join(dest, name), data, dt)
+        manifest["files"].append(name)
+        manifest["bytes"] += len(data)
+        manifest["counts"][kind] += 1
+    return manifest
+
+
+def make_fake_gvfs(root, count, seed=0, host="BenchPhone"):
+    """
+    Crée <root>/gvfs/mtp:host=<host>/Internal storage/DCIM/Camera rempli par generate().
+    Retourne (gvfs_base, dcim, manifeste) ; gvfs_base se passe à DeviceMonitor(gvfs_base=...).
+    """
+    gvfs_base = os.path.join(root, "gvfs")
+    dcim = os.path.join(gvfs_base, f"mtp:host={host}", "Internal storage", "DCIM", "Camera")
+    return gvfs_base, dcim, generate(dcim, count, seed)
@@ -0,0 +1,449 @@
+"""
+Benchmarks reproductibles des moteurs MemorEase, sans interface graphique.
+
+    python -m benchmarks.run                         # tailles 50 et 200, tous les bancs
+    python -m benchmarks.run --scales 100,1000 --only sort,backup
+    python -m benchmarks.run --baseline benchmarks/results/<ancien>.json
+
+Chaque banc part d'un corpus généré par benchmarks.corpus (même graine = mêmes fichiers) :
+- mtp    : run_mtp_download depuis un faux arbre GVFS vers un dossier vide ;
+- sort   : process_files_individually sur une copie du corpus, avec une fenêtre de comparaison
+           des photos de SORT_TIME_WINDOW secondes (full) puis sans fenêtre (no_window) : comparaisons
+           pHash évitées et doublons trouvés (rappel) sont relevés dans "dedup" ;
+- backup : run_backup à froid (destination vide), à chaud (10 % des fichiers manquants ou modifiés)
+           et sans changement (destination identique), en comparant tous les fichiers ; puis avec les
+           empreintes de dossiers, journal désactivé (tree_no_change, tree_one_year : une année de
+           photos modifiée) ;
+           puis avec le journal des changements tenu (journal_warm : 10 % des fichiers source
+           modifiés, journal_no_change) ;
+- io     : run_backup vers une destination vide, copie par défaut puis en mode flux (transfer.Writeback) :
+           débit, temps de l'os.sync() qui suit (données laissées sales dans le cache) et croissance
+           du cache de pages pendant la copie (Cached de /proc/meminfo, relevé toutes les 50 ms).
+Chaque banc part d'un cache de condensats, d'un catalogue, d'un journal et d'empreintes vides (dans le dossier
+de travail) ; les variantes suivantes réutilisent ceux remplis par cold, comme deux backups successifs.
+Les résultats (durées, débits, détail par étape de RunMetrics) sont écrits en JSON dans
+benchmarks/results/ ; --baseline compare avec un résultat précédent et échoue au-delà de --max-regression.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+from benchmarks.corpus import generate, make_fake_gvfs
+from metrics import RunMetrics
+from catalog import MediaCatalog, set_catalog
+from config import ConfigStore, set_store
+from journal import ChangeJournal, set_journal
+import merkle
+from utils import CancelFlag, DigestCache, HashService, set_hash_service
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BENCHES = ("mtp", "sort", "backup", "io")
+
+# Fenêtre de comparaison des photos du banc sort (dedup.time_window est à 0 par défaut)
+SORT_TIME_WINDOW = 120.0
+
+# En dessous, l'écart entre deux exécutions est surtout du bruit : pas de verdict de régression
+MIN_COMPARABLE_SECONDS = 0.05
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _tree_size(path):
+    files = total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            total += os.path.getsize(os.path.join(root, name))
+    return files, total
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def _meminfo(*keys):
+    """Valeurs (octets) de /proc/meminfo, None hors Linux."""
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            values = {line.split(":")[0]: int(line.split()[1]) * 1024 for line in f}
+    except (OSError, ValueError, IndexError):
+        return None
+    return tuple(values.get(key, 0) for key in keys)
+
+
+class CacheSampler(threading.Thread):
+    """Relève Cached toutes les `interval` secondes pendant un banc : valeur de départ et pic."""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.start_value = self.peak = (_meminfo("Cached") or (0,))[0]
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, (_meminfo("Cached") or (0,))[0])
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        cached, dirty = _meminfo("Cached", "Dirty") or (0, 0)
+        self.peak = max(self.peak, cached)
+        return {
+            "avant_mo": round(self.start_value / 1e6, 1),
+            "croissance_mo": round((cached - self.start_value) / 1e6, 1),
+            "pic_mo": round((self.peak - self.start_value) / 1e6, 1),
+            "sale_mo": round(dirty / 1e6, 1),
+        }
+
+
+def _fresh_hash_cache(work, bench):
+    """
+    Chaque banc part d'un cache de condensats, d'un catalogue, d'un journal et d'empreintes de
+    dossiers vides, propres au dossier de travail.
+    """
+    paths = [os.path.join(work, f"{name}_{bench}.sqlite") for name in ("digests", "catalog", "journal", "trees")]
+    for path in paths:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    set_hash_service(HashService(cache=DigestCache(paths[0])))
+    set_catalog(MediaCatalog(paths[1]))
+    set_journal(ChangeJournal(paths[2]))
+    merkle.SOURCE_TREES_FILE = paths[3]
+
+
+class LogCounter:
+    """log_callback qui ne garde que le nombre de lignes par code."""
+
+    def __init__(self):
+        self.counts = {}
+
+    def __call__(self, message):
+        code = message[1:message.find("]")] if message.startswith("[") else ""
+        self.counts[code] = self.counts.get(code, 0) + 1
+
+
+def _result(bench, variant, scale, seconds, files, nbytes, metrics, logs):
+    return {
+        "bench": bench,
+        "variant": variant,
+        "scale": scale,
+        "seconds": round(seconds, 4),
+        "files": files,
+        "bytes": nbytes,
+        "files_per_s": round(files / seconds, 1) if seconds else None,
+        "mb_per_s": round(nbytes / seconds / 1e6, 2) if seconds else None,
+        "stages": metrics.report()["stages"],
+        "logs": logs.counts,
+    }
+
+
+# --- Bancs ---
+def bench_mtp(work, scale, seed):
+    from device_monitor import DeviceMonitor
+    from mtp_tools import run_mtp_download
+
+    gvfs_base, dcim, _ = make_fake_gvfs(os.path.join(work, "device"), scale, seed)
+    files, nbytes = _tree_size(dcim)
+    monitor = DeviceMonitor(gvfs_base=gvfs_base, auto_mount=False)
+    monitor.start()
+    monitor.wait_ready(5)
+
+    save = os.path.join(work, "mtp_save")
+    shutil.rmtree(save, ignore_errors=True)
+    _fresh_hash_cache(work, "mtp")
+    metrics, logs = RunMetrics("bench_mtp"), LogCounter()
+    t = time.perf_counter()
+    run_mtp_download(save, os.path.join(work, "mtp_photos"), os.path.join(work, "mtp_videos"),
+                     log_callback=logs, progress_callback=_noop, cancel_flag=CancelFlag(),
+                     device_monitor=monitor, metrics=metrics)
+    seconds = time.perf_counter() - t
+    monitor.stop()
+    return [_result("mtp", "download", scale, seconds, files, nbytes, metrics, logs)]
+
+
+def bench_sort(work, scale, seed, corpus, manifest):
+    from sort_tools import process_files_individually
+
+    def run(variant, time_window):
+        save = os.path.join(work, "sort_save")
+        photos, videos = os.path.join(work, "photos"), os.path.join(work, "videos")
+        for path in (save, photos, videos):
+            shutil.rmtree(path, ignore_errors=True)
+        shutil.copytree(corpus, save)
+        files, nbytes = _tree_size(save)
+        _fresh_hash_cache(work, f"sort_{variant}")
+
+        metrics, logs = RunMetrics("bench_sort"), LogCounter()
+        t = time.perf_counter()
+        process_files_individually(save, photos, videos, log_callback=logs, progress_callback=_noop,
+                                   cancel_flag=CancelFlag(), metrics=metrics, time_window=time_window)
+        result = _result("sort", variant, scale, time.perf_counter() - t, files, nbytes, metrics, logs)
+        counters = metrics.report()["counters"]
+        result["dedup"] = {
+            "time_window": time_window,
+            "comparaisons": counters.get("comparaisons photo", 0),
+            "évitées": counters.get("comparaisons évitées", 0),
+            "doublons": counters.get("doublons", 0),
+            "attendus": len(manifest["duplicates"]),
+            "photos_gardées": _tree_size(photos)[0],
+        }
+        return result
+
+    results = [run("full", SORT_TIME_WINDOW), run("no_window", 0)]
+    # Même rappel : l'élagage ne doit supprimer ni plus ni moins de doublons que la comparaison exhaustive
+    full, exhaustive = results[0]["dedup"], results[1]["dedup"]
+    full["même_rappel"] = (full["doublons"], full["photos_gardées"]) == (exhaustive["doublons"], exhaustive["photos_gardées"])
+    return results
+
+
+def bench_backup(work, scale, seed, corpus):
+    from backup import run_backup
+
+    # Source triée : photos/<année> et videos/<année> comme après un tri
+    photos, videos = os.path.join(work, "bk_photos"), os.path.join(work, "bk_videos")
+    if not os.path.isdir(photos):
+        for name in sorted(os.listdir(corpus)):
+            is_video = name.lower().endswith(".mp4")
+            year = str(2019 + sum(map(ord, name)) % 5)
+            dest = os.path.join(videos if is_video else photos, year)
+            os.makedirs(dest, exist_ok=True)
+            shutil.copy2(os.path.join(corpus, name), dest)
+    files = _tree_size(photos)[0] + _tree_size(videos)[0]
+    nbytes = _tree_size(photos)[1] + _tree_size(videos)[1]
+    dest = os.path.join(work, "backup_dest")
+
+    # Configuration propre au banc : les empreintes de dossiers ne servent que sans journal
+    store = ConfigStore(os.path.join(work, "config_backup.json"))
+
+    def run(variant, incremental=True, journal=True):
+        metrics, logs = RunMetrics("bench_backup"), LogCounter()
+        store.update("journal", enabled=journal)
+        previous = set_store(store)
+        t = time.perf_counter()
+        try:
+            run_backup(photos, videos, dest, log_callback=logs, progress_callback=_noop,
+                       cancel_flag=CancelFlag(), metrics=metrics, incremental=incremental)
+        finally:
+            set_store(previous)
+        return _result("backup", variant, scale, time.perf_counter() - t, files, nbytes, metrics, logs)
+
+    shutil.rmtree(dest, ignore_errors=True)
+    _fresh_hash_cache(work, "backup")
+    results = [run("cold", incremental=False)]
+
+    # À chaud : 10 % des fichiers du backup supprimés ou modifiés
+    rng = random.Random(seed)
+    mirror = [os.path.join(root, name) for root, _, names in os.walk(dest) for name in sorted(names)]
+    for path in rng.sample(sorted(mirror), max(1, len(mirror) // 10)):
+        if rng.random() < 0.5:
+            os.remove(path)
+        else:
+            with open(path, "r+b") as f:
+                f.write(b"\xff\xfe")
+    results.append(run("warm", incremental=False))
+    results.append(run("no_change", incremental=False))
+
+    # Empreintes de dossiers : rien de changé, puis tous les fichiers de la dernière année de photos
+    results.append(run("tree_no_change", journal=False))
+    last_year = os.path.join(photos, sorted(os.listdir(photos))[-1])
+    for name in sorted(os.listdir(last_year)):
+        path = os.path.join(last_year, name)
+        with open(path, "r+b") as f:
+            head = f.read(2)
+            f.seek(0)
+            f.write(bytes(b ^ 0xFF for b in head))
+        # Même taille : seul le mtime (résolution de 2 s) distingue le fichier modifié
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * merkle.MTIME_RESOLUTION_NS))
+    results.append(run("tree_one_year", journal=False))
+
+    # Journal tenu : un backup complet de référence (non mesuré), puis 10 % des fichiers source modifiés
+    from journal import JournalWatcher
+    watcher = JournalWatcher([photos, videos])
+    watcher.start()
+    try:
+        time.sleep(0.5)
+        run("journal_baseline")
+        sources = [os.path.join(root, name) for top in (photos, videos)
+                   for root, _, names in os.walk(top) for name in sorted(names)]
+        for path in rng.sample(sorted(sources), max(1, len(sources) // 10)):
+            # Octets inversés : le contenu change aussi à chaque répétition (source réutilisée)
+            with open(path, "r+b") as f:
+                head = f.read(2)
+                f.seek(0)
+                f.write(bytes(b ^ 0xFF for b in head))
+        time.sleep(1.5)             # événements inotify lus et notés
+        results.append(run("journal_warm"))
+        results.append(run("journal_no_change"))
+    finally:
+        watcher.stop(wait=True)
+    return results
+
+
+def bench_io(work, scale, corpus):
+    from backup import run_backup
+
+    videos = os.path.join(work, "io_videos")
+    os.makedirs(videos, exist_ok=True)
+    files, nbytes = _tree_size(corpus)
+    dest = os.path.join(work, "io_dest")
+
+    def run(variant, streaming):
+        shutil.rmtree(dest, ignore_errors=True)
+        _fresh_hash_cache(work, f"io_{variant}")
+        os.sync()                   # part d'un cache sans données sales
+        metrics, logs = RunMetrics("bench_io"), LogCounter()
+        sampler = CacheSampler()
+        sampler.start()
+        t = time.perf_counter()
+        run_backup(corpus, videos, dest, log_callback=logs, progress_callback=_noop, cancel_flag=CancelFlag(),
+                   metrics=metrics, incremental=False, streaming=streaming)
+        seconds = time.perf_counter() - t
+        cache = sampler.stop()
+        t = time.perf_counter()
+        os.sync()
+        cache["sync_s"] = round(time.perf_counter() - t, 4)
+        result = _result("io", variant, scale, seconds, files, nbytes, metrics, logs)
+        result["page_cache"] = cache
+        return result
+
+    return [run("default", False), run("streaming", True)]
+
+
+def _median_runs(runs):
+    """Pour chaque (banc, variante), garde l'exécution de durée médiane parmi les répétitions."""
+    grouped = {}
+    for r in runs:
+        grouped.setdefault((r["bench"], r["variant"]), []).append(r)
+    kept = []
+    for group in grouped.values():
+        group.sort(key=lambda r: r["seconds"])
+        median = dict(group[(len(group) - 1) // 2])
+        median["runs"] = [r["seconds"] for r in group]
+        median["stdev"] = round(statistics.pstdev(median["runs"]), 4)
+        kept.append(median)
+    return kept
+
+
+def run_all(scales, seed, only, work_root, repeat=1):
+    results = []
+    for scale in scales:
+        work = tempfile.mkdtemp(prefix=f"memorease_bench_{scale}_", dir=work_root)
+        try:
+            corpus = os.path.join(work, "corpus")
+            t = time.perf_counter()
+            manifest = generate(corpus, scale, seed)
+            print(f"[INFO] Corpus {scale} fichiers ({manifest['bytes'] / 1e6:.1f} Mo) "
+                  f"généré en {time.perf_counter() - t:.1f} s", file=sys.stderr)
+
+            runs = []
+            for _ in range(repeat):
+                if "mtp" in only:
+                    runs += bench_mtp(work, scale, seed)
+                if "sort" in only:
+                    runs += bench_sort(work, scale, seed, corpus, manifest)
+                if "backup" in only:
+                    runs += bench_backup(work, scale, seed, corpus)
+                if "io" in only:
+                    runs += bench_io(work, scale, corpus)
+            results += _median_runs(runs)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        for r in results:
+            if r["scale"] == scale:
+                print(f"{r['bench']:>7} {r['variant']:>10} {scale:>6} fichiers : {r['seconds']:8.3f} s "
+                      f"({r['files_per_s']} fichiers/s, {r['mb_per_s']} Mo/s)", file=sys.stderr)
+                if "page_cache" in r:
+                    c = r["page_cache"]
+                    print(f"{'':>18} cache de pages : {c['croissance_mo']:+.1f} Mo (pic {c['pic_mo']:+.1f} Mo), "
+                          f"os.sync() ensuite : {c['sync_s']:.3f} s", file=sys.stderr)
+                if "dedup" in r:
+                    d = r["dedup"]
+                    print(f"{'':>18} comparaisons pHash : {d['comparaisons']} ({d['évitées']} évitées), "
+                          f"doublons : {d['doublons']} / {d['attendus']} attendus", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline_path, max_regression):
+    """Affiche l'écart avec un résultat précédent. Retourne le nombre de régressions."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["bench"], r["variant"], r["scale"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    for r in results:
+        old = baseline.get((r["bench"], r["variant"], r["scale"]))
+        if not old or max(old["seconds"], r["seconds"]) < MIN_COMPARABLE_SECONDS:
+            continue
+        delta = r["seconds"] / old["seconds"] - 1
+        flag = ""
+        if delta > max_regression:
+            flag = "  << RÉGRESSION"
+            regressions += 1
+        print(f"{r['bench']:>7} {r['variant']:>10} {r['scale']:>6} : {old['seconds']:.3f} s -> "
+              f"{r['seconds']:.3f} s ({delta:+.1%}){flag}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.run", description="Benchmarks des moteurs MemorEase")
+    parser.add_argument("--scales", default="50,200", help="tailles de corpus, séparées par des virgules")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="répétitions par banc, la médiane est gardée")
+    parser.add_argument("--only", default=",".join(BENCHES), help=f"bancs à lancer parmi {', '.join(BENCHES)}")
+    parser.add_argument("--work-dir", default=None, help="dossier des corpus temporaires (défaut : /tmp)")
+    parser.add_argument("--output", default=None, help="fichier JSON de résultats (défaut : benchmarks/results/)")
+    parser.add_argument("--baseline", default=None, help="résultat précédent à comparer")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="ralentissement toléré par rapport à --baseline (défaut : 0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s]
+    only = {b.strip() for b in args.only.split(",")}
+    unknown = only - set(BENCHES)
+    if unknown:
+        parser.error(f"banc(s) inconnu(s) : {', '.join(sorted(unknown))}")
+
+    results = run_all(scales, args.seed, only, args.work_dir, args.repeat)
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "scales": scales,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"[INFO] Résultats écrits dans {output}", file=sys.stderr)
+
+    if args.baseline and compare(results, args.baseline, args.max_regression):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
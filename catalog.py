@@ -0,0 +1,315 @@
+"""
+Catalogue SQLite de la bibliothèque de médias (assets/catalog.sqlite).
+
+Une ligne par fichier : chemin, taille, mtime, condensat, pHash, date de prise de vue,
+appareil d'origine et état du backup. Les moteurs le tiennent à jour au fil de l'eau :
+- import MTP : record() du fichier téléchargé, avec son condensat et l'appareil ;
+- tri : move() à chaque renommage / archivage (la ligne suit le fichier), remove() des doublons ;
+- backup : mark_backed_up() des fichiers copiés ou déjà présents.
+reconcile() resynchronise le catalogue avec le disque à partir des seuls stat (aucune lecture
+de contenu) : fichiers apparus, modifiés ou disparus.
+"""
+import os
+import time
+import sqlite3
+import threading
+from functools import wraps
+from utils import external_path
+from media_formats import PHOTO_EXTS, VIDEO_EXTS
+
+CATALOG_FILE = external_path(os.path.join("assets", "catalog.sqlite"))
+COMMIT_EVERY = 200
+
+PHOTO = "photo"
+VIDEO = "video"
+KIND_BY_EXT = dict.fromkeys(PHOTO_EXTS, PHOTO) | dict.fromkeys(VIDEO_EXTS, VIDEO)
+
+COLUMNS = ("path", "name", "kind", "size", "mtime_ns", "digest", "digest_algo", "phash",
+           "captured", "device", "backup_path", "backup_mtime_ns", "backed_up_at", "updated_at")
+
+# Champs renseignés par les moteurs (les autres sont gérés par le catalogue)
+FIELDS = ("kind", "digest", "digest_algo", "phash", "captured", "device")
+
+# Effacés quand le contenu du fichier change (taille ou mtime différents)
+CONTENT_FIELDS = ("digest", "digest_algo", "phash", "backup_path", "backup_mtime_ns", "backed_up_at")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    kind TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    digest TEXT,
+    digest_algo TEXT,
+    phash TEXT,
+    captured TEXT,
+    device TEXT,
+    backup_path TEXT,
+    backup_mtime_ns INTEGER,
+    backed_up_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS media_name ON media(name);
+CREATE INDEX IF NOT EXISTS media_digest ON media(digest);
+CREATE INDEX IF NOT EXISTS media_phash ON media(phash);
+CREATE INDEX IF NOT EXISTS media_captured ON media(captured);
+CREATE INDEX IF NOT EXISTS media_size ON media(size);
+"""
+
+
+def media_kind(path):
+    """PHOTO, VIDEO ou None selon l'extension."""
+    return KIND_BY_EXT.get(os.path.splitext(path)[1].lower())
+
+
+def _under(root):
+    """Bornes (basse, haute) des chemins situés sous root, pour une requête indexée sur path."""
+    prefix = os.path.join(os.path.abspath(root), "")
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+def _best_effort(method):
+    """Les mises à jour du catalogue ne doivent jamais interrompre un tri ou un backup."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[ERREUR] Catalogue ({method.__name__}) : {e}")
+            return None
+    return wrapper
+
+
+class MediaCatalog:
+    """Accès thread-safe au catalogue. Les écritures sont validées par lots (COMMIT_EVERY) et par flush()."""
+
+    def __init__(self, path=CATALOG_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._pending = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+        except (OSError, sqlite3.Error) as e:
+            print(f"[ERREUR] Catalogue indisponible ({e}), catalogue en mémoire.")
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+
+    # --- Écritures ---
+    def _changed(self, n=1):
+        self._pending += n
+        if self._pending >= COMMIT_EVERY:
+            self._db.commit()
+            self._pending = 0
+
+    def _row(self, path):
+        return self._db.execute("SELECT * FROM media WHERE path=?", (path,)).fetchone()
+
+    def _upsert(self, path, st, fields):
+        row = self._row(path)
+        values = dict(row) if row else {"path": path}
+        if row and (row["size"], row["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+            for name in CONTENT_FIELDS:
+                values[name] = None
+        values.update({k: v for k, v in fields.items() if v is not None})
+        values.update(name=os.path.basename(path), size=st.st_size, mtime_ns=st.st_mtime_ns,
+                      updated_at=time.time())
+        values.setdefault("kind", media_kind(path))
+        self._db.execute(
+            f"INSERT OR REPLACE INTO media ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            [values.get(c) for c in COLUMNS]
+        )
+        self._changed()
+
+    @_best_effort
+    def record(self, path, **fields):
+        """Ajoute ou met à jour le fichier (taille et mtime relus sur le disque). fields : voir FIELDS."""
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise TypeError(f"Champ(s) inconnu(s) : {', '.join(sorted(unknown))}")
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            self._upsert(path, st, fields)
+
+    @_best_effort
+    def move(self, old, new, **fields):
+        """Le fichier old a été renommé / déplacé en new : sa ligne le suit (appareil, condensat...)."""
+        old, new = os.path.abspath(old), os.path.abspath(new)
+        st = os.stat(new)
+        with self._lock:
+            if old != new:
+                self._db.execute("DELETE FROM media WHERE path=?", (new,))
+                self._db.execute("UPDATE media SET path=?, name=? WHERE path=?", (new, os.path.basename(new), old))
+            self._upsert(new, st, fields)
+
+    @_best_effort
+    def remove(self, path):
+        with self._lock:
+            self._db.execute("DELETE FROM media WHERE path=?", (os.path.abspath(path),))
+            self._changed()
+
+    @_best_effort
+    def mark_backed_up(self, path, backup_path, **fields):
+        """Le fichier est présent et identique dans le backup (copié ou déjà à jour)."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            self._upsert(path, st, fields)
+            self._db.execute(
+                "UPDATE media SET backup_path=?, backup_mtime_ns=?, backed_up_at=? WHERE path=?",
+                (os.path.abspath(backup_path), st.st_mtime_ns, time.time(), path)
+            )
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._db.commit()
+                self._pending = 0
+
+    # --- Resynchronisation ---
+    def reconcile(self, roots, log_callback=None, cancel_flag=None):
+        """
+        Compare le catalogue aux fichiers présents sous roots à partir des seuls stat :
+        ajoute les fichiers inconnus, met à jour taille / mtime des fichiers modifiés (condensat,
+        pHash et état du backup sont alors effacés) et supprime les lignes des fichiers disparus.
+        Retourne les compteurs {"ajoutés", "modifiés", "supprimés", "inchangés"}.
+        """
+        counts = {"ajoutés": 0, "modifiés": 0, "supprimés": 0, "inchangés": 0}
+        for root in roots:
+            if not root:
+                continue
+            root = os.path.abspath(root)
+            low, high = _under(root)
+            with self._lock:
+                known = {row["path"]: (row["size"], row["mtime_ns"]) for row in self._db.execute(
+                    "SELECT path, size, mtime_ns FROM media WHERE path >= ? AND path < ?", (low, high))}
+
+            stack = [root] if os.path.isdir(root) else []
+            while stack:
+                if cancel_flag and cancel_flag.cancelled:
+                    self.flush()
+                    return counts
+                directory = stack.pop()
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError as e:
+                    if log_callback:
+                        log_callback(f"[ERREUR] Lecture impossible : {directory} ({e})")
+                    # Dossier illisible : ses lignes sont conservées telles quelles
+                    prefix = os.path.join(directory, "")
+                    for path in [p for p in known if p.startswith(prefix)]:
+                        known.pop(path)
+                    continue
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if not entry.is_file() or media_kind(entry.name) is None:
+                        continue
+                    previous = known.pop(entry.path, None)
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if previous == (st.st_size, st.st_mtime_ns):
+                        counts["inchangés"] += 1
+                        continue
+                    with self._lock:
+                        self._upsert(entry.path, st, {})
+                    counts["modifiés" if previous else "ajoutés"] += 1
+
+            with self._lock:
+                self._db.executemany("DELETE FROM media WHERE path=?", [(p,) for p in known])
+                self._changed(len(known))
+            counts["supprimés"] += len(known)
+        self.flush()
+        return counts
+
+    # --- Recherches (indexées) ---
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def get(self, path):
+        rows = self._query("SELECT * FROM media WHERE path=?", (os.path.abspath(path),))
+        return rows[0] if rows else None
+
+    def find_digest(self, digest):
+        return self._query("SELECT * FROM media WHERE digest=?", (digest,))
+
+    def find_phash(self, phash):
+        return self._query("SELECT * FROM media WHERE phash=?", (phash,))
+
+    def find_name(self, name):
+        return self._query("SELECT * FROM media WHERE name=?", (name,))
+
+    def names_under(self, root):
+        """Noms des fichiers catalogués sous root (équivalent indexé d'un os.walk)."""
+        low, high = _under(root)
+        with self._lock:
+            return {row[0] for row in self._db.execute(
+                "SELECT name FROM media WHERE path >= ? AND path < ?", (low, high))}
+
+    def files_under(self, root, kind=None):
+        """Lignes des fichiers catalogués sous root, d'un seul type (PHOTO, VIDEO) si kind est fourni."""
+        sql = "SELECT * FROM media WHERE path >= ? AND path < ?"
+        params = list(_under(root))
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        return self._query(sql, params)
+
+    def captured_between(self, start, end):
+        """Fichiers pris entre start et end (dates ISO 'AAAA-MM-JJTHH:MM:SS', bornes incluses)."""
+        return self._query("SELECT * FROM media WHERE captured BETWEEN ? AND ? ORDER BY captured", (start, end))
+
+    def pending_backup(self, roots=None, limit=None):
+        """Fichiers jamais sauvegardés, ou modifiés depuis leur dernier backup (sous roots si fourni)."""
+        sql = "SELECT * FROM media WHERE (backed_up_at IS NULL OR backup_mtime_ns IS NOT mtime_ns)"
+        params = []
+        if roots:
+            sql += " AND (" + " OR ".join("(path >= ? AND path < ?)" for _ in roots) + ")"
+            for root in roots:
+                params += _under(root)
+        sql += " ORDER BY path"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._query(sql, params)
+
+    def stats(self):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0),"
+                " SUM(kind = 'photo'), SUM(kind = 'video'),"
+                " SUM(digest IS NOT NULL), SUM(phash IS NOT NULL),"
+                " SUM(backed_up_at IS NOT NULL AND backup_mtime_ns = mtime_ns)"
+                " FROM media"
+            ).fetchone()
+        keys = ("fichiers", "octets", "photos", "vidéos", "hachés", "phash", "sauvegardés")
+        return {k: v or 0 for k, v in zip(keys, row)}
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """Catalogue partagé par tout le processus (ouvert au premier appel)."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            import atexit
+            _catalog = MediaCatalog()
+            atexit.register(_catalog.flush)
+        return _catalog
+
+def set_catalog(catalog):
+    """Remplace le catalogue partagé (benchmarks, catalogue isolé). Retourne le précédent."""
+    global _catalog
+    with _catalog_lock:
+        previous, _catalog = _catalog, catalog
+    return previous
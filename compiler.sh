@@ -20,3 +20,5 @@ fi
 
 echo ""
 echo "[DONE] Exécutable généré dans : $SCRIPT_DIR/dist/"
+echo "[INFO] SHA-256 à reporter dans latest.json (champ \"sha256\") :"
+sha256sum "$SCRIPT_DIR/dist/MemorEase" | cut -d" " -f1
@@ -0,0 +1,353 @@
+"""
+Configuration de MemorEase (assets/config.json), chargée une seule fois et partagée.
+
+Le fichier est organisé en sections typées : paths, backup, concurrency, cache, dedup, watch,
+journal et transfer.
+Les anciennes clés à plat ("save", "photos", "videos", "backup", "update_check_interval")
+sont encore lues puis réécrites dans leur section à la prochaine sauvegarde.
+- get_config() retourne la configuration courante. Le fichier n'est relu que si son mtime
+  a changé, par exemple après une modification à la main ou par un autre processus.
+- update(section, **valeurs) écrit de façon atomique (fichier temporaire + os.replace), puis
+  prévient les abonnés. Un crash pendant l'écriture laisse donc l'ancien fichier intact.
+- subscribe(callback) : callback(config, sections) est appelé à chaque changement, depuis le
+  thread qui l'a provoqué (les fenêtres Tk repassent par after()).
+"""
+import os
+import json
+import tempfile
+import threading
+from dataclasses import dataclass, field, fields, asdict, replace
+from utils import CONFIG_FILE, HASH_ALGOS, default_hash_algo, get_default_paths
+
+# Intervalle minimal entre deux vérifications de mise à jour (secondes)
+DEFAULT_UPDATE_INTERVAL = 600
+
+
+def _default_save():
+    return get_default_paths()[0]
+
+def _default_photos():
+    return get_default_paths()[1]
+
+def _default_videos():
+    return get_default_paths()[2]
+
+
+@dataclass(frozen=True)
+class PathsConfig:
+    save: str = field(default_factory=_default_save)
+    photos: str = field(default_factory=_default_photos)
+    videos: str = field(default_factory=_default_videos)
+
+    def validate(self):
+        # Tout ou rien : des chemins Windows (C:\...) ou incomplets ramènent aux valeurs par défaut
+        if all(isinstance(p, str) and p.startswith("/") for p in (self.save, self.photos, self.videos)):
+            return self
+        return PathsConfig()
+
+
+@dataclass(frozen=True)
+class BackupConfig:
+    path: str = ""
+    photos: bool = True
+    videos: bool = True
+
+    def validate(self):
+        return self if self.path.startswith("/") else replace(self, path="")
+
+
+@dataclass(frozen=True)
+class ConcurrencyConfig:
+    workers: int = 4           # threads du JobScheduler
+    disk_slots: int = 2        # flux simultanés par disque
+    device_slots: int = 1      # flux simultanés vers le téléphone (MTP)
+    hash_workers: int = 0      # threads du service de hachage (0 = automatique)
+
+    def validate(self):
+        default = ConcurrencyConfig()
+        return replace(
+            self,
+            workers=self.workers if self.workers >= 1 else default.workers,
+            disk_slots=self.disk_slots if self.disk_slots >= 1 else default.disk_slots,
+            device_slots=self.device_slots if self.device_slots >= 1 else default.device_slots,
+            hash_workers=max(self.hash_workers, 0),
+        )
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    update_check_interval: float = float(DEFAULT_UPDATE_INTERVAL)
+    hash_algo: str = ""        # "" = automatique (xxh3 si disponible, sinon blake2b)
+
+    def validate(self):
+        section = self
+        if section.update_check_interval < 0:
+            section = replace(section, update_check_interval=float(DEFAULT_UPDATE_INTERVAL))
+        # Algorithme inconnu, ou xxh3 sans le module xxhash : retour au choix automatique
+        if section.hash_algo not in HASH_ALGOS or (section.hash_algo == "xxh3" and default_hash_algo() != "xxh3"):
+            section = replace(section, hash_algo="")
+        return section
+
+
+@dataclass(frozen=True)
+class DedupConfig:
+    time_window: float = 0.0     # photos comparées seulement si prises à moins de N s (0 = toutes, défaut)
+
+    def validate(self):
+        return self if self.time_window >= 0 else DedupConfig()
+
+
+@dataclass(frozen=True)
+class WatchConfig:
+    debounce: float = 2.0      # secondes sans événement avant de prendre un fichier fermé
+    queue_size: int = 64       # fichiers prêts en attente d'analyse (file bornée)
+    workers: int = 2           # threads d'analyse du mode surveillance
+
+    def validate(self):
+        default = WatchConfig()
+        return replace(
+            self,
+            debounce=max(self.debounce, 0.0),
+            queue_size=self.queue_size if self.queue_size >= 1 else default.queue_size,
+            workers=self.workers if self.workers >= 1 else default.workers,
+        )
+
+
+@dataclass(frozen=True)
+class JournalConfig:
+    enabled: bool = True          # journal inotify des changements, backups incrémentaux
+    full_every_days: float = 7.0  # backup complet, fichiers relus, au moins tous les N jours (filet de sécurité)
+
+    def validate(self):
+        return self if self.full_every_days >= 0 else replace(self, full_every_days=JournalConfig().full_every_days)
+
+
+@dataclass(frozen=True)
+class TransferConfig:
+    streaming: bool = False    # copies en mode flux : cache de pages épargné (transfer.Writeback)
+    sync_window_mb: int = 32   # Mo écrits avant d'envoyer la fenêtre au disque
+
+    def validate(self):
+        return self if self.sync_window_mb >= 1 else replace(self, sync_window_mb=TransferConfig().sync_window_mb)
+
+
+SECTIONS = {
+    "paths": PathsConfig,
+    "backup": BackupConfig,
+    "concurrency": ConcurrencyConfig,
+    "cache": CacheConfig,
+    "dedup": DedupConfig,
+    "watch": WatchConfig,
+    "journal": JournalConfig,
+    "transfer": TransferConfig,
+}
+
+# Anciennes clés à plat → (section, champ)
+LEGACY_KEYS = {
+    "save": ("paths", "save"),
+    "photos": ("paths", "photos"),
+    "videos": ("paths", "videos"),
+    "backup": ("backup", "path"),
+    "update_check_interval": ("cache", "update_check_interval"),
+}
+
+
+def _coerce(value, type_):
+    """value si elle a le type du champ (int accepté pour un float), sinon None."""
+    if isinstance(value, bool):
+        return value if type_ is bool else None
+    if type_ is float and isinstance(value, (int, float)):
+        return float(value)
+    return value if isinstance(value, type_) else None
+
+
+def _build_section(cls, data):
+    section = cls()
+    if not isinstance(data, dict):
+        return section
+    values = {}
+    for f in fields(cls):
+        if f.name in data:
+            value = _coerce(data[f.name], f.type)
+            if value is not None:
+                values[f.name] = value
+    return replace(section, **values).validate()
+
+
+@dataclass(frozen=True)
+class Config:
+    paths: PathsConfig = field(default_factory=PathsConfig)
+    backup: BackupConfig = field(default_factory=BackupConfig)
+    concurrency: ConcurrencyConfig = field(default_factory=ConcurrencyConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    dedup: DedupConfig = field(default_factory=DedupConfig)
+    watch: WatchConfig = field(default_factory=WatchConfig)
+    journal: JournalConfig = field(default_factory=JournalConfig)
+    transfer: TransferConfig = field(default_factory=TransferConfig)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data) if isinstance(data, dict) else {}
+        sections = {name: dict(data.get(name) or {}) if isinstance(data.get(name), dict) else {}
+                    for name in SECTIONS}
+        for key, (section, name) in LEGACY_KEYS.items():
+            # "backup" est à la fois une ancienne clé (chaîne) et une section (dict)
+            if key in data and not isinstance(data[key], dict):
+                sections[section].setdefault(name, data[key])
+        return cls(**{name: _build_section(SECTIONS[name], sections[name]) for name in SECTIONS})
+
+    def to_dict(self):
+        return {name: asdict(getattr(self, name)) for name in SECTIONS}
+
+
+class ConfigStore:
+    """Configuration en mémoire adossée à un fichier JSON. Thread-safe."""
+
+    def __init__(self, path=CONFIG_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._subscribers = []
+        self._config = Config()
+        self._mtime = None
+        self._extra = {}        # clés inconnues, conservées telles quelles
+        self._load()
+
+    # --- Lecture ---
+    def get(self):
+        """Configuration courante, relue seulement si le fichier a changé depuis le dernier chargement."""
+        self.check()
+        return self._config
+
+    def check(self):
+        """Recharge si le mtime du fichier a changé. Retourne True si la configuration a changé."""
+        with self._lock:
+            if self._file_mtime() == self._mtime:
+                return False
+            previous = self._config
+            self._load()
+            changed = self._changed(previous, self._config)
+        if changed:
+            self._notify(changed)
+        return bool(changed)
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        mtime = self._file_mtime()
+        if mtime is None:
+            self._config, self._extra, self._mtime = Config(), {}, None
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            # Fichier illisible : on garde la configuration en mémoire, sans écraser le fichier
+            print(f"[ERREUR] Lecture de {self.path} impossible : {e}")
+            self._mtime = mtime
+            return
+        self._config = Config.from_dict(data)
+        known = set(SECTIONS) | set(LEGACY_KEYS)
+        self._extra = {k: v for k, v in data.items() if k not in known} if isinstance(data, dict) else {}
+        self._mtime = mtime
+
+    # --- Écriture ---
+    def update(self, section, **values):
+        """Modifie des champs d'une section et sauvegarde si quelque chose a changé. Retourne la configuration."""
+        cls = SECTIONS[section]
+        unknown = set(values) - {f.name for f in fields(cls)}
+        if unknown:
+            raise KeyError(f"Champ(s) inconnu(s) dans {section} : {', '.join(sorted(unknown))}")
+        self.check()
+        with self._lock:
+            previous = self._config
+            current = getattr(previous, section)
+            merged = _build_section(cls, dict(asdict(current), **values))
+            if merged == current:
+                return previous
+            self._config = replace(previous, **{section: merged})
+            self._write()
+            changed = self._changed(previous, self._config)
+        self._notify(changed)
+        return self._config
+
+    def save(self):
+        """Écrit la configuration courante (création du fichier avec les valeurs par défaut)."""
+        with self._lock:
+            self._write()
+
+    def _write(self):
+        data = dict(self._extra)
+        data.update(self._config.to_dict())
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._mtime = self._file_mtime()
+
+    # --- Abonnements ---
+    def subscribe(self, callback):
+        """callback(config, sections_modifiées). Retourne une fonction de désabonnement."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    @staticmethod
+    def _changed(old, new):
+        return {name for name in SECTIONS if getattr(old, name) != getattr(new, name)}
+
+    def _notify(self, sections):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(self._config, sections)
+            except Exception as e:
+                print(f"[ERREUR] Abonné à la configuration : {e}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """ConfigStore partagé par tout le processus (créé au premier appel)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConfigStore()
+        return _store
+
+def set_store(store):
+    """Remplace le ConfigStore partagé (benchmarks, configuration isolée). Retourne le précédent."""
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+    return previous
+
+def get_config():
+    return get_store().get()
+
+def update(section, **values):
+    return get_store().update(section, **values)
+
+def subscribe(callback):
+    return get_store().subscribe(callback)
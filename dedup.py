@@ -0,0 +1,193 @@
+"""
+Génération de candidats pour la détection des quasi-doublons photo.
+
+Les quasi-doublons (rafales, ré-enregistrements, retouches) ont presque toujours des heures de
+prise de vue proches. SeenPhotos range donc les photos déjà vues par date de prise de vue
+(EXIF ou nom normalisé) et ne propose à la comparaison pHash que :
+- les photos datées dont l'intervalle de date tombe à moins de `window` secondes ;
+- toutes les photos sans date (passe globale) ;
+et, pour une photo sans date, toutes les photos déjà vues.
+window = 0 désactive l'élagage : chaque photo est comparée à toutes les précédentes.
+
+La comparaison elle-même est une cascade, du moins cher au plus cher (PhotoHashes) :
+1. pHash de la photo contre celui du candidat (un XOR d'entiers) ;
+2. pour les rotations : dimensions compatibles (format à ASPECT_TOLERANCE près) puis aHash 8x8
+   de la vignette tournée à distance <= THUMB_DISTANCE de celle du candidat ;
+3. seulement si un candidat passe ces filtres, pHash des 3 rotations de la photo (3 DCT + 3 rotations
+   de l'image entière, le gros du coût d'origine), calculés une fois et gardés en cache.
+La décision reste la règle d'origine : doublon si le pHash du candidat est à distance <= PHASH_DISTANCE
+du pHash de la photo ou d'une de ses rotations. Les filtres de l'étape 2 ont une marge large
+(quasi-doublons : quelques bits de différence, images distinctes : une trentaine).
+Les hachés (dimensions, pHash, aHash, rotations) sont gardés dans le cache de condensats (clé
+disque/inode, validée par taille + mtime) : un nouveau tri ne décode plus les photos déjà vues.
+"""
+import os
+from bisect import bisect_left, bisect_right, insort
+import imagehash                        # pyright: ignore[reportMissingImports]
+from PIL import Image                   # pyright: ignore[reportMissingImports]
+from hamming import distance
+from utils import get_hash_service
+import media_formats
+
+# Largeur maximale d'un intervalle de date (nom IMG_AAAA_MM_JJ_N0001 : journée entière)
+MAX_INTERVAL = 86400
+
+PHASH_DISTANCE = 1
+ROTATIONS = (90, 180, 270)
+THUMB_SIZE = 8
+THUMB_DISTANCE = 12         # bits sur 64
+ASPECT_TOLERANCE = 0.1
+
+# Entrée du cache de condensats (à changer si le calcul des hachés change)
+CACHE_ALGO = "phash2"
+
+
+def _phash(img):
+    return int(str(imagehash.phash(img)), 16)
+
+def _ahash(thumb):
+    pixels = list(thumb.getdata())
+    mean = sum(pixels) / len(pixels)
+    return int("".join("1" if p > mean else "0" for p in pixels), 2)
+
+
+class PhotoHashes:
+    """
+    Hachés d'une photo : dimensions, pHash, aHash de la vignette pour 0/90/180/270° (thumbs)
+    et, une fois calculés, pHash des rotations 90/180/270° (rotated).
+    Une photo connue seulement par son pHash (catalogue) a dims et thumbs à None :
+    les filtres bon marché la laissent alors toujours passer.
+    """
+    __slots__ = ("dims", "phash", "thumbs", "rotated")
+
+    def __init__(self, dims, phash, thumbs, rotated=None):
+        self.dims = dims
+        self.phash = phash
+        self.thumbs = thumbs
+        self.rotated = rotated
+
+    @classmethod
+    def compute(cls, rgb):
+        """Hachés d'une image RGB décodée (pHash identique à imagehash.phash de la même image)."""
+        thumb = rgb.convert("L").resize((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+        thumbs = tuple(_ahash(thumb.rotate(angle)) for angle in (0,) + ROTATIONS)
+        return cls(rgb.size, _phash(rgb), thumbs)
+
+    def compute_rotated(self, rgb):
+        self.rotated = tuple(_phash(rgb.rotate(angle, expand=True)) for angle in ROTATIONS)
+        return self.rotated
+
+    def may_match_rotated(self, other, i):
+        """Filtres bon marché : la rotation ROTATIONS[i] de cette photo peut-elle ressembler à other ?"""
+        if other.thumbs is None or other.dims is None:
+            return True
+        w, h = self.dims
+        if ROTATIONS[i] != 180:
+            w, h = h, w
+        ow, oh = other.dims
+        a, b = w * oh, h * ow
+        if abs(a - b) > ASPECT_TOLERANCE * max(a, b):
+            return False
+        return distance(self.thumbs[i + 1], other.thumbs[0]) <= THUMB_DISTANCE
+
+    # --- Cache ---
+    def encode(self):
+        values = list(self.dims) + [self.phash] + list(self.thumbs) + list(self.rotated or ())
+        return ",".join(f"{v:x}" for v in values)
+
+    @classmethod
+    def decode(cls, text):
+        try:
+            values = [int(v, 16) for v in text.split(",")]
+        except ValueError:
+            return None
+        if len(values) not in (7, 10):
+            return None
+        return cls(tuple(values[:2]), values[2], tuple(values[3:7]), tuple(values[7:]) or None)
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def cached_hashes(path):
+    """PhotoHashes de path gardés dans le cache de condensats, ou None."""
+    st = _stat(path)
+    text = get_hash_service().cache.get(st, CACHE_ALGO) if st else None
+    return PhotoHashes.decode(text) if text else None
+
+def store_hashes(path, photo):
+    st = _stat(path)
+    if st:
+        get_hash_service().cache.put(path, st, CACHE_ALGO, photo.encode())
+
+def prefetch_hashes(path):
+    """Calcule et met en cache les PhotoHashes de path s'ils n'y sont pas encore (analyse en parallèle)."""
+    if cached_hashes(path) is None:
+        store_hashes(path, PhotoHashes.compute(media_formats.open_image(path).convert("RGB")))
+
+
+class SeenPhotos:
+    """
+    Photos déjà vues : clé → PhotoHashes, plus l'index temporel. S'utilise comme le dictionnaire
+    seen_images d'origine (items, len, in), avec candidates() pour la liste à comparer
+    et find_duplicate() pour la cascade.
+    """
+
+    def __init__(self, window=0):
+        self.window = window
+        self.hashes = {}
+        self._starts = []       # (début, fin, clé) triés par début
+        self._undated = []
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, key):
+        return key in self.hashes
+
+    def items(self):
+        return self.hashes.items()
+
+    def add(self, key, photo, interval=None):
+        """interval : (début, fin) en secondes depuis l'epoch, ou None si la photo n'est pas datée."""
+        self.hashes[key] = photo
+        if interval is None:
+            self._undated.append(key)
+        else:
+            insort(self._starts, (interval[0], interval[1], key))
+
+    def candidates(self, interval=None):
+        """Clés à comparer avec une photo datée de interval (ou non datée si None)."""
+        if not self.window or interval is None:
+            keys = list(self.hashes)
+        else:
+            low, high = interval[0] - self.window, interval[1] + self.window
+            # Un intervalle commence au plus MAX_INTERVAL avant sa fin : borne basse de recherche
+            i = bisect_left(self._starts, (low - MAX_INTERVAL,))
+            j = bisect_right(self._starts, (high, float("inf")))
+            keys = [key for start, end, key in self._starts[i:j] if end >= low]
+            keys += self._undated
+        return keys
+
+    def find_duplicate(self, photo, candidates, rotated):
+        """
+        Première clé de candidates dont le pHash est à distance <= PHASH_DISTANCE de celui de photo
+        ou d'une de ses rotations, sinon None. rotated() retourne les pHash des rotations de photo :
+        appelée au plus une fois, et seulement si un candidat passe les filtres bon marché.
+        """
+        rotations = photo.rotated
+        for key in candidates:
+            prev = self.hashes[key]
+            if distance(photo.phash, prev.phash) <= PHASH_DISTANCE:
+                return key
+            kept = [i for i in range(len(ROTATIONS)) if photo.may_match_rotated(prev, i)]
+            if not kept:
+                continue
+            if rotations is None:
+                rotations = rotated()
+            if any(distance(rotations[i], prev.phash) <= PHASH_DISTANCE for i in kept):
+                return key
+        return None
@@ -0,0 +1,192 @@
+import os
+import glob
+import threading
+import subprocess
+from inotify_tools import (
+    Inotify, available as inotify_available,
+    IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO, IN_DELETE_SELF, IN_MOVE_SELF, IN_ONLYDIR,
+)
+
+# Emplacements possibles du dossier photo selon le constructeur / la langue
+DCIM_SUFFIXES = [
+    "DCIM/Camera",
+    "Internal storage/DCIM/Camera",
+    "Stockage interne/DCIM/Camera",
+    "Phone/DCIM/Camera",
+    "SD card/DCIM/Camera",
+    "Carte SD/DCIM/Camera",
+]
+
+# Intervalle de re-sondage d'un appareil monté dont le DCIM n'est pas encore accessible
+PROBE_INTERVAL = 0.5
+
+_WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+
+def default_gvfs_base():
+    return f"/run/user/{os.getuid()}/gvfs"
+
+
+def find_dcim(mount):
+    """Retourne le premier dossier DCIM/Camera trouvé sous un point de montage MTP, sinon None."""
+    for suffix in DCIM_SUFFIXES:
+        dcim_path = os.path.join(mount, suffix)
+        if os.path.isdir(dcim_path):
+            return dcim_path
+    return None
+
+
+def scan_mounts(gvfs_base, known=None):
+    """
+    Retourne {point de montage mtp:* -> dossier DCIM ou None}.
+    known : résultat d'un scan précédent, les DCIM déjà trouvés ne sont pas re-sondés.
+    """
+    if not os.path.isdir(gvfs_base):
+        return {}
+    known = known or {}
+    mounts = {}
+    for mount in sorted(glob.glob(os.path.join(gvfs_base, "mtp:*"))):
+        dcim = known.get(mount)
+        mounts[mount] = dcim if dcim and os.path.isdir(dcim) else find_dcim(mount)
+    return mounts
+
+
+def try_gio_mount(timeout_list=5, timeout_mount=15):
+    """Tente de monter le premier appareil MTP listé par gio. Retourne True si une tentative a eu lieu."""
+    try:
+        r = subprocess.run(["gio", "mount", "-li"],
+                           capture_output=True, text=True, timeout=timeout_list)
+        for line in r.stdout.splitlines():
+            line = line.strip()
+            if line.startswith("mtp://"):
+                subprocess.run(["gio", "mount", line],
+                               capture_output=True, timeout=timeout_mount)
+                return True
+    except Exception:
+        pass
+    return False
+
+
+class DeviceMonitor:
+    """
+    Surveille le dossier GVFS et tient à jour la liste des appareils MTP montés
+    et de leur dossier DCIM, dans un thread dédié.
+    - inotify signale les montages / démontages dès qu'ils apparaissent ;
+    - un rescan périodique (rescan_interval) reste actif en filet de sécurité, car les
+      entrées d'un montage FUSE ne génèrent pas toujours d'événement inotify.
+    Les écouteurs reçoivent le dict {montage -> DCIM} à chaque changement (depuis le thread du moniteur).
+    log_callback reçoit les erreurs des écouteurs (print par défaut).
+    """
+
+    def __init__(self, gvfs_base=None, rescan_interval=3.0, auto_mount=True, log_callback=None):
+        self.gvfs_base = gvfs_base or default_gvfs_base()
+        self.rescan_interval = rescan_interval
+        self.auto_mount = auto_mount
+        self.log_callback = log_callback or print
+        self._mounts = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._ready = threading.Event()
+
+    # --- API publique ---
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def wait_ready(self, timeout=None):
+        """Attend la fin du premier scan."""
+        return self._ready.wait(timeout)
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def mounts(self):
+        with self._lock:
+            return dict(self._mounts)
+
+    def dcim_root(self):
+        """Premier dossier DCIM disponible, sans aucun appel bloquant."""
+        with self._lock:
+            for dcim in self._mounts.values():
+                if dcim:
+                    return dcim
+        return None
+
+    def is_connected(self):
+        return self.dcim_root() is not None
+
+    def refresh(self, force_notify=False):
+        """Rescanne le dossier GVFS et notifie les écouteurs si la liste a changé."""
+        with self._lock:
+            known = dict(self._mounts)
+        mounts = scan_mounts(self.gvfs_base, known)
+        with self._lock:
+            changed = mounts != self._mounts
+            self._mounts = mounts
+        if changed or force_notify:
+            for callback in list(self._listeners):
+                try:
+                    callback(dict(mounts))
+                except Exception as e:
+                    self.log_callback(f"[ERREUR] Écouteur DeviceMonitor : {type(e).__name__}: {e}")
+        return changed
+
+    # --- Boucle du thread ---
+    def _watch(self, notifier):
+        """Pose le watch inotify sur le dossier GVFS s'il existe. Retourne True en cas de succès."""
+        if notifier is None or not os.path.isdir(self.gvfs_base):
+            return False
+        try:
+            notifier.add_watch(self.gvfs_base, _WATCH_MASK)
+            return True
+        except OSError:
+            return False
+
+    def _run(self):
+        notifier = None
+        if inotify_available():
+            try:
+                notifier = Inotify()
+            except OSError:
+                notifier = None
+
+        # Le watch est posé avant le premier scan pour ne manquer aucun montage
+        watched = self._watch(notifier)
+        self.refresh(force_notify=True)
+        self._ready.set()
+
+        if self.auto_mount and not self._mounts and try_gio_mount():
+            self.refresh()
+
+        try:
+            while not self._stop.is_set():
+                if not watched:
+                    watched = self._watch(notifier)
+
+                # Un appareil monté dont le DCIM n'est pas encore lisible est re-sondé plus souvent
+                probing = any(dcim is None for dcim in self.mounts().values())
+                timeout = min(self.rescan_interval, PROBE_INTERVAL) if probing else self.rescan_interval
+
+                if watched:
+                    events = notifier.read_events(timeout=timeout)
+                    if any(mask & (IN_DELETE_SELF | IN_MOVE_SELF) for _, mask, _, _ in events):
+                        watched = False
+                else:
+                    self._stop.wait(timeout)
+
+                self.refresh()
+        finally:
+            if notifier:
+                notifier.close()
@@ -0,0 +1,64 @@
+"""
+Index de hachés perceptuels 64 bits pour retrouver les voisins à distance de Hamming bornée
+sans comparer chaque nouveau fichier à tous les précédents.
+
+Principe (multi-index hashing) : le haché est découpé en max_distance + 1 bandes de bits.
+Deux hachés à distance <= max_distance ont forcément au moins une bande identique
+(principe des tiroirs). Une recherche ne compare donc que les entrées qui partagent une bande.
+"""
+
+
+def to_int(value):
+    """Haché sous forme d'entier : int, chaîne hexadécimale ou imagehash.ImageHash."""
+    if isinstance(value, int):
+        return value
+    return int(str(value), 16)
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class HammingIndex:
+    """
+    add(key, haché) puis query(haché) → [(clé, distance), ...] triés par distance croissante.
+    Une même clé peut porter plusieurs hachés (rotations d'une photo, images d'une vidéo).
+    """
+
+    def __init__(self, max_distance=1, bits=64):
+        self.max_distance = max_distance
+        self.bits = bits
+        bands = max_distance + 1
+        size, extra = divmod(bits, bands)
+        self._bands = []    # (décalage, masque)
+        offset = 0
+        for i in range(bands):
+            width = size + (1 if i < extra else 0)
+            self._bands.append((offset, (1 << width) - 1))
+            offset += width
+        self._tables = [{} for _ in self._bands]
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _keys(self, h):
+        return [(h >> offset) & mask for offset, mask in self._bands]
+
+    def add(self, key, value):
+        h = to_int(value)
+        for table, band in zip(self._tables, self._keys(h)):
+            table.setdefault(band, []).append((key, h))
+        self._count += 1
+
+    def query(self, value, max_distance=None):
+        """Clés dont au moins un haché est à distance <= max_distance (défaut : celle de l'index)."""
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        h = to_int(value)
+        best = {}
+        for table, band in zip(self._tables, self._keys(h)):
+            for key, other in table.get(band, ()):
+                d = distance(h, other)
+                if d <= limit and d < best.get(key, limit + 1):
+                    best[key] = d
+        return sorted(best.items(), key=lambda kv: kv[1])
@@ -0,0 +1,425 @@
+"""
+Journal des changements de la bibliothèque (assets/change_journal.sqlite).
+
+Un backup sans journal doit parcourir les deux arborescences complètes pour constater que rien
+n'a changé, ce qui est très lent sur un disque USB. Tant que MemorEase ou son service (watch)
+tourne, JournalWatcher surveille photos_path et videos_path par inotify et note chaque chemin
+créé, modifié, déplacé ou supprimé ; le tri y note aussi ses propres archivages. Le backup
+suivant ne traite alors que les chemins notés depuis le précédent (plan()).
+
+Le journal n'est digne de confiance que s'il n'a rien pu manquer depuis le dernier backup complet
+vers la même destination. Chaque surveillance ouvre une session (identifiant aléatoire) et la
+signale vivante par un battement (heartbeat) régulier ; un débordement de la file inotify ouvre
+une nouvelle session. plan() n'autorise un backup incrémental que si :
+- la session qui a précédé le dernier backup complet vers cette destination est toujours vivante ;
+- ce backup complet date de moins de full_every_days jours (réconciliation périodique).
+Sinon le backup parcourt tout, puis advance(full=True) prend pour référence la session vivante
+à son début. La réconciliation périodique (full_due()) relit en plus tous les fichiers des deux
+côtés, sans se fier au cache de condensats.
+Chaque destination garde son propre curseur : deux disques de backup utilisés en alternance
+reçoivent chacun tous les changements.
+"""
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from functools import wraps
+from utils import external_path
+from inotify_tools import (
+    Inotify, available as inotify_available,
+    IN_CLOSE_WRITE, IN_MODIFY, IN_ATTRIB, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO,
+    IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW, IN_IGNORED, IN_ISDIR, IN_ONLYDIR,
+)
+
+JOURNAL_FILE = external_path(os.path.join("assets", "change_journal.sqlite"))
+
+# Battement de la surveillance (secondes) ; une session muette depuis STALE_AFTER est considérée morte
+HEARTBEAT_INTERVAL = 10.0
+STALE_AFTER = 3 * HEARTBEAT_INTERVAL
+POLL_INTERVAL = 1.0
+
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MODIFY | IN_ATTRIB | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_seq ON entries(seq);
+CREATE TABLE IF NOT EXISTS sessions (
+    root TEXT PRIMARY KEY,
+    session TEXT NOT NULL,
+    started REAL,
+    heartbeat REAL
+);
+CREATE TABLE IF NOT EXISTS targets (
+    root TEXT NOT NULL,
+    target TEXT NOT NULL,
+    session TEXT,
+    cursor INTEGER NOT NULL DEFAULT 0,
+    last_full REAL,
+    PRIMARY KEY (root, target)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+-- Dernier numéro attribué : ne redescend jamais, même quand advance() purge les entrées
+INSERT OR IGNORE INTO meta SELECT 'last_seq', MAX(
+    (SELECT COALESCE(MAX(seq), 0) FROM entries), (SELECT COALESCE(MAX(cursor), 0) FROM targets));
+"""
+
+
+def _under(root):
+    """Bornes (basse, haute) des chemins situés sous root, pour une requête indexée sur path."""
+    prefix = os.path.join(os.path.abspath(root), "")
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+def _overdue(last_full, full_every_days):
+    return time.time() - (last_full or 0) > full_every_days * 86400
+
+
+def _best_effort(method):
+    """Le journal ne doit jamais interrompre un tri, une surveillance ou un backup."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[ERREUR] Journal des changements ({method.__name__}) : {e}")
+            return None
+    return wrapper
+
+
+class ChangeJournal:
+    """Accès au journal, partagé entre threads et entre processus (SQLite en WAL)."""
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+        except (OSError, sqlite3.Error) as e:
+            # Journal en mémoire : aucun autre processus ne le voit, les backups restent complets
+            print(f"[ERREUR] Journal des changements indisponible ({e}), journal en mémoire.")
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    # --- Écritures ---
+    @_best_effort
+    def record(self, *paths):
+        """
+        Note des chemins (fichiers ou dossiers) changés ; le plus récent l'emporte pour un même chemin.
+        Validé aussitôt : un backup lancé par un autre processus doit voir l'entrée.
+        """
+        with self._lock, self._db:
+            # Numérotation sous verrou d'écriture : deux processus ne peuvent pas réutiliser un numéro
+            self._db.execute("BEGIN IMMEDIATE")
+            seq = self._last_seq()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?)",
+                [(os.path.abspath(p), seq + i) for i, p in enumerate(paths, 1)]
+            )
+            self._db.execute("UPDATE meta SET value=? WHERE key='last_seq'", (seq + len(paths),))
+
+    def _last_seq(self):
+        return self._db.execute("SELECT value FROM meta WHERE key='last_seq'").fetchone()[0]
+
+    # --- Sessions de surveillance ---
+    @_best_effort
+    def open_session(self, roots, session):
+        """La surveillance de roots commence (watches posés) : session devient la session courante."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                                 [(os.path.abspath(r), session, now, now) for r in roots])
+            self._db.commit()
+
+    @_best_effort
+    def heartbeat(self, roots, session):
+        """
+        Signale la session vivante. Une racine reprise par une autre surveillance (autre processus)
+        reste à celle-ci tant qu'elle bat ; elle revient à session quand l'autre s'est arrêtée.
+        """
+        now = time.time()
+        with self._lock:
+            for root in roots:
+                root = os.path.abspath(root)
+                cursor = self._db.execute("UPDATE sessions SET heartbeat=? WHERE root=? AND session=?",
+                                          (now, root, session))
+                if cursor.rowcount == 0:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sessions SELECT ?, ?, ?, ? WHERE NOT EXISTS"
+                        " (SELECT 1 FROM sessions WHERE root=? AND heartbeat >= ?)",
+                        (root, session, now, now, root, now - STALE_AFTER)
+                    )
+            self._db.commit()
+
+    @_best_effort
+    def close_session(self, roots, session):
+        with self._lock:
+            self._db.executemany("UPDATE sessions SET heartbeat=0 WHERE root=? AND session=?",
+                                 [(os.path.abspath(r), session) for r in roots])
+            self._db.commit()
+
+    def live_session(self, root):
+        """Session qui surveille root en ce moment, ou None."""
+        with self._lock:
+            row = self._db.execute("SELECT session, heartbeat FROM sessions WHERE root=?",
+                                   (os.path.abspath(root),)).fetchone()
+        if row and row[1] and time.time() - row[1] <= STALE_AFTER:
+            return row[0]
+        return None
+
+    # --- Backup ---
+    def plan(self, root, target, full_every_days):
+        """
+        (session, curseur, chemins changés sous root depuis le dernier backup vers target) si un
+        backup incrémental est sûr, sinon (None, raison) pour un backup complet.
+        """
+        root, target = os.path.abspath(root), os.path.abspath(target)
+        try:
+            with self._lock:
+                row = self._db.execute("SELECT session, cursor, last_full FROM targets WHERE root=? AND target=?",
+                                       (root, target)).fetchone()
+                upto = self._last_seq()
+                low, high = _under(root)
+                paths = [r[0] for r in self._db.execute(
+                    "SELECT path FROM entries WHERE path >= ? AND path < ? AND seq > ? AND seq <= ? ORDER BY path",
+                    (low, high, row[1] if row else 0, upto))]
+        except sqlite3.Error as e:
+            return None, f"journal illisible ({e})"
+        live = self.live_session(root)
+        if row is None:
+            return None, "aucun backup complet de référence"
+        if live is None:
+            return None, "journal non tenu (MemorEase ou son service arrêté)"
+        if row[0] != live:
+            return None, "surveillance interrompue depuis le dernier backup complet"
+        if _overdue(row[2], full_every_days):
+            return None, f"réconciliation complète périodique ({full_every_days:g} j)"
+        if not os.path.isdir(target):
+            return None, "dossier de backup absent"
+        return (live, upto, paths), None
+
+    def full_due(self, root, target, full_every_days):
+        """
+        Réconciliation périodique due : aucun backup complet de root vers target, ou le dernier
+        date de plus de full_every_days jours. Le backup complet relit alors tous les fichiers.
+        """
+        root, target = os.path.abspath(root), os.path.abspath(target)
+        try:
+            with self._lock:
+                row = self._db.execute("SELECT last_full FROM targets WHERE root=? AND target=?",
+                                       (root, target)).fetchone()
+        except sqlite3.Error:
+            return True
+        return row is None or _overdue(row[0], full_every_days)
+
+    def snapshot(self, root):
+        """(session vivante, dernier numéro du journal) au début d'un backup complet."""
+        with self._lock:
+            upto = self._last_seq()
+        return self.live_session(root), upto
+
+    @_best_effort
+    def advance(self, root, target, session, upto, full=False):
+        """
+        Le backup de root vers target a traité le journal jusqu'à upto. full : backup complet,
+        session (vivante à son début) devient la référence. Les entrées vues par toutes les
+        destinations sont purgées.
+        """
+        root, target = os.path.abspath(root), os.path.abspath(target)
+        with self._lock:
+            if full:
+                self._db.execute("INSERT OR REPLACE INTO targets VALUES (?, ?, ?, ?, ?)",
+                                 (root, target, session, upto, time.time()))
+            else:
+                self._db.execute("UPDATE targets SET cursor=? WHERE root=? AND target=? AND session=?",
+                                 (upto, root, target, session))
+            oldest = self._db.execute("SELECT MIN(cursor) FROM targets WHERE root=?", (root,)).fetchone()[0]
+            low, high = _under(root)
+            self._db.execute("DELETE FROM entries WHERE path >= ? AND path < ? AND seq <= ?", (low, high, oldest or 0))
+            self._db.commit()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+def get_journal():
+    """Journal partagé par tout le processus (ouvert au premier appel)."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = ChangeJournal()
+        return _journal
+
+def set_journal(journal):
+    """Remplace le journal partagé (benchmarks, journal isolé). Retourne le précédent."""
+    global _journal
+    with _journal_lock:
+        previous, _journal = _journal, journal
+    return previous
+
+def enabled():
+    from config import get_config
+    return get_config().journal.enabled
+
+
+class JournalWatcher:
+    """
+    Tient le journal à jour dans un thread dédié : watches inotify récursifs sur roots, un
+    chemin noté par événement (regroupés par lecture), battement toutes les HEARTBEAT_INTERVAL s.
+    roots=None : photos et vidéos de config.json, suivis si la configuration change.
+    Sans inotify, aucune session n'est ouverte et les backups restent complets.
+    """
+
+    def __init__(self, roots=None, journal=None, log_callback=None):
+        self._fixed_roots = [os.path.abspath(r) for r in roots] if roots else None
+        self.journal = journal
+        self.log_callback = log_callback or print
+        self.roots = []             # racines effectivement surveillées
+        self._wanted = []           # racines demandées à l'ouverture de la session
+        self._missing = []          # racines demandées mais absentes à l'ouverture
+        self.session = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- API publique ---
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self._thread is not None and self._stop.is_set():
+            self._thread.join()     # arrêt demandé juste avant : l'ancienne session se ferme d'abord
+        if self.running or not inotify_available():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=False):
+        """wait : attend la fermeture de la session (fin de processus)."""
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    # --- Watches ---
+    def _configured_roots(self):
+        if self._fixed_roots is not None:
+            return self._fixed_roots
+        from config import get_config
+        paths = get_config().paths
+        return [os.path.abspath(p) for p in (paths.photos, paths.videos)]
+
+    def _add_tree(self, notifier, top):
+        """Watch sur top et tous ses sous-dossiers. Retourne les dossiers qui n'ont pas pu être surveillés."""
+        failed = []
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                notifier.add_watch(directory, _WATCH_MASK)
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue            # supprimé entre-temps : l'événement du parent l'a noté
+            except OSError:
+                failed.append(directory)
+                continue
+            stack.extend(e.path for e in entries if e.is_dir(follow_symlinks=False))
+        return failed
+
+    def _drop_tree(self, notifier, top):
+        prefix = os.path.join(top, "")
+        for wd, path in list(notifier.watches.items()):
+            if path == top or path.startswith(prefix):
+                notifier.rm_watch(wd)
+
+    def _open(self, notifier):
+        """(Re)pose les watches sur les racines et ouvre une nouvelle session."""
+        for wd in list(notifier.watches):
+            notifier.rm_watch(wd)
+        if self.session:
+            self.journal.close_session(self.roots, self.session)
+        self.session = uuid.uuid4().hex
+        self._wanted = self._configured_roots()
+        self._missing = [r for r in self._wanted if not os.path.isdir(r)]
+        watched = []
+        for root in [r for r in self._wanted if os.path.isdir(r)]:
+            failed = self._add_tree(notifier, root)
+            if failed:
+                self.log_callback(f"[ERREUR] Journal des changements : {len(failed)} dossier(s) non surveillé(s) "
+                                  f"sous {root}, backups complets.")
+            else:
+                watched.append(root)
+        self.roots = watched
+        # Session ouverte seulement une fois les watches posés : rien entre les deux n'est perdu
+        self.journal.open_session(self.roots, self.session)
+
+    def _changed_roots(self):
+        """Chemins modifiés dans la configuration, ou racine absente à l'ouverture apparue depuis."""
+        wanted = self._configured_roots()
+        return wanted != self._wanted or any(os.path.isdir(r) for r in self._missing)
+
+    # --- Boucle du thread ---
+    def _handle(self, notifier, events):
+        """Note les chemins changés d'une lecture. Retourne False si la session doit être rouverte."""
+        changed = set()
+        ok = True
+        for wd, mask, _, name in events:
+            if mask & IN_Q_OVERFLOW:
+                ok = False
+                break
+            directory = notifier.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF) and directory in self.roots:
+                ok = False
+                break
+            if not name or mask & IN_IGNORED:
+                continue
+            path = os.path.join(directory, name)
+            changed.add(path)
+            if mask & IN_ISDIR:
+                if mask & IN_MOVED_FROM:
+                    self._drop_tree(notifier, path)
+                elif mask & (IN_CREATE | IN_MOVED_TO) and self._add_tree(notifier, path):
+                    ok = False
+                    break
+        # Dossier créé ou arrivé : noté en entier, ses fichiers ont pu précéder la pose du watch
+        if changed:
+            self.journal.record(*changed)
+        return ok
+
+    def _run(self):
+        if self.journal is None:
+            self.journal = get_journal()
+        try:
+            notifier = Inotify()
+        except OSError as e:
+            self.log_callback(f"[ERREUR] Journal des changements indisponible : {e}")
+            return
+        try:
+            self._open(notifier)
+            beat = time.monotonic()
+            while not self._stop.is_set():
+                if not self._handle(notifier, notifier.read_events(timeout=POLL_INTERVAL)):
+                    self._open(notifier)
+                    beat = time.monotonic()
+                elif time.monotonic() - beat >= HEARTBEAT_INTERVAL:
+                    if self._changed_roots():
+                        self._open(notifier)
+                    else:
+                        self.journal.heartbeat(self.roots, self.session)
+                    beat = time.monotonic()
+        finally:
+            notifier.close()
+            if self.session:
+                self.journal.close_session(self.roots, self.session)
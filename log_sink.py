@@ -0,0 +1,219 @@
+import os
+import glob
+import time
+import queue
+import shutil
+import threading
+import tkinter as tk
+from collections import deque
+from datetime import datetime
+from tkinter import TclError
+from utils import log_code
+
+# Nombre de lignes gardées dans le widget / en mémoire pour le filtrage
+WIDGET_MAX_LINES = 5000
+HISTORY_MAX_LINES = 50000
+
+# Rotation des journaux sur disque
+SPILL_MAX_BYTES = 20 * 1024 * 1024
+SPILL_BACKUP_COUNT = 5
+SPILL_KEEP_RUNS = 10
+
+_STOP = object()
+
+
+class LogSpill:
+    """
+    Écriture du journal complet sur disque par un thread dédié, avec rotation par taille
+    (<nom>.log, <nom>.log.1, ...). Seuls les SPILL_KEEP_RUNS derniers journaux d'un même type sont conservés.
+    """
+
+    def __init__(self, log_dir, kind, max_bytes=SPILL_MAX_BYTES, backup_count=SPILL_BACKUP_COUNT):
+        os.makedirs(log_dir, exist_ok=True)
+        self.log_dir = log_dir
+        self.kind = kind
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.path = os.path.join(log_dir, f"{kind}_{datetime.now():%Y%m%d-%H%M%S-%f}.log")
+        self._queue = queue.Queue()
+        self._prune_old_runs()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, line):
+        self._queue.put_nowait(line)
+
+    def flush(self):
+        """Attend que toutes les lignes en file soient écrites sur disque."""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put_nowait(_STOP)
+
+    def files(self):
+        """Fichiers du journal, du plus ancien au plus récent."""
+        rotated = [f"{self.path}.{i}" for i in range(self.backup_count, 0, -1)]
+        return [p for p in rotated + [self.path] if os.path.isfile(p)]
+
+    def export(self, dest):
+        """Concatène le journal complet (fichiers tournés compris) dans dest."""
+        self.flush()
+        with open(dest, "wb") as out:
+            for path in self.files():
+                with open(path, "rb") as f:
+                    shutil.copyfileobj(f, out)
+
+    def _prune_old_runs(self):
+        runs = sorted(glob.glob(os.path.join(self.log_dir, f"{self.kind}_*.log")))
+        excess = len(runs) - (SPILL_KEEP_RUNS - 1)
+        for old in runs[:max(excess, 0)]:
+            for path in glob.glob(old + "*"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _rotate(self, f):
+        f.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        return open(self.path, "a", encoding="utf-8")
+
+    def _run(self):
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                line = self._queue.get()
+                try:
+                    if line is _STOP:
+                        return
+                    f.write(line + "\n")
+                    # On écrit par paquets : flush seulement quand la file est vide
+                    if self._queue.empty():
+                        f.flush()
+                    if f.tell() >= self.max_bytes:
+                        f = self._rotate(f)
+                finally:
+                    self._queue.task_done()
+        finally:
+            f.close()
+
+
+class ConsoleLogSink:
+    """
+    Tampon de logs entre les threads de travail et une console Tk (ScrolledText).
+    - write() se contente d'un deque.append (thread-safe, sans verrou) ;
+    - un seul timer after() vide le tampon toutes les `interval` ms, en une insertion groupée ;
+    - si l'interface ne suit plus (plus de `high_water` lignes en attente), les threads
+      de travail sont ralentis jusqu'à ce que le tampon redescende (contre-pression) ;
+    - le widget ne garde que les `max_lines` dernières lignes ; le journal complet part
+      sur disque via un LogSpill optionnel et reste exportable.
+    """
+
+    def __init__(self, widget, tag=None, interval=100, max_batch=2000, high_water=20000,
+                 max_lines=WIDGET_MAX_LINES, spill=None):
+        self.widget = widget
+        self.tag = tag
+        self.interval = interval
+        self.max_batch = max_batch
+        self.high_water = high_water
+        self.max_lines = max_lines
+        self.spill = spill
+        self.filter_code = None
+        self._history = deque(maxlen=HISTORY_MAX_LINES)
+        self._widget_lines = 0
+        self._pending = deque()
+        self._closed = False
+        self._main_thread = threading.current_thread()
+        self._schedule(self.interval)
+
+    def write(self, message):
+        self._pending.append(message)
+        if self.spill:
+            self.spill.write(message)
+        # Contre-pression uniquement hors du thread Tk (sinon interblocage)
+        if len(self._pending) > self.high_water and threading.current_thread() is not self._main_thread:
+            while len(self._pending) > self.high_water // 2 and not self._closed:
+                time.sleep(0.01)
+
+    __call__ = write
+
+    def set_filter(self, code):
+        """N'affiche plus que les lignes [code] (None = tout) et réaffiche l'historique récent."""
+        self.filter_code = code or None
+        lines = [l for l in self._history if self._visible(l)][-self.max_lines:]
+        try:
+            self.widget.configure(state="normal")
+            self.widget.delete("1.0", tk.END)
+            self._widget_lines = 0
+            self._insert(lines)
+            self.widget.configure(state="disabled")
+        except TclError:
+            self.close()
+
+    def export(self, dest):
+        """Exporte le journal complet (depuis le disque si disponible, sinon l'historique en mémoire)."""
+        if self.spill:
+            self.spill.export(dest)
+        else:
+            with open(dest, "w", encoding="utf-8") as f:
+                f.write("\n".join(self._history) + "\n")
+
+    def close(self):
+        """Arrête le timer (fenêtre détruite), débloque les threads en attente et termine le journal disque."""
+        self._closed = True
+        if self.spill:
+            self.spill.close()
+
+    def _visible(self, line):
+        return self.filter_code is None or log_code(line) == self.filter_code
+
+    def _insert(self, lines):
+        if not lines:
+            return
+        if self.tag:
+            self.widget.insert(tk.END, "\n".join(lines) + "\n", self.tag)
+        else:
+            self.widget.insert(tk.END, "\n".join(lines) + "\n")
+        self._widget_lines += len(lines)
+
+        # Fenêtre glissante : on supprime les plus anciennes lignes du widget
+        excess = self._widget_lines - self.max_lines
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+            self._widget_lines -= excess
+        self.widget.see(tk.END)
+
+    def _schedule(self, delay):
+        try:
+            self.widget.after(delay, self._flush)
+        except TclError:
+            self.close()
+
+    def _flush(self):
+        if self._closed:
+            return
+
+        batch = []
+        pending = self._pending
+        while pending and len(batch) < self.max_batch:
+            batch.append(pending.popleft())
+
+        if batch:
+            self._history.extend(batch)
+            try:
+                self.widget.configure(state="normal")
+                self._insert([l for l in batch if self._visible(l)])
+                self.widget.configure(state="disabled")
+            except TclError:
+                # Widget détruit : plus rien à afficher
+                self.close()
+                return
+
+        # Reste du retard : on repasse tout de suite, en laissant la main à la boucle Tk
+        self._schedule(1 if pending else self.interval)
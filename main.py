@@ -1,4 +1,8 @@
+from startup_bench import StartupProbe
+STARTUP = StartupProbe()
+
 import customtkinter as ctk                                                         # pyright: ignore[reportMissingImports]
+STARTUP.mark("customtkinter")
 import tkinter as tk
 import os
 import threading
@@ -6,10 +10,17 @@ from tkinter import filedialog, scrolledtext, TclError
 from PIL import Image, ImageTk                                                       # pyright: ignore[reportMissingImports]
 from CTkMessagebox import CTkMessagebox                                             # pyright: ignore[reportMissingImports]
 from mtp_tools import run_mtp_download
-from sort_tools import process_files_individually
 from backup import run_backup
+from device_monitor import DeviceMonitor
+from journal import JournalWatcher
+from scheduler import JobScheduler, DEVICE_RESOURCE, DONE, RUNNING, disk_resource
 from spinner_widget import SpinnerWidget
-from update_maker import check_for_update, download_update, launch_new_version
+from log_sink import ConsoleLogSink, LogSpill
+from progress import ProgressTracker, POLL_INTERVAL_MS, poll, describe_transfer, describe_eta
+from transfer import format_rate
+from metrics import RunMetrics
+from config import get_config, get_store, update as update_config, subscribe as subscribe_config
+import profiler
 from utils import (
      resource_path,
      external_path,
@@ -17,8 +28,16 @@ from utils import (
      load_paths,
      save_paths,
      load_backup_path,
-     save_backup_path,
+     CancelFlag,
 )
+STARTUP.mark("imports")
+
+# Modules lourds (imagehash → NumPy/SciPy/PyWavelets, requests) : importés à la demande,
+# et préchargés en arrière-plan une fois la fenêtre principale affichée
+PREWARM_MODULES = ("sort_tools", "pipeline", "update_maker")
+
+# Relecture de config.json si modifié hors de l'application (un simple stat)
+CONFIG_POLL_MS = 2000
 
 def set_window_icon(window, ico_path):
     """Définit l'icône d'une fenêtre Tk de façon compatible Linux (PNG préféré)."""
@@ -34,6 +53,71 @@ def set_window_icon(window, ico_path):
         print(f"Erreur icône: {e}")
 
 
+LOG_DIR = external_path("logs")
+ALL_CODES = "Tous"
+
+def create_log_console(parent, kind, codes, tag=None):
+    """
+    Crée la console de log d'une fenêtre de travail : barre (filtre par code + export)
+    et ScrolledText à fenêtre glissante, dont le journal complet est écrit dans logs/.
+    Retourne (console, sink).
+    """
+    toolbar = ctk.CTkFrame(parent, fg_color="transparent")
+    toolbar.pack(fill="x", padx=10, pady=(5, 0))
+
+    console = scrolledtext.ScrolledText(
+        parent,
+        height=18,
+        state="disabled",
+        font=("IBM Plex Mono", 10),
+        wrap="none"
+    )
+    if tag:
+        console.tag_configure(tag, justify="left")
+
+    try:
+        spill = LogSpill(LOG_DIR, kind)
+    except OSError as e:
+        print(f"Erreur création du journal {kind}: {e}")
+        spill = None
+    sink = ConsoleLogSink(console, tag=tag, spill=spill)
+
+    def export():
+        path = filedialog.asksaveasfilename(
+            defaultextension=".log",
+            initialfile=os.path.basename(spill.path) if spill else f"{kind}.log",
+            filetypes=[("Journal", "*.log"), ("Tous les fichiers", "*.*")]
+        )
+        if path:
+            try:
+                sink.export(path)
+            except OSError as e:
+                CTkMessagebox(title="Export du log", message=str(e), icon="cancel")
+
+    ctk.CTkLabel(toolbar, text="Filtre :").pack(side="left", padx=(0, 5))
+    ctk.CTkOptionMenu(
+        toolbar, values=[ALL_CODES] + list(codes), width=140,
+        command=lambda code: sink.set_filter(None if code == ALL_CODES else code)
+    ).pack(side="left")
+    ctk.CTkButton(toolbar, text="Exporter le log", width=140, command=export).pack(side="right")
+
+    console.pack(pady=10, fill="both", expand=True)
+    return console, sink
+
+
+def create_metrics_panel(parent):
+    """Panneau de résumé sous la console : durées par étape, rempli par show_metrics() en fin de travail."""
+    panel = ctk.CTkLabel(parent, text="", font=("IBM Plex Mono", 10), text_color="#A0A0A0",
+                         justify="left", anchor="w")
+    panel.pack(padx=10, fill="x")
+    return panel
+
+def show_metrics(window, metrics):
+    """Écrit le rapport JSON de l'exécution (reports/) et affiche son résumé. Appelable depuis un thread de travail."""
+    metrics.write()
+    window.after(0, lambda: window.metrics_panel.configure(text="\n".join(metrics.summary_lines())))
+
+
 class ModalWindow(ctk.CTkToplevel):
     def __init__(self, master, title="Fenêtre", size="600x400", icon_path=None):
         super().__init__(master)
@@ -48,6 +132,11 @@ class ModalWindow(ctk.CTkToplevel):
 
         self.protocol("WM_DELETE_WINDOW", self._on_close)
 
+    def watch_config(self, callback):
+        """callback(config, sections) dans le thread Tk à chaque changement de configuration, jusqu'à la fermeture."""
+        unsubscribe = subscribe_config(lambda cfg, sections: self.after(0, callback, cfg, sections))
+        self.bind("<Destroy>", lambda e: unsubscribe() if e.widget is self else None, add="+")
+
     def _safe_set_icon(self, icon_path):
         candidates = []
         if icon_path:
@@ -68,21 +157,20 @@ class ModalWindow(ctk.CTkToplevel):
                 return
 
     def _on_close(self):
+        sink = getattr(self, "log_sink", None)
+        if sink:
+            sink.close()
         try:
             self.grab_release()
         except TclError:
             pass
         self.destroy()
 
-class CancelFlag:
-    def __init__(self):
-        self.cancelled = False
-
 class UpdateWindow(ctk.CTkToplevel):
     def __init__(self, master, update_info):
         super().__init__(master)
         self.title("Mise à jour en cours")
-        self.geometry("900x500")
+        self.geometry("900x540")
         set_window_icon(self, resource_path("icon.ico"))
 
 
@@ -99,6 +187,9 @@ class UpdateWindow(ctk.CTkToplevel):
         except Exception as e:
             CTkMessagebox(title="Erreur UI", message=str(e), icon="cancel")
             print("Erreur _create_widgets UpdateWindow", repr(e))
+
+        self.tracker = ProgressTracker()
+        poll(self, self.tracker, self._update_progress)
             
         threading.Thread(target=self._start_update, daemon=True).start()
 
@@ -110,11 +201,7 @@ class UpdateWindow(ctk.CTkToplevel):
         self.progressbar.set(0)
         self.progressbar.pack(pady=10)
 
-        self.console = scrolledtext.ScrolledText(
-            self, height=18, state="disabled",
-            font=("IBM Plex Mono", 10), wrap="none"
-        )
-        self.console.pack(pady=10, fill="both", expand=True)
+        self.console, self.log_sink = create_log_console(self, "update", ())
 
         btn_frame = ctk.CTkFrame(self)
         btn_frame.pack(pady=10)
@@ -125,43 +212,49 @@ class UpdateWindow(ctk.CTkToplevel):
         self.cancel_button.grid(row=0, column=0, padx=10)
 
         self.finish_button = ctk.CTkButton(
-            btn_frame, text="Terminer", command=self.destroy, state="disabled"
+            btn_frame, text="Terminer", command=self._close, state="disabled"
         )
         self.finish_button.grid(row=0, column=1, padx=10)
 
     def _log(self, message):
-        self.console.configure(state="normal")
-        self.console.insert(tk.END, message + "\n")
-        self.console.see(tk.END)
-        self.console.configure(state="disabled")
+        self.log_sink.write(message)
 
-    def _update_progress(self, done, total):
-        if total == 0:
+    def _close(self):
+        self.log_sink.close()
+        self.destroy()
+
+    def _update_progress(self, snap):
+        if snap.bytes_total == 0:
             self.progressbar.set(0)
             self.progress_label.configure(text="Progression : 0 %")
         else:
-            ratio = done / total
-            self.progressbar.set(ratio)
-            self.progress_label.configure(text=f"Progression : {int(ratio*100)} %")
+            self.progressbar.set(snap.percent / 100)
+            self.progress_label.configure(
+                text=f"Progression : {int(snap.percent)} % — {format_rate(snap.rate)}{describe_eta(snap)}"
+            )
 
     def _request_cancel(self):
         self.cancel_flag.cancelled = True
         self._log("Annulation demandée...")
 
     def _start_update(self):
+        from update_maker import download_update, launch_new_version
         temp_path = download_update(
             self.update_info["url"],
-            log_callback=lambda msg: self.after(0, self._log, msg),
-            progress_callback=lambda d, t: self.after(0, self._update_progress, d, t),
-            cancel_flag=self.cancel_flag
+            log_callback=self._log,
+            progress_callback=self.tracker.set_bytes,
+            cancel_flag=self.cancel_flag,
+            sha256=self.update_info.get("sha256")
         )
+        self.tracker.close()
+        self.after(0, lambda: self._update_progress(self.tracker.snapshot()))
         if temp_path:
             self._log("Mise à jour téléchargée.")
-            launch_new_version(temp_path, log_callback=lambda msg: self.after(0, self._log, msg))
+            launch_new_version(temp_path, log_callback=self._log)
         else:
             self._log("Mise à jour annulée ou échouée.")
-        self.finish_button.configure(state="normal")
-        self.cancel_button.configure(state="disabled")
+        self.after(0, lambda: self.finish_button.configure(state="normal"))
+        self.after(0, lambda: self.cancel_button.configure(state="disabled"))
 
 class MainApp(ctk.CTk):
     def __init__(self):
@@ -170,21 +263,64 @@ class MainApp(ctk.CTk):
         self._load_fonts()
 
         self.secondary_window = None
+        self._update_check_running = False
 
         self._create_menu()
         self._create_main_widgets()
         self._create_footer()
 
+        # Détection des appareils MTP en arrière-plan (plus d'attente gio au lancement)
+        self.device_monitor = DeviceMonitor()
+        self.device_monitor.add_listener(
+            lambda mounts: self.after(0, self._update_device_status, mounts)
+        )
+        self.device_monitor.start()
+
+        # Journal des changements des dossiers triés : backups incrémentaux tant que l'app est ouverte
+        self.journal_watcher = JournalWatcher()
+        if get_config().journal.enabled:
+            self.journal_watcher.start()
+        subscribe_config(self._on_journal_config)
+
+        # Pool partagé pour tous les travaux (téléchargement, tri, backup, import complet)
+        self.scheduler = JobScheduler.from_config()
+        self.after(CONFIG_POLL_MS, self._poll_config)
+
         default_font = ctk.CTkFont(family="IBM Plex Mono", size=12)
         self.option_add("*Font", default_font)
 
         version = self._load_version()
         title   = f"MemorEase" + (f" v{version}" if version else "")
         self.title(title)
-        self.geometry("400x280")
+        self.geometry("400x360")
         self.resizable(False, False)
    
         self.bind("<Map>", lambda e: self.after(50, self._force_icon))
+        self._first_map_done = False
+        self.bind("<Map>", self._on_first_map, add="+")
+
+    def _on_first_map(self, event):
+        if self._first_map_done or event.widget is not self:
+            return
+        self._first_map_done = True
+        # Les redessins Tk sont eux-mêmes en idle : ce callback passe après le premier affichage
+        self.after_idle(self._after_first_paint)
+
+    def _after_first_paint(self):
+        STARTUP.mark("first_paint")
+        threading.Thread(target=self._prewarm_imports, daemon=True).start()
+
+    def _prewarm_imports(self):
+        for name in PREWARM_MODULES:
+            try:
+                STARTUP.timed_import(name)
+            except Exception as e:
+                print(f"Erreur préchargement {name}: {e}")
+        STARTUP.mark("prewarm_done")
+        if STARTUP.enabled:
+            STARTUP.write()
+            if STARTUP.exit_when_done:
+                self.after(0, self.quit)
 
     def _load_fonts(self):
         import shutil
@@ -204,6 +340,19 @@ class MainApp(ctk.CTk):
     def _force_icon(self):
         set_window_icon(self, resource_path("icon.ico"))
 
+    def _on_journal_config(self, config, sections):
+        if "journal" not in sections:
+            return
+        if config.journal.enabled:
+            self.journal_watcher.start()
+        else:
+            self.journal_watcher.stop()
+
+    def _poll_config(self):
+        # Les abonnés (fenêtres de paramètres, service de hachage) sont prévenus par check()
+        get_store().check()
+        self.after(CONFIG_POLL_MS, self._poll_config)
+
     def _open_settings(self):
         self.open_modal(SettingsMTPWindow)
     
@@ -238,7 +387,19 @@ class MainApp(ctk.CTk):
         # Aide > Changelog
         options_menu = tk.Menu(menubar, tearoff=0, font=menu_font)
         options_menu.add_command(label="Changelog", command=self._open_changelog)
-        options_menu.add_command(label="Vérifier les mises à jour", command=self.handle_update_if_needed)
+        options_menu.add_command(label="Vérifier les mises à jour", command=lambda: self.handle_update_if_needed(force=True))
+
+        # Profilage des travaux suivants (profils écrits dans logs/)
+        self.profile_mode_var = tk.StringVar(value=profiler.get_mode())
+        profile_menu = tk.Menu(options_menu, tearoff=0, font=menu_font)
+        for label, mode in (("Désactivé", profiler.OFF),
+                            ("Complet (CPU + mémoire)", profiler.FULL),
+                            ("Échantillonnage léger", profiler.SAMPLE)):
+            profile_menu.add_radiobutton(
+                label=label, value=mode, variable=self.profile_mode_var,
+                command=lambda: profiler.set_mode(self.profile_mode_var.get())
+            )
+        options_menu.add_cascade(label="Profilage", menu=profile_menu)
         menubar.add_cascade(label="Options", menu=options_menu)
 
         self.config(menu=menubar)
@@ -277,6 +438,11 @@ class MainApp(ctk.CTk):
                 "Copier vers un disque ou périphérique externe",
                 self._open_backup_settings,
             ),
+            (
+                "Tout importer",
+                "Télécharger, trier puis sauvegarder en un clic",
+                self._open_full_import,
+            ),
         ]
 
         for btn_text, desc_text, cmd in actions:
@@ -284,12 +450,37 @@ class MainApp(ctk.CTk):
             ctk.CTkLabel(self, text=desc_text, font=sub_font,
                          text_color="#808080").pack(pady=(2, 0))
 
+        self.device_label = ctk.CTkLabel(self, text="Recherche d'un téléphone...",
+                                         font=sub_font, text_color="#A0A0A0")
+        self.device_label.pack(pady=(8, 0))
+
+    def _update_device_status(self, mounts):
+        if any(mounts.values()):
+            self.device_label.configure(text="📱 Téléphone connecté", text_color="green")
+        elif mounts:
+            self.device_label.configure(text="📱 Téléphone monté, DCIM inaccessible", text_color="orange")
+        else:
+            self.device_label.configure(text="Aucun téléphone détecté", text_color="#A0A0A0")
+
     def _open_changelog(self):
         ChangelogWindow(self)
 
     def _open_backup_settings(self):
         self.open_modal(SettingsBackupWindow)
 
+    def _open_full_import(self):
+        backup = load_backup_path()
+        if not backup:
+            CTkMessagebox(
+                title="Tout importer",
+                message="Choisissez d'abord le dossier de backup externe.",
+                icon="warning"
+            )
+            self._open_backup_settings()
+            return
+        save, photos, videos = load_paths()
+        self.open_modal(ImportAllWindow, save, photos, videos, backup)
+
     def open_modal(self, window_class, *args, **kwargs):
         if self.secondary_window is None or not tk.Toplevel.winfo_exists(self.secondary_window):
             self.secondary_window = window_class(self, *args, **kwargs)
@@ -300,8 +491,17 @@ class MainApp(ctk.CTk):
             except Exception as e:
                 print(f"[ERREUR] Impossible de restaurer la fenêtre secondaire : {e}")
 
-    def handle_update_if_needed(self):
-        update_info, local_version, remote_version = check_for_update()
+    def handle_update_if_needed(self, force=False):
+        # Vérification hors du thread Tk : le résultat revient via after().
+        # force : demande explicite (menu), sans le délai minimal entre deux vérifications
+        if self._update_check_running:
+            return
+        self._update_check_running = True
+        from update_maker import check_for_update_async
+        check_for_update_async(lambda *result: self.after(0, self._on_update_checked, *result), force=force)
+
+    def _on_update_checked(self, update_info, local_version, remote_version):
+        self._update_check_running = False
 
         if remote_version is None:
             CTkMessagebox(
@@ -339,16 +539,18 @@ class SettingsMTPWindow(ModalWindow):
     def __init__(self, master):
         super().__init__(master,
                          title="Paramètres de sauvegarde",
-                         size="750x470",
+                         size="750x510",
                          icon_path="icon.ico")
 
         self.download_photos_var = ctk.BooleanVar(value=True)
         self.download_videos_var = ctk.BooleanVar(value=True)
+        self.sort_while_downloading_var = ctk.BooleanVar(value=False)
 
         save, photos, videos = load_paths()
         self.save_var   = tk.StringVar(value=save)
         self.photos_var = tk.StringVar(value=photos)
         self.videos_var = tk.StringVar(value=videos)
+        self.watch_config(self._on_config_change)
 
         try:
             self._create_widgets()
@@ -356,6 +558,12 @@ class SettingsMTPWindow(ModalWindow):
             CTkMessagebox(title="ErreurUI", message=str(e), icon="cancel")
             print("Erreur _create_widgets SettingsMTPWindow", repr(e))
 
+    def _on_config_change(self, config, sections):
+        if "paths" in sections:
+            self.save_var.set(config.paths.save)
+            self.photos_var.set(config.paths.photos)
+            self.videos_var.set(config.paths.videos)
+
     def _create_widgets(self):
         frame = ctk.CTkFrame(self)
         frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -406,6 +614,11 @@ class SettingsMTPWindow(ModalWindow):
             command=self._update_launch_button
         )
         self.cb_videos.grid(row=0, column=1, padx=20)
+        ctk.CTkCheckBox(
+            cb_frame, text="Trier pendant le téléchargement",
+            variable=self.sort_while_downloading_var,
+            border_width=2
+        ).grid(row=1, column=0, columnspan=2, pady=(10, 0))
 
         self.launch_button = ctk.CTkButton(
             self,
@@ -463,13 +676,14 @@ class SettingsMTPWindow(ModalWindow):
             photos_path=self.photos_var.get(),
             videos_path=self.videos_var.get(),
             download_photos=self.download_photos_var.get(),
-            download_videos=self.download_videos_var.get()
+            download_videos=self.download_videos_var.get(),
+            sort_while_downloading=self.sort_while_downloading_var.get()
         )
 
 class MTPWindow(ModalWindow):
     def __init__(self, master, save_path, photos_path, videos_path,
-                 download_photos=True, download_videos=True):
-        super().__init__(master, title="Téléchargement MTP", size="900x500", icon_path="icon.ico")
+                 download_photos=True, download_videos=True, sort_while_downloading=False):
+        super().__init__(master, title="Téléchargement MTP", size="900x640", icon_path="icon.ico")
         
         self.save_path = save_path
         self.photos_path = photos_path
@@ -477,8 +691,10 @@ class MTPWindow(ModalWindow):
 
         self.download_photos = download_photos
         self.download_videos = download_videos
+        self.sort_while_downloading = sort_while_downloading
         
         self.cancel_flag = CancelFlag()
+        self.metrics = RunMetrics("pipeline" if sort_while_downloading else "mtp")
 
         try:
             self._create_widgets()
@@ -486,10 +702,17 @@ class MTPWindow(ModalWindow):
             CTkMessagebox(title="Erreur UI", message=str(e), icon="cancel")
             print("Erreur _create_widgets MTPWindow", repr(e))
 
+        self.tracker = ProgressTracker()
+        poll(self, self.tracker, self._update_progress)
+
         self.spinner = SpinnerWidget(self)
         self.spinner.start()  
 
-        threading.Thread(target=self._start_download, daemon=True).start()
+        self.master.scheduler.submit(
+            lambda job: self._start_download(), "Téléchargement",
+            resources=(DEVICE_RESOURCE, disk_resource(save_path)),
+            cancel_flag=self.cancel_flag
+        )
     
     def _create_widgets(self):
         self.progress_label = ctk.CTkLabel(self, text="Progression : 0 / 0")
@@ -499,14 +722,13 @@ class MTPWindow(ModalWindow):
         self.progressbar.set(0)
         self.progressbar.pack(pady=10)
 
-        self.console = scrolledtext.ScrolledText(
-            self,
-            height=18,
-            state="disabled",
-            font=("IBM Plex Mono", 10),
-            wrap="none"
+        self.transfer_label = ctk.CTkLabel(self, text="", text_color="#A0A0A0")
+        self.transfer_label.pack(pady=(0, 5))
+
+        self.console, self.log_sink = create_log_console(
+            self, "mtp", ("COPIE", "IGNORÉ", "ERREUR", "INFO")
         )
-        self.console.pack(pady=10, fill="both", expand=True)
+        self.metrics_panel = create_metrics_panel(self)
 
         btn_frame = ctk.CTkFrame(self)
         btn_frame.pack(pady=10)
@@ -526,37 +748,49 @@ class MTPWindow(ModalWindow):
         self._log("Annulation demandée...")
     
     def _log(self, message):
-        self.console.configure(state="normal")
-        self.console.insert(tk.END, message + "\n")
-        self.console.see(tk.END)
-        self.console.configure(state="disabled")
+        self.log_sink.write(message)
 
-    def _update_progress(self, done, total):
-        if total == 0:
+    def _update_progress(self, snap):
+        if snap.files_total == 0:
             self.progressbar.set(0)
             self.progress_label.configure(text="Progression : 0 / 0")
         else:
-            ratio = done / total
-            self.progressbar.set(ratio)
-            self.progress_label.configure(text=f"Progression : {done} / {total}")
+            self.progressbar.set(snap.files_done / snap.files_total)
+            self.progress_label.configure(
+                text=f"Progression : {snap.files_done} / {snap.files_total}{describe_eta(snap)}"
+            )
+        self.transfer_label.configure(text=describe_transfer(snap))
 
     def _on_close(self):
         self._request_cancel()
         super()._on_close()
 
     def _start_download(self):
-        run_mtp_download(
+        # Mode pipeline : tri de chaque fichier dès son arrivée
+        if self.sort_while_downloading:
+            from pipeline import run_download_and_sort
+            engine = run_download_and_sort
+        else:
+            engine = run_mtp_download
+        engine(
             self.save_path,
             self.photos_path,
             self.videos_path,
-            log_callback=lambda msg: self.after(0, self._log, msg),
-            progress_callback=lambda d, t: self.after(0, self._update_progress, d, t),
+            log_callback=self._log,
+            progress_callback=self.tracker.set_files,
             cancel_flag=self.cancel_flag,
             download_photos=self.download_photos,
-            download_videos=self.download_videos
+            download_videos=self.download_videos,
+            transfer_callback=self.tracker.set_transfer,
+            device_monitor=self.master.device_monitor,
+            metrics=self.metrics
         )
 
+        self.tracker.close()
+        show_metrics(self, self.metrics)
         self.spinner.stop("✅")
+        self.after(0, lambda: self._update_progress(self.tracker.snapshot()))
+        self.after(0, lambda: self.transfer_label.configure(text=""))
         self.after(0, lambda: self.progress_label.configure(text="✅ Téléchargement terminé"))
         self.after(0, lambda: self.finish_button.configure(state="normal"))
         self.after(0, lambda: self.cancel_button.configure(state="disabled"))
@@ -570,6 +804,7 @@ class SettingsSortWindow(ModalWindow):
         self.var_photos = tk.StringVar(value=photos)
         self.var_videos = tk.StringVar(value=videos)
         self.var_check_duplicates = ctk.BooleanVar(value=True)
+        self.watch_config(self._on_config_change)
 
         try:
             self._create_widgets()
@@ -577,6 +812,12 @@ class SettingsSortWindow(ModalWindow):
             CTkMessagebox(title="Erreur UI", message=str(e), icon="cancel")
             print("Erreur _create_widgets SettingsSortWindow", repr(e))
 
+    def _on_config_change(self, config, sections):
+        if "paths" in sections:
+            self.var_save.set(config.paths.save)
+            self.var_photos.set(config.paths.photos)
+            self.var_videos.set(config.paths.videos)
+
     def _create_widgets(self):
         frame = ctk.CTkFrame(self)
         frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -665,7 +906,7 @@ class SettingsSortWindow(ModalWindow):
 
 class SortWindow(ModalWindow):
     def __init__(self, master, save_path, photos_path, videos_path, check_duplicates=True):
-        super().__init__(master, title="Tri et sauvegarde", size="900x500", icon_path="icon.ico")
+        super().__init__(master, title="Tri et sauvegarde", size="900x620", icon_path="icon.ico")
 
         self.save_path = save_path
         self.photos_path = photos_path
@@ -673,6 +914,7 @@ class SortWindow(ModalWindow):
         self.check_duplicates = check_duplicates
 
         self.cancel_flag = CancelFlag()
+        self.metrics = RunMetrics("sort")
         self.duplicates_removed = 0
 
         try:
@@ -681,10 +923,17 @@ class SortWindow(ModalWindow):
             CTkMessagebox(title="Erreur UI", message=str(e), icon="cancel")
             print("Erreur _create_widgets SortWindow", repr(e))
 
+        self.tracker = ProgressTracker()
+        poll(self, self.tracker, self._update_progress)
+
         self.spinner = SpinnerWidget(self)
         self.spinner.start()
 
-        threading.Thread(target=self._start_sort, daemon=True).start()
+        self.master.scheduler.submit(
+            lambda job: self._start_sort(), "Tri",
+            resources=(disk_resource(save_path), disk_resource(photos_path), disk_resource(videos_path)),
+            cancel_flag=self.cancel_flag
+        )
 
     def _create_widgets(self):
         self.progress_label = ctk.CTkLabel(self, text="Progression : 0%")
@@ -694,14 +943,10 @@ class SortWindow(ModalWindow):
         self.progressbar.set(0)
         self.progressbar.pack(pady=10)
 
-        self.console = scrolledtext.ScrolledText(
-            self,
-            height=18,
-            state="disabled",
-            font=("IBM Plex Mono", 10),
-            wrap="none"
+        self.console, self.log_sink = create_log_console(
+            self, "sort", ("RENAMED", "OK", "SEARCH", "DUPLICAT", "MOVE", "IGNORÉ", "ERREUR")
         )
-        self.console.pack(pady=10, fill="both", expand=True)
+        self.metrics_panel = create_metrics_panel(self)
 
         btn_frame = ctk.CTkFrame(self)
         btn_frame.pack(pady=10)
@@ -717,17 +962,14 @@ class SortWindow(ModalWindow):
         self.finish_button.grid(row=0, column=1, padx=10)
 
     def _log(self, message):
-        self.console.configure(state="normal")
-        self.console.insert(tk.END, message + "\n")
-        self.console.see(tk.END)
-        self.console.configure(state="disabled")
+        self.log_sink.write(message)
 
         if "[DUPLICAT]" in message:
             self.duplicates_removed += 1
 
-    def _update_progress(self, percent):
-        self.progressbar.set(percent / 100)
-        self.progress_label.configure(text=f"Progression : {percent}%")
+    def _update_progress(self, snap):
+        self.progressbar.set(snap.percent / 100)
+        self.progress_label.configure(text=f"Progression : {int(snap.percent)}%{describe_eta(snap)}")
 
     def _request_cancel(self):
         self.cancel_flag.cancelled = True
@@ -735,39 +977,48 @@ class SortWindow(ModalWindow):
 
     def _on_close(self):
         self._request_cancel()
+        self.log_sink.close()
         self.grab_release()
         self.master.secondary_window = None
         self.destroy()
 
     def _start_sort(self):
+        from sort_tools import process_files_individually
         process_files_individually(
             self.save_path,
             self.photos_path,
             self.videos_path,
-            log_callback=lambda msg: self.after(0, self._log, msg),
-            progress_callback=lambda p: self.after(0, self._update_progress, p),
+            log_callback=self._log,
+            progress_callback=self.tracker.set_percent,
             cancel_flag=self.cancel_flag,
-            check_duplicates=self.check_duplicates
+            check_duplicates=self.check_duplicates,
+            metrics=self.metrics
         )
 
+        self.tracker.close()
+        show_metrics(self, self.metrics)
         self.spinner.stop("✅")
+        self.after(0, lambda: self._update_progress(self.tracker.snapshot()))
         self.after(0, lambda: self.progress_label.configure(text="✅ Tri terminé"))
         self.after(0, lambda: self.finish_button.configure(state="normal"))
         self.after(0, lambda: self.cancel_button.configure(state="disabled"))
-        self.after(0, lambda: self._log(f"🔎 Résumé : {self.duplicates_removed} doublon(s) supprimé(s)."))
+        self._log(f"🔎 Résumé : {self.duplicates_removed} doublon(s) supprimé(s).")
 
 class SettingsBackupWindow(ModalWindow):
     def __init__(self, master):
-        super().__init__(master, title="Paramètres du backup HDD", size="750x400", icon_path="icon.ico")
+        super().__init__(master, title="Paramètres du backup HDD", size="750x450", icon_path="icon.ico")
 
-        _, photos, videos = load_paths()
+        settings = get_config()
 
-        self.var_photos = tk.StringVar(value=photos)
-        self.var_videos = tk.StringVar(value=videos)
-        self.var_backup = tk.StringVar(value=load_backup_path())
+        self.var_photos = tk.StringVar(value=settings.paths.photos)
+        self.var_videos = tk.StringVar(value=settings.paths.videos)
+        self.var_backup = tk.StringVar(value=settings.backup.path)
 
-        self.backup_photos_var = ctk.BooleanVar(value=True)
-        self.backup_videos_var = ctk.BooleanVar(value=True)
+        self.backup_photos_var = ctk.BooleanVar(value=settings.backup.photos)
+        self.backup_videos_var = ctk.BooleanVar(value=settings.backup.videos)
+        # Backup complet : non enregistré, à cocher pour chaque vérification
+        self.full_var = ctk.BooleanVar(value=False)
+        self.watch_config(self._on_config_change)
 
         try:
             self._create_widgets()
@@ -775,6 +1026,16 @@ class SettingsBackupWindow(ModalWindow):
             CTkMessagebox(title="Erreur UI", message=str(e), icon="cancel")
             print("Erreur _create_widgets SettingsBackupWindow")
 
+    def _on_config_change(self, config, sections):
+        if "paths" in sections:
+            self.var_photos.set(config.paths.photos)
+            self.var_videos.set(config.paths.videos)
+        if "backup" in sections:
+            self.var_backup.set(config.backup.path)
+            self.backup_photos_var.set(config.backup.photos)
+            self.backup_videos_var.set(config.backup.videos)
+        self._update_widget_states()
+
     def _create_widgets(self):
         frame = ctk.CTkFrame(self)
         frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -822,6 +1083,12 @@ class SettingsBackupWindow(ModalWindow):
         self.entry_bu.grid(row=3, column=2, sticky="ew", padx=5)
         ctk.CTkButton(frame, text="Parcourir", command=lambda: self._browse(self.var_backup, is_backup=True)).grid(row=3, column=3, padx=5)
 
+        # Backup complet : aucun dossier sauté, condensats relus des deux côtés
+        ctk.CTkCheckBox(
+            frame, text="Backup complet (vérifie et relit tous les fichiers, plus lent)",
+            variable=self.full_var, border_width=2
+        ).grid(row=4, column=1, columnspan=3, sticky="w", pady=(15, 5))
+
         # Bouton lancer
         self.launch_button = ctk.CTkButton(
             self,
@@ -884,9 +1151,9 @@ class SettingsBackupWindow(ModalWindow):
             self.entry_bu.configure(border_color="red")
 
     def _launch(self):
-        save, _, _ = load_paths()
-        save_paths(save, self.var_photos.get().strip(), self.var_videos.get().strip())
-        save_backup_path(self.var_backup.get().strip())
+        update_config("paths", photos=self.var_photos.get().strip(), videos=self.var_videos.get().strip())
+        update_config("backup", path=self.var_backup.get().strip(),
+                      photos=self.backup_photos_var.get(), videos=self.backup_videos_var.get())
 
         self.grab_release()
         self.unbind("<FocusIn>")
@@ -899,20 +1166,24 @@ class SettingsBackupWindow(ModalWindow):
             videos_path=self.var_videos.get(),
             backup_path=self.var_backup.get(),
             backup_photos=self.backup_photos_var.get(),
-            backup_videos=self.backup_videos_var.get()
+            backup_videos=self.backup_videos_var.get(),
+            full=self.full_var.get()
         )
 
 class BackupWindow(ModalWindow):
     def __init__(self, master, photos_path, videos_path, backup_path,
-                 backup_photos=True, backup_videos=True):
-        super().__init__(master, title="Exécution du backup", size="900x500", icon_path="icon.ico")
+                 backup_photos=True, backup_videos=True, full=False):
+        super().__init__(master, title="Exécution du backup", size="900x640", icon_path="icon.ico")
 
         self.photo_src = photos_path
         self.video_src = videos_path
         self.backup_dest = backup_path
         self.backup_photos = backup_photos
         self.backup_videos = backup_videos
+        self.full = full
         self.cancel_flag = CancelFlag()
+        self.metrics = RunMetrics("backup")
+        self.tracker = ProgressTracker()
 
         # Label initial sans total fixe (sera mis à jour par callback)
         self.progress_label = ctk.CTkLabel(self, text="Initialisation du module...")
@@ -922,19 +1193,17 @@ class BackupWindow(ModalWindow):
         self.progressbar.set(0)
         self.progressbar.pack(pady=10)
 
+        self.transfer_label = ctk.CTkLabel(self, text="", text_color="#A0A0A0")
+        self.transfer_label.pack(pady=(0, 5))
+
         self.spinner = SpinnerWidget(self)
         self.spinner.spinner_label.pack(pady=(0, 10))
         self.spinner.start()
 
-        self.console = scrolledtext.ScrolledText(
-            self,
-            height=18,
-            state="disabled",
-            font=("IBM Plex Mono", 10),
-            wrap="none"
+        self.console, self.log_sink = create_log_console(
+            self, "backup", ("COPIÉ", "IGNORÉ", "SUPPRIMÉ", "WARN", "STOP", "INFO"), tag="left"
         )
-        self.console.tag_configure("left", justify="left")
-        self.console.pack(pady=10, fill="both", expand=True)
+        self.metrics_panel = create_metrics_panel(self)
 
         btn_frame = ctk.CTkFrame(self)
         btn_frame.pack(pady=10)
@@ -949,19 +1218,22 @@ class BackupWindow(ModalWindow):
         )
         self.finish_button.grid(row=0, column=1, padx=10)
 
-        threading.Thread(target=self._run_backup, daemon=True).start()
+        poll(self, self.tracker, self._update_progress)
+        self.master.scheduler.submit(
+            lambda job: self._run_backup(), "Backup",
+            resources=(disk_resource(photos_path), disk_resource(videos_path), disk_resource(backup_path)),
+            cancel_flag=self.cancel_flag
+        )
 
     def _log(self, msg):
-        self.console.configure(state="normal")
-        self.console.insert(tk.END, msg + "\n", "left")
-        self.console.see(tk.END)
-        self.console.configure(state="disabled")
+        self.log_sink.write(msg)
 
-    def _update_progress(self, done, total):
-        ratio = done / total if total else 0
+    def _update_progress(self, snap):
+        ratio = snap.files_done / snap.files_total if snap.files_total else 0
         self.progressbar.set(ratio)
         percent = round(ratio * 100, 1)
-        self.progress_label.configure(text=f"Progression : {percent}%")
+        self.progress_label.configure(text=f"Progression : {percent}%{describe_eta(snap)}")
+        self.transfer_label.configure(text=describe_transfer(snap))
 
     def _request_cancel(self):
         self.cancel_flag.cancelled = True
@@ -976,19 +1248,130 @@ class BackupWindow(ModalWindow):
             self.photo_src,
             self.video_src,
             self.backup_dest,
-            log_callback=lambda m: self.after(0, self._log, m),
-            progress_callback=lambda d, t: self.after(0, self._update_progress, d, t),
+            log_callback=self._log,
+            progress_callback=self.tracker.set_files,
             cancel_flag=self.cancel_flag,
             backup_photos=self.backup_photos,
-            backup_videos=self.backup_videos
+            backup_videos=self.backup_videos,
+            transfer_callback=self.tracker.set_transfer,
+            metrics=self.metrics,
+            incremental=not self.full
         )
 
+        self.tracker.close()
+        show_metrics(self, self.metrics)
         self.spinner.stop("✅" if success else "⚠")
+        self.after(0, lambda: self._update_progress(self.tracker.snapshot()))
+        self.after(0, lambda: self.transfer_label.configure(text=""))
         msg = "✅ Backup terminé" if success else "⚠ Backup interrompu"
         self.after(0, lambda: self.progress_label.configure(text=msg))
         self.after(0, lambda: self.finish_button.configure(state="normal"))
         self.after(0, lambda: self.cancel_button.configure(state="disabled"))
 
+class ImportAllWindow(ModalWindow):
+    """Import complet : téléchargement → tri → backup, étapes planifiées par le JobScheduler."""
+
+    def __init__(self, master, save_path, photos_path, videos_path, backup_path, check_duplicates=True):
+        super().__init__(master, title="Import complet", size="900x720", icon_path="icon.ico")
+
+        self.cancel_flag = CancelFlag()
+        self.metrics = RunMetrics("import")
+
+        self.progress_label = ctk.CTkLabel(self, text="Téléchargement → tri → backup")
+        self.progress_label.pack(pady=(20, 5))
+
+        jobs_frame = ctk.CTkFrame(self)
+        jobs_frame.pack(pady=5, padx=10, fill="x")
+
+        self.console, self.log_sink = create_log_console(
+            self, "import",
+            ("COPIE", "RENAMED", "DUPLICAT", "MOVE", "COPIÉ", "IGNORÉ", "SUPPRIMÉ", "WARN", "ERREUR", "STOP", "INFO")
+        )
+        self.metrics_panel = create_metrics_panel(self)
+
+        btn_frame = ctk.CTkFrame(self)
+        btn_frame.pack(pady=10)
+
+        self.cancel_button = ctk.CTkButton(
+            btn_frame, text="Annuler", command=self._request_cancel, fg_color="red"
+        )
+        self.cancel_button.grid(row=0, column=0, padx=10)
+
+        self.finish_button = ctk.CTkButton(
+            btn_frame, text="Terminer", command=self._on_close, state="disabled"
+        )
+        self.finish_button.grid(row=0, column=1, padx=10)
+
+        # Module déjà préchargé après le premier affichage (cf. PREWARM_MODULES)
+        from pipeline import schedule_full_import
+        self.jobs = schedule_full_import(
+            master.scheduler, save_path, photos_path, videos_path, backup_path,
+            log_callback=self._log,
+            cancel_flag=self.cancel_flag,
+            check_duplicates=check_duplicates,
+            device_monitor=master.device_monitor,
+            metrics=self.metrics
+        )
+
+        self.rows = []
+        for i, job in enumerate(self.jobs):
+            ctk.CTkLabel(jobs_frame, text=job.label, width=160, anchor="w").grid(row=i, column=0, padx=10, pady=2)
+            status = ctk.CTkLabel(jobs_frame, text=job.status, width=90, anchor="w")
+            status.grid(row=i, column=1, padx=5)
+            bar = ctk.CTkProgressBar(jobs_frame, width=220)
+            bar.set(0)
+            bar.grid(row=i, column=2, padx=5)
+            detail = ctk.CTkLabel(jobs_frame, text="", width=340, anchor="w", text_color="#A0A0A0")
+            detail.grid(row=i, column=3, padx=5)
+            self.rows.append((status, bar, detail))
+
+        self.after(POLL_INTERVAL_MS, self._refresh)
+
+    def _log(self, message):
+        self.log_sink.write(message)
+
+    def _request_cancel(self):
+        self.master.scheduler.cancel(self.jobs)
+        self._log("Annulation demandée…")
+
+    def _on_close(self):
+        self._request_cancel()
+        self.master.secondary_window = None
+        super()._on_close()
+
+    def _refresh(self):
+        try:
+            for job, (status, bar, detail) in zip(self.jobs, self.rows):
+                snap = job.tracker.snapshot()
+                status.configure(text=job.status)
+                bar.set(1 if job.status == DONE else snap.percent / 100)
+                if job.status == RUNNING:
+                    text = describe_transfer(snap) or f"{int(snap.percent)} %{describe_eta(snap)}"
+                elif job.is_finished and job.started is not None:
+                    text = f"{job.elapsed:.1f} s"
+                else:
+                    text = ""
+                detail.configure(text=text)
+
+            if all(job.is_finished for job in self.jobs):
+                self._finish()
+            else:
+                self.after(POLL_INTERVAL_MS, self._refresh)
+        except TclError:
+            pass  # Fenêtre fermée
+
+    def _finish(self):
+        succeeded = sum(job.status == DONE for job in self.jobs)
+        for job in self.jobs:
+            if job.error is not None:
+                self._log(f"[ERREUR] {job.label} : {job.error}")
+        self._log(f"[INFO] Import terminé : {succeeded}/{len(self.jobs)} étape(s) réussie(s).")
+        show_metrics(self, self.metrics)
+        ok = succeeded == len(self.jobs)
+        self.progress_label.configure(text="✅ Import terminé" if ok else "⚠ Import incomplet")
+        self.finish_button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
+
 class ChangelogWindow(ctk.CTkToplevel):
     def __init__(self, master):
         super().__init__(master)
@@ -1024,6 +1407,9 @@ class ChangelogWindow(ctk.CTkToplevel):
         set_window_icon(self, resource_path("icon.ico"))
 
 if __name__ == "__main__":
+    # Exécutable PyInstaller : les processus du pool d'empreintes vidéo ne doivent pas relancer l'interface
+    import multiprocessing
+    multiprocessing.freeze_support()
 
     ctk.set_appearance_mode("System")
     ctk.set_default_color_theme("blue")
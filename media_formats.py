@@ -0,0 +1,394 @@
+"""
+Extensions reconnues et lecture rapide des formats photo étendus (HEIC/HEIF, WebP, RAW).
+
+Pour dater et hacher une photo, inutile de décoder l'image pleine résolution : la date EXIF et
+un aperçu suffisent. Ils sont lus directement dans le conteneur :
+- HEIF (HEIC) : boîtes ISO BMFF meta → iinf (item de type "Exif") et iloc (position de ses
+  octets). L'aperçu est la vignette JPEG de l'IFD1 de cet EXIF si elle existe, sinon la vignette
+  HEVC du fichier via pillow-heif (optionnel), sinon l'image entière via pillow-heif ;
+- WebP : chunk RIFF "EXIF". Le format n'a pas d'aperçu : Pillow décode l'image elle-même ;
+- RAW à structure TIFF (DNG, CR2, NEF, ARW, ORF, RW2) : parcours des IFD (chaîne principale,
+  SubIFDs, IFD EXIF) et plus grand aperçu JPEG embarqué. Sans aperçu lisible, l'image est
+  décodée par Pillow si elle le peut.
+Seuls les octets des en-têtes et de l'aperçu sont lus, jamais les données brutes du capteur.
+Un aperçu n'est retenu que si son format (largeur / hauteur) est celui de l'image principale
+(boîte ispe de l'item principal HEIF, dimensions EXIF ou des IFD TIFF) : une vignette restée
+d'avant une retouche (recadrage, rotation) ne doit pas servir à détecter un doublon.
+"""
+import io
+import os
+import struct
+from datetime import datetime
+
+STANDARD_PHOTO_EXTS = {".jpg", ".jpeg", ".png"}
+HEIF_EXTS = {".heic", ".heif"}
+WEBP_EXTS = {".webp"}
+RAW_EXTS = {".dng", ".cr2", ".nef", ".arw", ".orf", ".rw2"}
+EXTENDED_EXTS = HEIF_EXTS | WEBP_EXTS | RAW_EXTS
+
+PHOTO_EXTS = STANDARD_PHOTO_EXTS | EXTENDED_EXTS
+VIDEO_EXTS = {".mp4", ".mov"}
+
+# Tags TIFF / EXIF utiles
+TAG_NEW_SUBFILE_TYPE = 0x00FE     # 0 = image principale (données du capteur), 1 = aperçu
+TAG_IMAGE_WIDTH = 0x0100
+TAG_IMAGE_LENGTH = 0x0101
+TAG_COMPRESSION = 0x0103
+TAG_STRIP_OFFSETS = 0x0111
+TAG_STRIP_BYTE_COUNTS = 0x0117
+TAG_DATETIME = 0x0132
+TAG_SUB_IFDS = 0x014A
+TAG_JPEG_OFFSET = 0x0201
+TAG_JPEG_LENGTH = 0x0202
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_PIXEL_X_DIMENSION = 0xA002
+TAG_PIXEL_Y_DIMENSION = 0xA003
+TAG_CR2_SLICES = 0xC640           # données brutes découpées (IFD3 des CR2)
+
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+JPEG_COMPRESSIONS = (6, 7)
+MAX_IFDS = 32
+MAX_IFD_ENTRIES = 1000
+MIN_PREVIEW_BYTES = 1024    # en dessous : marqueur vide ou vignette inutilisable
+# Écart relatif de format toléré entre un aperçu et l'image principale (marges des capteurs RAW)
+PREVIEW_ASPECT_TOLERANCE = 0.05
+
+
+def _ext(path):
+    return os.path.splitext(path)[1].lower()
+
+def is_extended(path):
+    return _ext(path) in EXTENDED_EXTS
+
+def is_raw(path):
+    return _ext(path) in RAW_EXTS
+
+
+def _pillow_heif():
+    try:
+        import pillow_heif      # pyright: ignore[reportMissingImports]
+        return pillow_heif
+    except ImportError:
+        return None
+
+
+# --- TIFF (fichiers RAW et blocs EXIF) ---
+def _read_at(f, offset, size):
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("structure TIFF tronquée")
+    return data
+
+
+def _tiff_scan(f, base=0):
+    """
+    Parcourt les IFD d'une structure TIFF commençant à l'octet base de f.
+    Retourne (date EXIF ou None, [(position, longueur) des aperçus JPEG dans f],
+    (largeur, hauteur) de l'image principale ou None) : dimensions EXIF (PixelXDimension /
+    PixelYDimension) si présentes, sinon les plus grandes des IFD.
+    """
+    head = _read_at(f, base, 8)
+    if head[:2] == b"II":
+        order = "<"
+    elif head[:2] == b"MM":
+        order = ">"
+    else:
+        return None, []
+    # Nombre magique ignoré : 42 (TIFF, DNG, CR2, NEF, ARW), variantes ORF et RW2
+    queue = [struct.unpack(order + "I", head[4:8])[0]]
+    seen = set()
+    dates = {}
+    previews = []
+    sizes = []
+    pixels = {}
+
+    def value(entry):
+        typ, count, inline, offset = entry
+        size = TIFF_TYPE_SIZES.get(typ, 1) * count
+        data = inline[:size] if size <= 4 else _read_at(f, base + offset, size)
+        if typ == 2:
+            return data.split(b"\0")[0].decode("ascii", "replace")
+        if typ == 3:
+            return struct.unpack(f"{order}{count}H", data)
+        if typ in (4, 13):
+            return struct.unpack(f"{order}{count}I", data)
+        return data
+
+    while queue and len(seen) < MAX_IFDS:
+        offset = queue.pop(0)
+        if not offset or offset in seen:
+            continue
+        seen.add(offset)
+        try:
+            (n,) = struct.unpack(order + "H", _read_at(f, base + offset, 2))
+            if n > MAX_IFD_ENTRIES:
+                continue
+            raw = _read_at(f, base + offset + 2, 12 * n + 4)
+        except ValueError:
+            continue
+        entries = {}
+        for i in range(n):
+            tag, typ, count = struct.unpack_from(order + "HHI", raw, 12 * i)
+            entries[tag] = (typ, count, raw[12 * i + 8:12 * i + 12],
+                            struct.unpack_from(order + "I", raw, 12 * i + 8)[0])
+        queue.append(struct.unpack_from(order + "I", raw, 12 * n)[0])
+
+        try:
+            for tag in (TAG_SUB_IFDS, TAG_EXIF_IFD):
+                if tag in entries:
+                    queue += list(value(entries[tag]))
+            for tag in (TAG_DATETIME_ORIGINAL, TAG_DATETIME):
+                if tag in entries:
+                    dates.setdefault(tag, value(entries[tag]))
+            for tag in (TAG_PIXEL_X_DIMENSION, TAG_PIXEL_Y_DIMENSION):
+                if tag in entries and entries[tag][0] in (3, 4):
+                    pixels.setdefault(tag, value(entries[tag])[0])
+            if TAG_IMAGE_WIDTH in entries and TAG_IMAGE_LENGTH in entries:
+                sizes.append((value(entries[TAG_IMAGE_WIDTH])[0], value(entries[TAG_IMAGE_LENGTH])[0]))
+            if TAG_JPEG_OFFSET in entries and TAG_JPEG_LENGTH in entries:
+                previews.append((base + value(entries[TAG_JPEG_OFFSET])[0], value(entries[TAG_JPEG_LENGTH])[0]))
+            elif (TAG_STRIP_OFFSETS in entries and TAG_STRIP_BYTE_COUNTS in entries
+                  and TAG_COMPRESSION in entries and TAG_CR2_SLICES not in entries
+                  and value(entries[TAG_COMPRESSION])[0] in JPEG_COMPRESSIONS
+                  and (TAG_NEW_SUBFILE_TYPE not in entries or value(entries[TAG_NEW_SUBFILE_TYPE])[0] & 1)):
+                # Aperçu JPEG en une seule bande (IFD0 des CR2, IFD d'aperçu des DNG) ;
+                # le JPEG sans perte des données brutes est écarté par les deux derniers tests
+                strips = value(entries[TAG_STRIP_OFFSETS])
+                if len(strips) == 1:
+                    previews.append((base + strips[0], value(entries[TAG_STRIP_BYTE_COUNTS])[0]))
+        except (ValueError, struct.error):
+            continue
+
+    if len(pixels) == 2:
+        size = (pixels[TAG_PIXEL_X_DIMENSION], pixels[TAG_PIXEL_Y_DIMENSION])
+    else:
+        size = max(sizes, key=lambda wh: wh[0] * wh[1], default=None)
+    return _parse_date(dates.get(TAG_DATETIME_ORIGINAL) or dates.get(TAG_DATETIME)), previews, size
+
+
+def _parse_date(text):
+    if not isinstance(text, str):
+        return None
+    try:
+        return datetime.strptime(text.strip(), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _strip_exif_header(blob):
+    return blob[6:] if blob.startswith(b"Exif\0\0") else blob
+
+
+# --- HEIF (ISO BMFF) ---
+def _boxes(f, start, end):
+    """(type, début des données, fin) des boîtes entre start et end."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind.decode("latin-1"), pos + header, min(pos + size, end)
+        pos += size
+
+
+def _uint(data, pos, size):
+    return int.from_bytes(data[pos:pos + size], "big") if size else 0, pos + size
+
+
+def _heif_properties(data, start, end, primary):
+    """(largeur, hauteur) de la propriété ispe associée à l'item primary dans la boîte iprp, ou None."""
+    f_prp = io.BytesIO(data)
+    properties, associated = [], []
+    for kind, s, e in _boxes(f_prp, start, end):
+        if kind == "ipco":
+            properties = [(sub, ps) for sub, ps, _ in _boxes(f_prp, s, e)]
+        elif kind == "ipma":
+            version, flags = data[s], data[s + 3]
+            count, pos = _uint(data, s + 4, 4)
+            for _ in range(count):
+                item_id, pos = _uint(data, pos, 2 if version < 1 else 4)
+                n, pos = _uint(data, pos, 1)
+                for _ in range(n):
+                    index, pos = _uint(data, pos, 2 if flags & 1 else 1)
+                    if item_id == primary:
+                        associated.append(index & (0x7FFF if flags & 1 else 0x7F))
+    for index in associated:
+        if 0 < index <= len(properties) and properties[index - 1][0] == "ispe":
+            pos = properties[index - 1][1] + 4
+            width, pos = _uint(data, pos, 4)
+            height, _ = _uint(data, pos, 4)
+            return width, height
+    return None
+
+
+def _heif_meta(f):
+    """(octets de l'item Exif ou None, (largeur, hauteur) de l'item principal ou None) d'un fichier HEIF."""
+    f.seek(0, os.SEEK_END)
+    file_end = f.tell()
+    meta = next(((s, e) for kind, s, e in _boxes(f, 0, file_end) if kind == "meta"), None)
+    if meta is None:
+        return None, None
+    exif_id, locations = None, {}
+    primary, iprp, size = None, None, None
+    for kind, start, end in _boxes(f, meta[0] + 4, meta[1]):
+        f.seek(start)
+        data = f.read(end - start)
+        if kind == "pitm":
+            primary, _ = _uint(data, 4, 2 if data[0] == 0 else 4)
+        elif kind == "iprp":
+            iprp = data
+        elif kind == "iinf":
+            version = data[0]
+            pos = 4 + (2 if version == 0 else 4)
+            f_inf = io.BytesIO(data)
+            for sub, s, e in _boxes(f_inf, pos, len(data)):
+                if sub != "infe" or data[s] < 2:
+                    continue
+                id_size = 2 if data[s] == 2 else 4
+                item_id, p = _uint(data, s + 4, id_size)
+                if data[p + 2:p + 6] == b"Exif":
+                    exif_id = item_id
+        elif kind == "iloc":
+            version = data[0]
+            offset_size, length_size = data[4] >> 4, data[4] & 0x0F
+            base_size, index_size = data[5] >> 4, (data[5] & 0x0F) if version in (1, 2) else 0
+            count, pos = _uint(data, 6, 2 if version < 2 else 4)
+            for _ in range(count):
+                item_id, pos = _uint(data, pos, 2 if version < 2 else 4)
+                method = 0
+                if version in (1, 2):
+                    method, pos = _uint(data, pos, 2)
+                    method &= 0x0F
+                pos += 2                                # data_reference_index
+                base, pos = _uint(data, pos, base_size)
+                extents, pos = _uint(data, pos, 2)
+                spans = []
+                for _ in range(extents):
+                    pos += index_size
+                    offset, pos = _uint(data, pos, offset_size)
+                    length, pos = _uint(data, pos, length_size)
+                    spans.append((base + offset, length))
+                if method == 0:
+                    locations[item_id] = spans
+    # iprp peut précéder pitm : l'item principal n'est connu qu'après le parcours
+    if primary is not None and iprp is not None:
+        size = _heif_properties(iprp, 0, len(iprp), primary)
+    if exif_id is None or exif_id not in locations:
+        return None, size
+    blob = b"".join(_read_at(f, offset, length) for offset, length in locations[exif_id])
+    # Item Exif : décalage (32 bits) jusqu'à l'en-tête TIFF, puis le bloc
+    (skip,) = struct.unpack(">I", blob[:4])
+    return blob[4 + skip:], size
+
+
+# --- WebP (RIFF) ---
+def _webp_exif(f):
+    head = f.read(12)
+    if head[:4] != b"RIFF" or head[8:12] != b"WEBP":
+        return None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        kind, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if kind == b"EXIF":
+            return f.read(size)
+        f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+# --- API ---
+def _scan(path):
+    """
+    (date, [(position, longueur) des aperçus JPEG], bloc EXIF, (largeur, hauteur) de l'image
+    principale ou None) d'un fichier au format étendu.
+    Positions dans le fichier pour un RAW (bloc None), dans le bloc EXIF sinon.
+    """
+    ext = _ext(path)
+    size = None
+    with open(path, "rb") as f:
+        if ext in RAW_EXTS:
+            date, previews, size = _tiff_scan(f)
+            return date, previews, None, size
+        if ext in HEIF_EXTS:
+            blob, size = _heif_meta(f)
+        else:
+            blob = _webp_exif(f)
+    if not blob:
+        return None, [], None, size
+    blob = _strip_exif_header(blob)
+    date, previews, exif_size = _tiff_scan(io.BytesIO(blob))
+    return date, previews, blob, size or exif_size
+
+
+def _same_aspect(size, primary):
+    """L'aperçu de dimensions size a-t-il le format de l'image principale (inconnue : oui) ?"""
+    if not primary or not all(primary):
+        return True
+    a, b = size[0] * primary[1], size[1] * primary[0]
+    return abs(a - b) <= PREVIEW_ASPECT_TOLERANCE * max(a, b)
+
+
+def exif_datetime(path):
+    """Date de prise de vue EXIF d'une photo au format étendu, sans décoder l'image. None si absente."""
+    try:
+        return _scan(path)[0]
+    except (OSError, ValueError, IndexError, struct.error):
+        return None
+
+
+def open_image(path):
+    """
+    Image à hacher pour path : pour un format étendu, le plus grand aperçu JPEG embarqué
+    (ou la vignette HEIF) au format de l'image principale, l'image entière seulement à défaut ;
+    Image.open(path) sinon. Lève une exception si aucune image n'est lisible.
+    """
+    from PIL import Image       # pyright: ignore[reportMissingImports]
+
+    if not is_extended(path):
+        return Image.open(path)
+    try:
+        _, spans, blob, primary = _scan(path)
+    except (OSError, ValueError, IndexError, struct.error):
+        spans, blob, primary = [], None, None
+    # Du plus grand aperçu au plus petit : seuls ses octets sont lus
+    for offset, length in sorted(spans, key=lambda span: span[1], reverse=True):
+        if length < MIN_PREVIEW_BYTES:
+            continue
+        try:
+            if blob is None:
+                with open(path, "rb") as f:
+                    data = _read_at(f, offset, length)
+            else:
+                data = blob[offset:offset + length]
+            if not data.startswith(b"\xff\xd8"):
+                continue
+            img = Image.open(io.BytesIO(data))
+            if not _same_aspect(img.size, primary):
+                continue            # vignette d'avant une retouche
+            img.load()
+            return img
+        except Exception:
+            continue
+
+    if _ext(path) in HEIF_EXTS:
+        heif = _pillow_heif()
+        if heif is None:
+            raise ValueError("aperçu absent et module pillow-heif non installé")
+        image = heif.open_heif(path)
+        for thumbnail in getattr(image, "thumbnails", None) or ():
+            try:
+                if _same_aspect(thumbnail.size, image.size):
+                    return thumbnail.to_pillow()
+            except Exception:
+                continue
+        return image.to_pillow()
+    return Image.open(path)
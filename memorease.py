@@ -0,0 +1,408 @@
+"""
+Interface en ligne de commande de MemorEase (sans customtkinter), pour cron ou un serveur :
+
+    python -m memorease download [--sort] [--no-photos] [--no-videos]
+    python -m memorease sort [--no-duplicates]
+    python -m memorease backup [--dest /media/disque] [--no-photos] [--no-videos] [--full]
+    python -m memorease diff [--dest /media/disque] [--no-photos] [--no-videos] [--rescan]
+    python -m memorease all [--dest /media/disque] [--no-duplicates]
+    python -m memorease catalog reconcile|stats|pending|find [--digest D] [--name N] [--from DATE --to DATE]
+    python -m memorease watch [--no-duplicates] [--debounce SEC] [--workers N]
+
+Les chemins par défaut sont ceux de config.json. La sortie standard reçoit une ligne JSON
+par événement ("log", "progress") puis un "summary" final ; --format text affiche les logs bruts.
+
+watch trie au fil de l'eau chaque fichier arrivé dans le dossier de téléchargement, jusqu'à
+SIGINT/SIGTERM (arrêt normal du service, code 0). Tant qu'il tourne, il tient le journal des
+changements : backup ne traite alors que les chemins notés (--full force le parcours complet
+et la comparaison de tous les fichiers, relus des deux côtés sans le cache de condensats).
+
+diff compare les empreintes de dossiers (merkle.py) de la bibliothèque et du backup et liste les
+sous-arborescences qui diffèrent, sans lire ni comparer les fichiers. Côté backup, il utilise les
+empreintes enregistrées au dernier backup complet ; --rescan ré-empreinte le disque de backup.
+
+Codes de retour : 0 succès, 1 erreur, 2 usage invalide, 3 annulé (SIGINT/SIGTERM), 4 aucun appareil MTP.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+from collections import Counter
+from progress import ProgressTracker
+from metrics import RunMetrics
+from profiler import profile_run
+from utils import load_paths, load_backup_path, log_code, CancelFlag
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_CANCELLED = 3
+EXIT_NO_DEVICE = 4
+
+ERROR_CODES = ("ERREUR",)
+
+
+class Reporter:
+    """
+    Reçoit les callbacks des moteurs et les traduit en lignes JSON (ou texte) sur stdout.
+    La progression est échantillonnée toutes les `interval` secondes par un thread dédié,
+    comme le fait poll() pour l'interface.
+    """
+
+    def __init__(self, command, fmt="json", interval=1.0, stream=None):
+        self.command = command
+        self.fmt = fmt
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.tracker = ProgressTracker()
+        self.metrics = RunMetrics(command)
+        self.counts = Counter()
+        self.messages = []
+        self.cancel_flag = CancelFlag()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._start = time.monotonic()
+
+    def _emit(self, event):
+        with self._lock:
+            self.stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.stream.flush()
+
+    def log(self, message):
+        code = log_code(message)
+        self.counts[code or "AUTRE"] += 1
+        if code in ERROR_CODES:
+            self.messages.append(message)
+        if self.fmt == "json":
+            self._emit({"event": "log", "code": code, "message": message})
+        else:
+            with self._lock:
+                self.stream.write(message + "\n")
+                self.stream.flush()
+
+    def progress_event(self):
+        snap = self.tracker.snapshot()
+        event = {"event": "progress", "percent": round(snap.percent, 1)}
+        if snap.files_total:
+            event.update(done=snap.files_done, total=snap.files_total)
+        if snap.eta is not None:
+            event["eta"] = round(snap.eta, 1)
+        if snap.current and snap.current_done < snap.current_total:
+            event.update(current=snap.current, rate=round(snap.rate))
+        return event
+
+    def result(self, **data):
+        """Résultat d'une requête (sous-commande catalog) : une ligne JSON, ou une ligne par clé en texte."""
+        if self.fmt == "json":
+            self._emit(dict({"event": "result"}, **data))
+        else:
+            with self._lock:
+                for key, value in data.items():
+                    self.stream.write(f"{key} : {json.dumps(value, ensure_ascii=False)}\n")
+                self.stream.flush()
+
+    def job_event(self, job):
+        """Changement d'état d'un job du JobScheduler (sous-commande all)."""
+        if self.fmt == "json":
+            event = {"event": "job", "label": job.label, "status": job.status}
+            if job.error is not None:
+                event["error"] = str(job.error)
+            self._emit(event)
+        else:
+            self.log(f"[INFO] {job.label} : {job.status}")
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            if self.fmt == "json":
+                self._emit(self.progress_event())
+
+    def start(self):
+        self._thread.start()
+
+    def finish(self, exit_code, **extra):
+        self._stop.set()
+        report_path = self.metrics.write()
+        summary = {
+            "event": "summary",
+            "command": self.command,
+            "status": {EXIT_OK: "ok", EXIT_ERROR: "error", EXIT_USAGE: "usage", EXIT_CANCELLED: "cancelled",
+                       EXIT_NO_DEVICE: "no_device"}.get(exit_code, "error"),
+            "exit_code": exit_code,
+            "elapsed": round(time.monotonic() - self._start, 3),
+            "counts": dict(self.counts),
+            "errors": self.messages[-20:],
+            "metrics": self.metrics.report(),
+            "report": report_path,
+        }
+        summary.update(extra)
+        if self.fmt == "json":
+            self._emit(summary)
+        else:
+            with self._lock:
+                self.stream.write(f"[FIN] {summary['status']} en {summary['elapsed']} s — "
+                                  + ", ".join(f"{k}: {v}" for k, v in sorted(self.counts.items())) + "\n")
+                for line in self.metrics.summary_lines():
+                    self.stream.write(f"[INFO] {line}\n")
+                self.stream.flush()
+        return exit_code
+
+    def exit_code(self):
+        """Code de retour déduit de l'annulation et des logs d'erreur."""
+        if self.cancel_flag.cancelled:
+            return EXIT_CANCELLED
+        return EXIT_ERROR if self.messages else EXIT_OK
+
+
+# --- Sous-commandes ---
+def cmd_download(args, reporter):
+    from mtp_tools import run_mtp_download, NO_DEVICE_MESSAGE
+    if args.sort:
+        from pipeline import run_download_and_sort
+        engine = run_download_and_sort
+    else:
+        engine = run_mtp_download
+    engine(
+        args.save, args.photos, args.videos,
+        log_callback=reporter.log,
+        progress_callback=reporter.tracker.set_files,
+        cancel_flag=reporter.cancel_flag,
+        download_photos=not args.no_photos,
+        download_videos=not args.no_videos,
+        transfer_callback=reporter.tracker.set_transfer,
+        metrics=reporter.metrics,
+    )
+    if NO_DEVICE_MESSAGE in reporter.messages:
+        return EXIT_NO_DEVICE
+    return reporter.exit_code()
+
+
+def cmd_sort(args, reporter):
+    from sort_tools import process_files_individually
+    process_files_individually(
+        args.save, args.photos, args.videos,
+        log_callback=reporter.log,
+        progress_callback=reporter.tracker.set_percent,
+        cancel_flag=reporter.cancel_flag,
+        check_duplicates=not args.no_duplicates,
+        metrics=reporter.metrics,
+    )
+    return reporter.exit_code()
+
+
+def cmd_backup(args, reporter):
+    from backup import run_backup
+    if not args.dest:
+        reporter.log("[ERREUR] Aucun dossier de backup (--dest ou config.json).")
+        return EXIT_USAGE
+    success, done, total = run_backup(
+        args.photos, args.videos, args.dest,
+        log_callback=reporter.log,
+        progress_callback=reporter.tracker.set_files,
+        cancel_flag=reporter.cancel_flag,
+        backup_photos=not args.no_photos,
+        backup_videos=not args.no_videos,
+        transfer_callback=reporter.tracker.set_transfer,
+        metrics=reporter.metrics,
+        incremental=not args.full,
+    )
+    code = reporter.exit_code()
+    if code == EXIT_OK and not success:
+        code = EXIT_ERROR
+    return code
+
+
+def cmd_diff(args, reporter):
+    import merkle
+    if not args.dest:
+        reporter.log("[ERREUR] Aucun dossier de backup (--dest ou config.json).")
+        return EXIT_USAGE
+    base_dest = os.path.join(args.dest, "MemorEase_backup")
+    trees, source_trees = merkle.backup_store(args.dest), merkle.source_store()
+    found = []
+    for enabled, label, src_root, name in ((not args.no_photos, "Photos", args.photos, "Photos"),
+                                           (not args.no_videos, "Vidéos", args.videos, "Videos")):
+        if not enabled:
+            continue
+        dst_root = os.path.join(base_dest, name)
+        with reporter.metrics.timer("walk"):
+            source = merkle.scan(src_root)
+            backup = merkle.scan(dst_root) if args.rescan else trees.load(name, dst_root)
+        if not backup and not args.rescan and os.path.isdir(dst_root):
+            reporter.log(f"[WARN] {label} : aucune empreinte enregistrée dans le backup (--rescan pour le parcourir).")
+            continue
+        last = source_trees.load(os.path.abspath(src_root))
+        for rel, state in merkle.diff(source, backup):
+            found.append({
+                "dossier": os.path.join(label, rel) if rel else label,
+                "état": state,
+                # La source a-t-elle changé depuis le dernier backup complet, ou le backup diverge-t-il seul ?
+                "modifié_depuis_le_backup": source.get(rel, (None,))[0] != last.get(rel, (None,))[0],
+            })
+        reporter.metrics.count("dossiers", len(source))
+    reporter.result(diff=found)
+    return reporter.exit_code()
+
+
+def cmd_all(args, reporter):
+    from mtp_tools import NO_DEVICE_MESSAGE
+    from pipeline import schedule_full_import
+    from scheduler import JobScheduler, DONE
+    if not args.dest:
+        reporter.log("[ERREUR] Aucun dossier de backup (--dest ou config.json).")
+        return EXIT_USAGE
+    scheduler = JobScheduler.from_config()
+    scheduler.add_listener(lambda job: reporter.job_event(job))
+    jobs = schedule_full_import(
+        scheduler, args.save, args.photos, args.videos, args.dest,
+        log_callback=reporter.log,
+        cancel_flag=reporter.cancel_flag,
+        check_duplicates=not args.no_duplicates,
+        metrics=reporter.metrics,
+    )
+    # Attente par petits pas pour rester réactif aux signaux
+    while not scheduler.wait(jobs, timeout=0.2):
+        pass
+    if reporter.cancel_flag.cancelled:
+        return EXIT_CANCELLED
+    # Téléchargement en échec : code 4 seulement faute d'appareil, pas pour une exception
+    if jobs[0].status != DONE and NO_DEVICE_MESSAGE in reporter.messages:
+        return EXIT_NO_DEVICE
+    return EXIT_OK if all(job.status == DONE for job in jobs) else EXIT_ERROR
+
+
+def cmd_catalog(args, reporter):
+    from catalog import get_catalog
+    catalog = get_catalog()
+    if args.action == "reconcile":
+        with reporter.metrics.timer("stat"):
+            counts = catalog.reconcile([args.photos, args.videos], log_callback=reporter.log,
+                                       cancel_flag=reporter.cancel_flag)
+        reporter.result(reconcile=counts, stats=catalog.stats())
+    elif args.action == "stats":
+        reporter.result(stats=catalog.stats())
+    elif args.action == "pending":
+        reporter.result(pending=[row["path"] for row in catalog.pending_backup([args.photos, args.videos], args.limit)])
+    else:
+        if args.digest:
+            rows = catalog.find_digest(args.digest)
+        elif args.name:
+            rows = catalog.find_name(args.name)
+        elif args.date_from or args.date_to:
+            end = args.date_to or "9999"
+            if len(end) == len("AAAA-MM-JJ"):
+                end += "T23:59:59"
+            rows = catalog.captured_between(args.date_from or "", end)
+        else:
+            reporter.log("[ERREUR] find : précisez --digest, --name ou --from / --to.")
+            return EXIT_USAGE
+        reporter.result(files=rows[:args.limit] if args.limit else rows)
+    return reporter.exit_code()
+
+
+def cmd_watch(args, reporter):
+    from watcher import FolderWatcher
+    FolderWatcher(
+        args.save, args.photos, args.videos,
+        log_callback=reporter.log,
+        cancel_flag=reporter.cancel_flag,
+        check_duplicates=not args.no_duplicates,
+        debounce=args.debounce,
+        workers=args.workers,
+        progress_callback=reporter.tracker.set_files,
+        metrics=reporter.metrics,
+    ).run()
+    # Pour un service, SIGTERM est l'arrêt attendu et non une annulation
+    return EXIT_ERROR if reporter.messages else EXIT_OK
+
+
+def build_parser():
+    save, photos, videos = load_paths()
+    parser = argparse.ArgumentParser(prog="memorease", description="MemorEase sans interface graphique.")
+    parser.add_argument("--format", choices=("json", "text"), default="json",
+                        help="sortie JSON-lines (défaut) ou logs bruts")
+    parser.add_argument("--progress-interval", type=float, default=1.0, metavar="SEC",
+                        help="intervalle entre deux événements de progression (défaut : 1 s)")
+    parser.add_argument("--save", default=save, help=f"dossier de téléchargement (défaut : {save})")
+    parser.add_argument("--photos", default=photos, help=f"dossier des photos triées (défaut : {photos})")
+    parser.add_argument("--videos", default=videos, help=f"dossier des vidéos triées (défaut : {videos})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("download", help="télécharge le DCIM du téléphone (MTP)")
+    p.add_argument("--sort", action="store_true", help="trie chaque fichier dès son arrivée")
+    p.add_argument("--no-photos", action="store_true")
+    p.add_argument("--no-videos", action="store_true")
+    p.set_defaults(func=cmd_download)
+
+    p = sub.add_parser("sort", help="renomme, dédoublonne et archive le dossier de téléchargement")
+    p.add_argument("--no-duplicates", action="store_true", help="désactive la détection des doublons")
+    p.set_defaults(func=cmd_sort)
+
+    p = sub.add_parser("backup", help="copie miroir des photos/vidéos vers un support externe")
+    p.add_argument("--dest", default=load_backup_path(), help="dossier de backup (défaut : config.json)")
+    p.add_argument("--no-photos", action="store_true")
+    p.add_argument("--no-videos", action="store_true")
+    p.add_argument("--full", action="store_true",
+                   help="parcours complet qui relit et compare tous les fichiers, sans le journal, "
+                        "les empreintes de dossiers ni le cache de condensats")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("diff", help="dossiers qui diffèrent entre la bibliothèque et le backup (empreintes)")
+    p.add_argument("--dest", default=load_backup_path(), help="dossier de backup (défaut : config.json)")
+    p.add_argument("--no-photos", action="store_true")
+    p.add_argument("--no-videos", action="store_true")
+    p.add_argument("--rescan", action="store_true",
+                   help="ré-empreinte le disque de backup au lieu d'utiliser les empreintes enregistrées")
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser("all", help="import complet : téléchargement, tri puis backup")
+    p.add_argument("--dest", default=load_backup_path(), help="dossier de backup (défaut : config.json)")
+    p.add_argument("--no-duplicates", action="store_true", help="désactive la détection des doublons")
+    p.set_defaults(func=cmd_all)
+
+    p = sub.add_parser("catalog", help="catalogue de la bibliothèque : resynchronisation et recherches")
+    p.add_argument("action", choices=("reconcile", "stats", "pending", "find"),
+                   help="reconcile : resynchronise avec le disque (stat uniquement) ; "
+                        "pending : fichiers à sauvegarder ; find : recherche")
+    p.add_argument("--digest", help="find : condensat du contenu")
+    p.add_argument("--name", help="find : nom de fichier exact")
+    p.add_argument("--from", dest="date_from", metavar="DATE", help="find : prises de vue à partir de (AAAA-MM-JJ)")
+    p.add_argument("--to", dest="date_to", metavar="DATE", help="find : prises de vue jusqu'à (AAAA-MM-JJ, inclus)")
+    p.add_argument("--limit", type=int, default=None, help="nombre maximal de résultats")
+    p.set_defaults(func=cmd_catalog)
+
+    p = sub.add_parser("watch", help="service : trie chaque fichier dès son arrivée dans le dossier de téléchargement")
+    p.add_argument("--no-duplicates", action="store_true", help="désactive la détection des doublons")
+    p.add_argument("--debounce", type=float, default=None, metavar="SEC",
+                   help="délai sans écriture avant de prendre un fichier (défaut : config.json)")
+    p.add_argument("--workers", type=int, default=None, help="threads d'analyse (défaut : config.json)")
+    p.set_defaults(func=cmd_watch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    reporter = Reporter(args.command, fmt=args.format, interval=args.progress_interval)
+
+    # Ctrl+C / arrêt du service : annulation propre, comme le bouton "Annuler"
+    def on_signal(signum, frame):
+        reporter.cancel_flag.cancelled = True
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    reporter.start()
+    try:
+        # MEMOREASE_PROFILE=full|sample : profil écrit dans logs/
+        with profile_run(args.command):
+            code = args.func(args, reporter)
+    except Exception as e:
+        reporter.log(f"[ERREUR] {type(e).__name__}: {e}")
+        code = EXIT_ERROR
+    return reporter.finish(code, progress=reporter.progress_event())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
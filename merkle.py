@@ -0,0 +1,241 @@
+"""
+Empreintes de dossiers (arbre de Merkle) : sauter au backup les années qui n'ont pas changé.
+
+L'archive est rangée par <année> et les anciennes années ne changent presque jamais, mais le
+miroir complet compare chacun de leurs fichiers à chaque backup. scan() calcule pour chaque
+dossier deux condensats à partir des seules métadonnées (aucune lecture de contenu) :
+- files : noms, tailles et mtimes des fichiers du dossier ;
+- digest : files et le digest de chaque sous-dossier, avec son nom.
+Deux dossiers de même digest ont donc la même arborescence, aux mêmes tailles et dates.
+Le mtime est comparé à MTIME_RESOLUTION_NS près : les disques FAT / exFAT n'en gardent pas plus.
+
+Les empreintes sont enregistrées des deux côtés après chaque backup complet (TreeStore) :
+- dans le backup (MemorEase_backup/.memorease_tree.sqlite), avec le mtime de chaque dossier
+  copié. Un dossier du backup dont le mtime a changé depuis (fichier ajouté, supprimé ou
+  remplacé, y compris par un backup incrémental) invalide son empreinte et celles de ses parents ;
+- côté bibliothèque (assets/tree_digests.sqlite) : état de la source au dernier backup.
+Au backup suivant, la source est ré-empreinte (stat seulement, disque local) et comparée de haut
+en bas à l'empreinte enregistrée du backup : un dossier identique est sauté d'un bloc, sans
+parcourir ni comparer ses fichiers sur le disque de backup (unchanged_subtrees()).
+Un fichier modifié sur place dans le backup, sans passer par MemorEase, ne change pas le mtime de
+son dossier, quelle que soit sa nouvelle taille : son dossier serait sauté à chaque backup. Le saut
+n'est donc appliqué que sans journal des changements (journal.py) ; un backup complet imposé par le
+journal, ou demandé (incremental=False, --full, « Backup complet » de l'interface), compare tout.
+diff() liste les sous-arborescences qui diffèrent entre source et backup.
+"""
+import os
+import sqlite3
+import hashlib
+from contextlib import closing
+from utils import external_path
+
+SOURCE_TREES_FILE = external_path(os.path.join("assets", "tree_digests.sqlite"))
+BACKUP_TREES_NAME = ".memorease_tree.sqlite"
+
+# Les mtimes sont comparés par tranches de 2 s (résolution de FAT, la plus grossière des disques externes)
+MTIME_RESOLUTION_NS = 2_000_000_000
+
+# États rendus par diff()
+MISSING_IN_BACKUP = "absent du backup"
+MISSING_IN_SOURCE = "absent de la source"
+FILES_DIFFER = "fichiers différents"
+UNKNOWN = "inconnu (dossier illisible, ou modifié dans le backup depuis l'enregistrement)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trees (
+    root TEXT NOT NULL,
+    rel TEXT NOT NULL,
+    digest TEXT,
+    files TEXT,
+    mtime_ns INTEGER,
+    PRIMARY KEY (root, rel)
+);
+"""
+
+
+def _parent(rel):
+    return os.path.dirname(rel) if rel else None
+
+
+def _children(tree):
+    """{dossier relatif: [sous-dossiers relatifs]} d'un arbre d'empreintes."""
+    children = {}
+    for rel in tree:
+        if rel:
+            children.setdefault(_parent(rel), []).append(rel)
+    return children
+
+
+def scan(root):
+    """
+    {dossier relatif: (digest, files)} pour root ('' ) et tous ses sous-dossiers, {} si root est absent.
+    Un dossier illisible, ou qui contient un élément illisible, a (None, None), comme tous ses parents :
+    son contenu est inconnu, il ne sera jamais considéré comme identique.
+    """
+    tree = {}
+
+    def visit(directory, rel):
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            tree[rel] = (None, None)
+            return None
+        files = hashlib.blake2b(digest_size=16)
+        subdirs = []
+        complete = True
+        for entry in entries:
+            name = os.fsencode(entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    sub = visit(entry.path, os.path.join(rel, entry.name))
+                    complete = complete and sub is not None
+                    subdirs.append(b"d\0%s\0%s\n" % (name, (sub or "").encode()))
+                elif entry.is_file():
+                    # Comme le miroir : un lien vers un fichier compte pour le fichier pointé
+                    st = entry.stat()
+                    files.update(b"f\0%s\0%d\0%d\n" % (name, st.st_size, st.st_mtime_ns // MTIME_RESOLUTION_NS))
+            except OSError:
+                complete = False
+        if not complete:
+            tree[rel] = (None, None)
+            return None
+        files_digest = files.hexdigest()
+        digest = hashlib.blake2b(files_digest.encode() + b"".join(subdirs), digest_size=16).hexdigest()
+        tree[rel] = (digest, files_digest)
+        return digest
+
+    if os.path.isdir(root):
+        visit(root, "")
+    return tree
+
+
+def unchanged_subtrees(source, stored):
+    """
+    Dossiers relatifs identiques dans la source et dans le backup (empreintes enregistrées et
+    validées par TreeStore.load), parcourus de haut en bas : un dossier retenu couvre tous ses
+    descendants, qui ne sont pas listés. [''] si la racine entière est inchangée.
+    """
+    children = _children(source)
+    same = []
+    stack = [""] if "" in source else []
+    while stack:
+        rel = stack.pop()
+        digest = source[rel][0]
+        if digest is not None and stored.get(rel, (None,))[0] == digest:
+            same.append(rel)
+        else:
+            stack.extend(children.get(rel, ()))
+    return sorted(same)
+
+
+def diff(source, backup):
+    """
+    Sous-arborescences qui diffèrent entre source et backup, de haut en bas : [(dossier relatif, état)].
+    Un dossier absent d'un côté est signalé seul (pas ses descendants) ; un dossier présent des deux
+    côtés est signalé FILES_DIFFER si ses propres fichiers diffèrent, et ses sous-dossiers différents
+    sont examinés à leur tour.
+    """
+    src_children, dst_children = _children(source), _children(backup)
+    found = []
+    stack = [""] if source or backup else []
+    while stack:
+        rel = stack.pop()
+        if rel not in backup:
+            found.append((rel, MISSING_IN_BACKUP))
+            continue
+        if rel not in source:
+            found.append((rel, MISSING_IN_SOURCE))
+            continue
+        (digest, files), (other, other_files) = source[rel], backup[rel]
+        if digest is not None and digest == other:
+            continue
+        if files is None or other_files is None:
+            found.append((rel, UNKNOWN))
+        elif files != other_files:
+            found.append((rel, FILES_DIFFER))
+        stack.extend(set(src_children.get(rel, ())) | set(dst_children.get(rel, ())))
+    return sorted(found)
+
+
+class TreeStore:
+    """
+    Empreintes enregistrées, par racine (clé libre : nom du dossier de backup, chemin de la source).
+    Une connexion par appel : le fichier peut être sur un disque externe, démonté entre deux backups.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        db.executescript(SCHEMA)
+        return db
+
+    def load(self, root, base=None):
+        """
+        {dossier relatif: (digest, files)} enregistrés pour root, {} si aucun.
+        base : dossier correspondant sur le disque. Un dossier dont le mtime a changé depuis
+        l'enregistrement perd son empreinte, ses parents aussi ; un dossier disparu est retiré.
+        """
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with closing(self._connect()) as db:
+                rows = db.execute("SELECT rel, digest, files, mtime_ns FROM trees WHERE root=?", (root,)).fetchall()
+        except sqlite3.Error as e:
+            print(f"[ERREUR] Empreintes de dossiers illisibles ({self.path}) : {e}")
+            return {}
+        tree = {rel: (digest, files) for rel, digest, files, _ in rows}
+        if base is None:
+            return tree
+        stale = []
+        for rel, _, _, mtime_ns in rows:
+            try:
+                if os.stat(os.path.join(base, rel)).st_mtime_ns != mtime_ns:
+                    stale.append(rel)
+            except FileNotFoundError:
+                tree.pop(rel, None)
+                stale.append(_parent(rel))
+            except OSError:
+                stale.append(rel)
+        for rel in stale:
+            while rel is not None:
+                if rel in tree:
+                    tree[rel] = (None, None)
+                rel = _parent(rel)
+        return tree
+
+    def save(self, root, tree, base):
+        """Remplace les empreintes de root par tree, avec le mtime actuel de chaque dossier sous base."""
+        rows = []
+        for rel, (digest, files) in tree.items():
+            try:
+                rows.append((root, rel, digest, files, os.stat(os.path.join(base, rel)).st_mtime_ns))
+            except OSError:
+                continue
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with closing(self._connect()) as db, db:
+                db.execute("DELETE FROM trees WHERE root=?", (root,))
+                db.executemany("INSERT INTO trees VALUES (?, ?, ?, ?, ?)", rows)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[ERREUR] Enregistrement des empreintes de dossiers impossible ({self.path}) : {e}")
+
+    def clear(self, root):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with closing(self._connect()) as db, db:
+                db.execute("DELETE FROM trees WHERE root=?", (root,))
+        except sqlite3.Error as e:
+            print(f"[ERREUR] Empreintes de dossiers ({self.path}) : {e}")
+
+
+def backup_store(backup_dest):
+    """Empreintes enregistrées sur le disque de backup (backup_dest/MemorEase_backup)."""
+    return TreeStore(os.path.join(backup_dest, "MemorEase_backup", BACKUP_TREES_NAME))
+
+
+def source_store():
+    return TreeStore(SOURCE_TREES_FILE)
@@ -0,0 +1,143 @@
+import os
+import glob
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from utils import external_path
+
+# Rapports JSON : un fichier par exécution, les REPORT_KEEP derniers de chaque type sont conservés
+REPORT_DIR = external_path("reports")
+REPORT_KEEP = 50
+
+# Étapes instrumentées dans les moteurs
+STAGES = ("walk", "stat", "hash", "decode", "phash", "fingerprint", "compare", "copy", "sync", "move", "delete")
+
+
+def _format_bytes(nbytes):
+    for unit in ("o", "Ko", "Mo", "Go"):
+        if nbytes < 1024 or unit == "Go":
+            return f"{nbytes:.0f} {unit}" if unit == "o" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+class RunMetrics:
+    """
+    Chronomètres et compteurs d'une exécution (tri, backup, téléchargement...).
+    Chaque étape accumule durée, nombre d'appels, fichiers et octets ; les compteurs libres
+    (doublons, fichiers ignorés...) s'ajoutent via count(). Thread-safe : le mode pipeline
+    et l'import complet alimentent le même objet depuis plusieurs threads.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.started = datetime.now()
+        self.stages = {}
+        self.counters = {}
+        self._t0 = time.perf_counter()
+        self._elapsed = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage, files=0, nbytes=0):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - t, files, nbytes)
+
+    def add(self, stage, seconds, files=0, nbytes=0):
+        with self._lock:
+            s = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0, "files": 0, "bytes": 0})
+            s["seconds"] += seconds
+            s["calls"] += 1
+            s["files"] += files
+            s["bytes"] += nbytes
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def stop(self):
+        """Fige la durée totale (appelé à la fin du travail)."""
+        if self._elapsed is None:
+            self._elapsed = time.perf_counter() - self._t0
+
+    @property
+    def elapsed(self):
+        return self._elapsed if self._elapsed is not None else time.perf_counter() - self._t0
+
+    def report(self):
+        with self._lock:
+            stages = {name: dict(s, seconds=round(s["seconds"], 4))
+                      for name, s in sorted(self.stages.items(), key=lambda kv: -kv[1]["seconds"])}
+            counters = dict(self.counters)
+        return {
+            "kind": self.kind,
+            "started": self.started.isoformat(timespec="seconds"),
+            "elapsed": round(self.elapsed, 4),
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def summary_lines(self, top=4):
+        """Quelques lignes lisibles pour le panneau de résumé des fenêtres."""
+        report = self.report()
+        total = report["elapsed"] or 1e-9
+        lines = [f"Durée totale : {report['elapsed']:.1f} s"]
+        for name, s in list(report["stages"].items())[:top]:
+            line = f"{name} : {s['seconds']:.2f} s ({s['seconds'] / total:.0%})"
+            if s["files"]:
+                line += f" — {s['files']} fichier(s)"
+            if s["bytes"]:
+                line += f", {_format_bytes(s['bytes'])}"
+            lines.append(line)
+        if report["counters"]:
+            lines.append(" — ".join(f"{k} : {v}" for k, v in sorted(report["counters"].items())))
+        return lines
+
+    def write(self, report_dir=REPORT_DIR):
+        """Écrit le rapport JSON de l'exécution et élague l'historique. Retourne le chemin (None en cas d'échec)."""
+        self.stop()
+        try:
+            os.makedirs(report_dir, exist_ok=True)
+            path = os.path.join(report_dir, f"{self.kind}_{self.started:%Y%m%d-%H%M%S-%f}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, indent=4, ensure_ascii=False)
+            runs = sorted(glob.glob(os.path.join(report_dir, f"{self.kind}_*.json")))
+            for old in runs[:max(len(runs) - REPORT_KEEP, 0)]:
+                os.remove(old)
+            return path
+        except OSError as e:
+            print(f"[ERREUR] Écriture du rapport {self.kind} : {e}")
+            return None
+
+
+class NullMetrics:
+    """Remplaçant sans effet quand l'appelant ne fournit pas de RunMetrics."""
+
+    @contextmanager
+    def timer(self, stage, files=0, nbytes=0):
+        yield
+
+    def add(self, stage, seconds, files=0, nbytes=0):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def load_history(kind, report_dir=REPORT_DIR):
+    """Rapports précédents d'un type donné, du plus ancien au plus récent (comparaison avant / après)."""
+    reports = []
+    for path in sorted(glob.glob(os.path.join(report_dir, f"{kind}_*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return reports
@@ -1,7 +1,12 @@
 import os
-import glob
-import shutil
-import subprocess
+from device_monitor import default_gvfs_base, scan_mounts, try_gio_mount
+from transfer import copy_file, configured_writeback, TransferCancelled
+from metrics import NULL_METRICS
+from utils import get_hash_service
+from catalog import get_catalog
+from media_formats import PHOTO_EXTS, VIDEO_EXTS
+
+NO_DEVICE_MESSAGE = "[ERREUR] Aucun appareil MTP trouvé."
 
 
 def _list_all_files(root_dir):
@@ -13,31 +18,34 @@ def _list_all_files(root_dir):
     return all_files
 
 
-def _find_mtp_dcim(log_callback):
+def _device_name(dcim_path):
+    """Nom de l'appareil d'après le point de montage GVFS (mtp:host=<nom>), sinon None."""
+    for part in dcim_path.split(os.sep):
+        if part.startswith("mtp:host="):
+            return part[len("mtp:host="):]
+    return None
+
+
+def _find_mtp_dcim(log_callback, device_monitor=None):
     """
     Cherche le dossier DCIM/Camera sur un appareil Android monté via MTP (GVFS).
-    Tente un montage automatique via gio si l'appareil n'est pas encore monté.
+    Si un DeviceMonitor actif est fourni, sa liste à jour est utilisée directement (aucune attente).
+    Si aucun appareil n'est monté, tente un montage automatique via gio (sauf moniteur créé avec
+    auto_mount=False) : le moniteur ne le tente qu'à son démarrage, avant que le téléphone soit branché.
     """
-    gvfs_base = f"/run/user/{os.getuid()}/gvfs"
-
-    dcim_suffixes = [
-        "DCIM/Camera",
-        "Internal storage/DCIM/Camera",
-        "Stockage interne/DCIM/Camera",
-        "Phone/DCIM/Camera",
-        "SD card/DCIM/Camera",
-        "Carte SD/DCIM/Camera",
-    ]
-
-    def _scan():
-        if not os.path.isdir(gvfs_base):
+    if device_monitor is not None and device_monitor.running:
+        device_monitor.wait_ready(timeout=5)
+        _scan = device_monitor.dcim_root
+        if not device_monitor.auto_mount:
+            return _scan()
+    else:
+        gvfs_base = default_gvfs_base()
+
+        def _scan():
+            for dcim in scan_mounts(gvfs_base).values():
+                if dcim:
+                    return dcim
             return None
-        for mount in glob.glob(os.path.join(gvfs_base, "mtp:*")):
-            for suffix in dcim_suffixes:
-                dcim_path = os.path.join(mount, suffix)
-                if os.path.isdir(dcim_path):
-                    return dcim_path
-        return None
 
     result = _scan()
     if result:
@@ -45,33 +53,32 @@ def _find_mtp_dcim(log_callback):
 
     # Tentative de montage automatique via gio
     log_callback("[INFO] Tentative de montage automatique de l'appareil...")
-    try:
-        r = subprocess.run(["gio", "mount", "-li"],
-                           capture_output=True, text=True, timeout=5)
-        for line in r.stdout.splitlines():
-            line = line.strip()
-            if line.startswith("mtp://"):
-                subprocess.run(["gio", "mount", line],
-                               capture_output=True, timeout=15)
-                break
-    except Exception:
-        pass
+    if try_gio_mount() and device_monitor is not None and device_monitor.running:
+        device_monitor.refresh()
 
     return _scan()
 
 
 def run_mtp_download(save_path, photos_path, videos_path,
                      log_callback, progress_callback, cancel_flag,
-                     download_photos=True, download_videos=True):
-
-    PHOTO_EXTS = {".jpg", ".jpeg", ".png"}
-    VIDEO_EXTS = {".mp4", ".mov"}
+                     download_photos=True, download_videos=True,
+                     on_file_ready=None, transfer_callback=None, device_monitor=None,
+                     metrics=NULL_METRICS, streaming=None):
+    """
+    Copie les photos/vidéos du DCIM de l'appareil MTP vers save_path.
+    on_file_ready(filename, digest) : appelé dès qu'un fichier est entièrement copié (mode pipeline).
+    Le condensat (algorithme du service de hachage) est calculé pendant la copie et mémorisé
+    dans le cache : ni le tri ni le backup ne relisent le fichier pour le hacher.
+    transfer_callback(filename, copied, size, rate, eta) : progression en octets du fichier en cours.
+    device_monitor : DeviceMonitor actif, évite les tentatives de montage gio bloquantes.
+    streaming : copies en mode flux (transfer.Writeback), None = valeur de config.json (transfer.streaming).
+    """
 
     log_callback("[INFO] Recherche d'un appareil MTP monté...")
-    dcim_path = _find_mtp_dcim(log_callback)
+    dcim_path = _find_mtp_dcim(log_callback, device_monitor)
 
     if not dcim_path:
-        log_callback("[ERREUR] Aucun appareil MTP trouvé.")
+        log_callback(NO_DEVICE_MESSAGE)
         log_callback("[INFO] Branchez le téléphone en mode 'Transfert de fichiers',")
         log_callback("[INFO] puis ouvrez le gestionnaire de fichiers pour le monter.")
         return
@@ -80,9 +87,10 @@ def run_mtp_download(save_path, photos_path, videos_path,
     os.makedirs(save_path, exist_ok=True)
 
     try:
-        all_entries = os.listdir(dcim_path)
-        remote_files = [f for f in all_entries
-                        if os.path.isfile(os.path.join(dcim_path, f))]
+        with metrics.timer("walk"):
+            all_entries = os.listdir(dcim_path)
+            remote_files = [f for f in all_entries
+                            if os.path.isfile(os.path.join(dcim_path, f))]
     except Exception as e:
         log_callback(f"[ERREUR] Impossible de lire DCIM : {repr(e)}")
         return
@@ -94,10 +102,15 @@ def run_mtp_download(save_path, photos_path, videos_path,
 
     processed_files = 0
     downloaded_files = 0
+    hashes = get_hash_service()
+    catalog = get_catalog()
+    writeback = configured_writeback(streaming)
+    device = _device_name(dcim_path)
     progress_callback(processed_files, total_files)
 
-    existing_photos = _list_all_files(photos_path)
-    existing_videos = _list_all_files(videos_path)
+    with metrics.timer("walk"):
+        existing_photos = _list_all_files(photos_path)
+        existing_videos = _list_all_files(videos_path)
 
     for filename in remote_files:
         if cancel_flag.cancelled:
@@ -124,11 +137,25 @@ def run_mtp_download(save_path, photos_path, videos_path,
             log_callback(f"[IGNORÉ] Vidéo déjà présente : {filename}")
         elif ext in PHOTO_EXTS | VIDEO_EXTS:
             log_callback(f"[COPIE] {filename}")
+            on_bytes = None
+            if transfer_callback:
+                on_bytes = lambda c, t, r, e, name=filename: transfer_callback(name, c, t, r, e)
             try:
                 src = os.path.join(dcim_path, filename)
                 dst = os.path.join(save_path, filename)
-                shutil.copy2(src, dst)
+                with metrics.timer("copy", files=1, nbytes=os.path.getsize(src)):
+                    digest = copy_file(src, dst, cancel_flag=cancel_flag, progress_callback=on_bytes,
+                                       hash_algo=hashes.algo, writeback=writeback)
+                hashes.remember(dst, digest)
+                catalog.record(dst, digest=digest, digest_algo=hashes.algo, device=device)
                 downloaded_files += 1
+                metrics.count("copiés")
+                if on_file_ready:
+                    on_file_ready(filename, digest)
+            except TransferCancelled:
+                log_callback(f"[INFO] Copie de {filename} interrompue, fichier partiel supprimé.")
+                log_callback("[INFO] Téléchargement interrompu par l'utilisateur.")
+                break
             except Exception as e:
                 log_callback(f"[ERREUR] {filename} : {repr(e)}")
         else:
@@ -137,5 +164,10 @@ def run_mtp_download(save_path, photos_path, videos_path,
         processed_files += 1
         progress_callback(processed_files, total_files)
 
+    if writeback:
+        with metrics.timer("sync"):
+            writeback.close()
+    hashes.flush()
+    catalog.flush()
     log_callback(f"[FIN] {downloaded_files} fichier(s) copié(s), "
                  f"{processed_files - downloaded_files} ignoré(s).")
@@ -0,0 +1,165 @@
+import queue
+import threading
+from mtp_tools import run_mtp_download, NO_DEVICE_MESSAGE
+from sort_tools import format_log, sort_single_file, process_files_individually
+from backup import run_backup
+from scheduler import DEVICE_RESOURCE, disk_resource
+from metrics import NULL_METRICS
+import video_fingerprint
+from config import get_config
+from dedup import SeenPhotos
+
+# Sentinelle de fin de file
+_DONE = object()
+
+def run_download_and_sort(save_path, photos_path, videos_path,
+                          log_callback, progress_callback, cancel_flag,
+                          download_photos=True, download_videos=True,
+                          check_duplicates=True, transfer_callback=None, device_monitor=None,
+                          metrics=NULL_METRICS):
+    """
+    Mode pipeline : chaque fichier est trié (renommage, doublons, archivage)
+    dès qu'il est arrivé dans save_path, pendant que les suivants se téléchargent.
+    Le temps total tend vers max(téléchargement, analyse) au lieu de leur somme.
+    """
+    pending = queue.Queue()
+    state = {"processed": 0, "total": 0, "queued": 0, "sorted": 0}
+    lock = threading.Lock()
+
+    def report():
+        with lock:
+            done = state["processed"] + state["sorted"]
+            total = state["total"] + state["queued"]
+        progress_callback(done, total)
+
+    def on_download_progress(processed, total):
+        with lock:
+            state["processed"] = processed
+            state["total"] = total
+        report()
+
+    def on_file_ready(filename, digest):
+        with lock:
+            state["queued"] += 1
+        pending.put((filename, digest))
+
+    def sort_worker():
+        seen_images = SeenPhotos(get_config().dedup.time_window)
+        seen_videos = {}
+        video_index = video_fingerprint.VideoIndex() if check_duplicates and video_fingerprint.available() else None
+        while True:
+            item = pending.get()
+            if item is _DONE:
+                break
+            if cancel_flag.cancelled:
+                continue
+            filename, digest = item
+            try:
+                sort_single_file(filename, save_path, photos_path, videos_path, log_callback,
+                                 seen_images, seen_videos,
+                                 check_duplicates=check_duplicates, known_digest=digest, metrics=metrics,
+                                 video_index=video_index)
+            except Exception as e:
+                log_callback(format_log("ERREUR", f"Tri impossible pour {filename}", str(e)))
+            with lock:
+                state["sorted"] += 1
+            report()
+
+    worker = threading.Thread(target=sort_worker, daemon=True)
+    worker.start()
+    try:
+        run_mtp_download(
+            save_path, photos_path, videos_path,
+            log_callback=log_callback,
+            progress_callback=on_download_progress,
+            cancel_flag=cancel_flag,
+            download_photos=download_photos,
+            download_videos=download_videos,
+            on_file_ready=on_file_ready,
+            transfer_callback=transfer_callback,
+            device_monitor=device_monitor,
+            metrics=metrics
+        )
+    finally:
+        pending.put(_DONE)
+        worker.join()
+
+    if cancel_flag.cancelled:
+        log_callback(format_log("STOP", "Opération interrompue par l'utilisateur"))
+    else:
+        log_callback(format_log("FIN", f"Pipeline terminé : {state['sorted']} fichier(s) trié(s)"))
+
+def schedule_full_import(scheduler, save_path, photos_path, videos_path, backup_path,
+                         log_callback, cancel_flag, check_duplicates=True, device_monitor=None,
+                         metrics=NULL_METRICS):
+    """
+    Planifie l'import complet en un clic :
+        téléchargement → tri vidéos → backup vidéos
+                       → tri photos → backup photos
+    Les branches vidéos / photos sont indépendantes : le backup des vidéos peut commencer
+    pendant le tri des photos, si les disques concernés ont un emplacement libre.
+    Retourne la liste des jobs, dans l'ordre d'affichage.
+    """
+    save_disk = disk_resource(save_path)
+    photos_disk = disk_resource(photos_path)
+    videos_disk = disk_resource(videos_path)
+    backup_disk = disk_resource(backup_path)
+
+    def download(job):
+        no_device = []
+
+        def log(message):
+            if message == NO_DEVICE_MESSAGE:
+                no_device.append(message)
+            log_callback(message)
+
+        run_mtp_download(
+            save_path, photos_path, videos_path,
+            log_callback=log,
+            progress_callback=job.tracker.set_files,
+            cancel_flag=job.cancel_flag,
+            transfer_callback=job.tracker.set_transfer,
+            device_monitor=device_monitor,
+            metrics=metrics
+        )
+        return not no_device
+
+    def sort(media):
+        def run(job):
+            process_files_individually(
+                save_path, photos_path, videos_path,
+                log_callback=log_callback,
+                progress_callback=job.tracker.set_percent,
+                cancel_flag=job.cancel_flag,
+                check_duplicates=check_duplicates,
+                media=media,
+                metrics=metrics
+            )
+        return run
+
+    def backup(photos):
+        def run(job):
+            success, _, _ = run_backup(
+                photos_path, videos_path, backup_path,
+                log_callback=log_callback,
+                progress_callback=job.tracker.set_files,
+                cancel_flag=job.cancel_flag,
+                backup_photos=photos,
+                backup_videos=not photos,
+                transfer_callback=job.tracker.set_transfer,
+                metrics=metrics
+            )
+            return success
+        return run
+
+    dl = scheduler.submit(download, "Téléchargement", resources=(DEVICE_RESOURCE, save_disk),
+                          cancel_flag=cancel_flag)
+    sort_videos = scheduler.submit(sort("videos"), "Tri des vidéos", deps=(dl,),
+                                   resources=(save_disk, videos_disk), cancel_flag=cancel_flag)
+    sort_photos = scheduler.submit(sort("photos"), "Tri des photos", deps=(dl,),
+                                   resources=(save_disk, photos_disk), cancel_flag=cancel_flag)
+    backup_videos = scheduler.submit(backup(False), "Backup des vidéos", deps=(sort_videos,),
+                                     resources=(videos_disk, backup_disk), cancel_flag=cancel_flag)
+    backup_photos = scheduler.submit(backup(True), "Backup des photos", deps=(sort_photos,),
+                                     resources=(photos_disk, backup_disk), cancel_flag=cancel_flag)
+    return [dl, sort_videos, sort_photos, backup_videos, backup_photos]
@@ -0,0 +1,228 @@
+"""
+Mode profilage de MemorEase, utilisable dans l'exécutable empaqueté.
+
+Activation : variable d'environnement MEMOREASE_PROFILE (full / sample) ou menu Options > Profilage.
+- full   : cProfile + tracemalloc sur le thread du travail → <nom>_<date>.prof (pstats / snakeviz),
+           <nom>_<date>.prof.txt (fonctions les plus coûteuses) et <nom>_<date>.mem.txt (top allocations) ;
+- sample : échantillonnage de la pile toutes les SAMPLE_INTERVAL s via sys._current_frames(),
+           assez léger pour tout un tri → <nom>_<date>.folded (flamegraph) et <nom>_<date>.sample.txt.
+Les fichiers sont écrits à côté des journaux (logs/).
+"""
+import os
+import re
+import io
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from utils import external_path
+
+ENV_PROFILE = "MEMOREASE_PROFILE"
+PROFILE_DIR = external_path("logs")
+
+OFF = "off"
+FULL = "full"
+SAMPLE = "sample"
+MODES = (OFF, FULL, SAMPLE)
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 10
+SAMPLE_INTERVAL = 0.01
+SAMPLE_MAX_DEPTH = 64
+
+
+def _mode_from_env():
+    value = os.environ.get(ENV_PROFILE, "").strip().lower()
+    if value in ("", "0", "off", "false"):
+        return OFF
+    return SAMPLE if value == SAMPLE else FULL
+
+_mode = _mode_from_env()
+_tracemalloc_users = 0
+_lock = threading.Lock()
+
+
+def get_mode():
+    return _mode
+
+def set_mode(mode):
+    """Change le mode pour les prochains travaux (menu Options)."""
+    global _mode
+    if mode not in MODES:
+        raise ValueError(f"Mode de profilage inconnu : {mode}")
+    _mode = mode
+
+
+def slugify(label):
+    """'Tri des photos' -> 'tri_des_photos' (nom de fichier)."""
+    text = unicodedata.normalize("NFKD", label).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_") or "job"
+
+
+def _read_rss():
+    """Mémoire résidente du processus en octets (Linux), ou None."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Relève la pile d'un thread à intervalle fixe et agrège les piles identiques."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.peak_rss = _read_rss() or 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < SAMPLE_MAX_DEPTH:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            if self.samples % 50 == 0:
+                self.peak_rss = max(self.peak_rss, _read_rss() or 0)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, base):
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+        own = Counter()
+        inclusive = Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += n
+            for label in set(frames):
+                inclusive[label] += n
+
+        total = self.samples or 1
+        with open(base + ".sample.txt", "w", encoding="utf-8") as f:
+            f.write(f"{self.samples} échantillons, toutes les {self.interval * 1000:.0f} ms\n")
+            f.write(f"Mémoire résidente max : {self.peak_rss / 1024 / 1024:.1f} Mo\n\n")
+            f.write("Temps propre (fonction en haut de pile) :\n")
+            for label, n in own.most_common(TOP_FUNCTIONS):
+                f.write(f"{n / total:7.1%}  {label}\n")
+            f.write("\nTemps inclusif :\n")
+            for label, n in inclusive.most_common(TOP_FUNCTIONS):
+                f.write(f"{n / total:7.1%}  {label}\n")
+        return [base + ".folded", base + ".sample.txt"]
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracemalloc_users += 1
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+def _write_memory(base, snapshot, peak):
+    path = base + ".mem.txt"
+    # Les allocations du profileur lui-même ne nous intéressent pas
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, module.__file__) for module in (sys.modules[__name__], cProfile, pstats, tracemalloc)
+    ])
+    stats = snapshot.statistics("lineno")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Pic tracé par tracemalloc : {peak / 1024 / 1024:.1f} Mo\n\n")
+        f.write(f"Top {TOP_ALLOCATIONS} des sites d'allocation encore vivants en fin de travail :\n")
+        for stat in stats[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            f.write(f"{stat.size / 1024:10.1f} Ko  {stat.count:8d} blocs  {frame.filename}:{frame.lineno}\n")
+    return path
+
+def _write_cpu(base, profile):
+    profile.dump_stats(base + ".prof")
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    with open(base + ".prof.txt", "w", encoding="utf-8") as f:
+        f.write(out.getvalue())
+    return [base + ".prof", base + ".prof.txt"]
+
+
+@contextmanager
+def profile_run(name, mode=None, profile_dir=PROFILE_DIR):
+    """
+    Profile le bloc exécuté dans le thread courant selon le mode (courant par défaut).
+    Produit une liste de chemins des fichiers écrits (vide si le profilage est désactivé).
+    """
+    mode = mode or _mode
+    written = []
+    if mode == OFF:
+        yield written
+        return
+
+    os.makedirs(profile_dir, exist_ok=True)
+    base = os.path.join(profile_dir, f"profile_{slugify(name)}_{datetime.now():%Y%m%d-%H%M%S-%f}")
+
+    profile = None
+    sampler = None
+    if mode == FULL:
+        _start_tracemalloc()
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Un autre profileur est déjà actif (travaux simultanés) : repli sur l'échantillonnage
+            profile = None
+    if profile is None:
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+
+    t0 = time.perf_counter()
+    try:
+        yield written
+    finally:
+        elapsed = time.perf_counter() - t0
+        try:
+            if profile is not None:
+                profile.disable()
+            if sampler is not None:
+                sampler.stop()
+            if mode == FULL:
+                _, peak = tracemalloc.get_traced_memory()
+                written.append(_write_memory(base, tracemalloc.take_snapshot(), peak))
+            if profile is not None:
+                written.extend(_write_cpu(base, profile))
+            if sampler is not None:
+                written.extend(sampler.write(base))
+        except OSError as e:
+            print(f"[ERREUR] Écriture du profil {name} : {e}")
+        finally:
+            if mode == FULL:
+                _stop_tracemalloc()
+        print(f"[INFO] Profil {name} ({mode}, {elapsed:.1f} s) : {', '.join(written)}", file=sys.stderr)
@@ -0,0 +1,155 @@
+import time
+from collections import namedtuple
+from transfer import format_rate, format_eta
+
+# Fréquence d'échantillonnage de l'interface (~10 Hz)
+POLL_INTERVAL_MS = 100
+
+ProgressSnapshot = namedtuple("ProgressSnapshot", [
+    "files_done", "files_total",     # fichiers traités / à traiter
+    "bytes_done", "bytes_total",     # octets (téléchargement de mise à jour)
+    "percent",                       # 0..100, fourni par le moteur ou déduit des fichiers
+    "rate",                          # débit lissé en octets/s (0 si pas de transfert)
+    "eta",                           # secondes restantes estimées, None si inconnu
+    "current",                       # nom du fichier en cours de copie, ou ""
+    "current_done", "current_total", # octets du fichier en cours
+    "current_eta",                   # temps restant du fichier en cours
+])
+
+
+class ProgressTracker:
+    """
+    Agrégateur de progression partagé entre un moteur (thread de travail) et l'interface.
+    Les méthodes de mise à jour ont les signatures des callbacks des moteurs
+    (progress_callback, transfer_callback) et ne font que des affectations :
+    aucun appel Tk n'est fait depuis le thread de travail. L'interface lit
+    un ProgressSnapshot à fréquence fixe via poll().
+    """
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.files_done = 0
+        self.files_total = 0
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.percent = None
+        self.current = ""
+        self.current_done = 0
+        self.current_total = 0
+        self.current_rate = 0.0
+        self.current_eta = None
+        self.closed = False
+
+        self._last_time = None
+        self._last_files = 0
+        self._last_percent = 0.0
+        self._files_rate = 0.0
+        self._percent_rate = 0.0
+        self._bytes_rate = 0.0
+        self._last_bytes = 0
+
+    # --- Côté moteur ---
+    def set_files(self, done, total):
+        """Compatible avec progress_callback(done, total) des moteurs MTP et backup."""
+        self.files_done = done
+        self.files_total = total
+
+    def set_percent(self, percent):
+        """Compatible avec progress_callback(percent) du moteur de tri."""
+        self.percent = percent
+
+    def set_bytes(self, done, total):
+        """Progression en octets d'un téléchargement unique (mise à jour)."""
+        self.bytes_done = done
+        self.bytes_total = total
+
+    def set_transfer(self, name, copied, size, rate, eta):
+        """Compatible avec transfer_callback(name, copied, size, rate, eta)."""
+        self.current = name
+        self.current_done = copied
+        self.current_total = size
+        self.current_rate = rate
+        self.current_eta = eta
+
+    def close(self):
+        """Signale la fin du travail : poll() s'arrête sans redessiner."""
+        self.closed = True
+
+    # --- Côté interface ---
+    def _smooth(self, previous, instant):
+        return instant if previous == 0 else self.smoothing * instant + (1 - self.smoothing) * previous
+
+    def snapshot(self):
+        now = time.monotonic()
+        files_done, files_total = self.files_done, self.files_total
+        bytes_done, bytes_total = self.bytes_done, self.bytes_total
+        percent = self.percent
+        if percent is None:
+            if files_total:
+                percent = files_done / files_total * 100
+            elif bytes_total:
+                percent = bytes_done / bytes_total * 100
+            else:
+                percent = 0
+
+        if self._last_time is not None:
+            elapsed = now - self._last_time
+            if elapsed > 0:
+                self._files_rate = self._smooth(self._files_rate, (files_done - self._last_files) / elapsed)
+                self._percent_rate = self._smooth(self._percent_rate, (percent - self._last_percent) / elapsed)
+                self._bytes_rate = self._smooth(self._bytes_rate, (bytes_done - self._last_bytes) / elapsed)
+        self._last_time = now
+        self._last_files = files_done
+        self._last_percent = percent
+        self._last_bytes = bytes_done
+
+        # ETA : octets si connus, sinon fichiers, sinon pourcentage
+        eta = None
+        if bytes_total and self._bytes_rate > 0:
+            eta = (bytes_total - bytes_done) / self._bytes_rate
+        elif files_total and self._files_rate > 0:
+            eta = (files_total - files_done) / self._files_rate
+        elif self._percent_rate > 0:
+            eta = (100 - percent) / self._percent_rate
+
+        rate = self._bytes_rate if bytes_total else self.current_rate
+        return ProgressSnapshot(
+            files_done, files_total, bytes_done, bytes_total, percent, rate, eta,
+            self.current, self.current_done, self.current_total, self.current_eta,
+        )
+
+
+def describe_transfer(snap):
+    """Texte du fichier en cours de copie ('' si aucun transfert en cours)."""
+    if not snap.current or snap.current_done >= snap.current_total:
+        return ""
+    percent = int(snap.current_done / snap.current_total * 100)
+    return (f"{snap.current} — {percent} % — {format_rate(snap.rate)} "
+            f"— reste {format_eta(snap.current_eta)}")
+
+
+def describe_eta(snap):
+    """Suffixe ' — reste m:ss' si une estimation est disponible."""
+    return f" — reste {format_eta(snap.eta)}" if snap.eta is not None else ""
+
+
+def poll(widget, tracker, render, interval=POLL_INTERVAL_MS):
+    """
+    Échantillonne tracker toutes les `interval` ms et appelle render(snapshot) dans le thread Tk.
+    S'arrête dès que tracker.close() a été appelé ou que le widget est détruit. Les autres
+    erreurs de render remontent à Tk (report_callback_exception) au lieu d'être tues.
+    """
+    # Importé ici : la CLI utilise ProgressTracker sans tkinter
+    from tkinter import TclError
+
+    def tick():
+        if tracker.closed:
+            return
+        try:
+            render(tracker.snapshot())
+            widget.after(interval, tick)
+        except TclError:
+            # Fenêtre détruite : on arrête l'échantillonnage
+            tracker.close()
+
+    widget.after(interval, tick)
@@ -0,0 +1,210 @@
+import os
+import time
+import queue
+import threading
+from collections import Counter
+from progress import ProgressTracker
+from profiler import profile_run
+from utils import CancelFlag
+
+# États d'un job
+PENDING = "en attente"
+RUNNING = "en cours"
+DONE = "terminé"
+FAILED = "échec"
+CANCELLED = "annulé"
+SKIPPED = "ignoré"
+FINISHED = (DONE, FAILED, CANCELLED, SKIPPED)
+
+# Ressources arbitrées : le téléphone (MTP, un seul flux à la fois) et chaque disque
+DEVICE_RESOURCE = "device:mtp"
+DEVICE_SLOTS = 1
+DISK_SLOTS = 2  # deux flux par disque : un tri et un backup peuvent se chevaucher
+
+DEFAULT_WORKERS = 4
+
+
+def disk_resource(path):
+    """Ressource 'disk:<st_dev>' du disque qui porte path (ou son premier parent existant)."""
+    path = os.path.abspath(path or "/")
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    try:
+        return f"disk:{os.stat(path).st_dev}"
+    except OSError:
+        return f"disk:{path}"
+
+
+class Job:
+    """
+    Étape planifiée : func(job) est appelée dans un thread du pool une fois les dépendances
+    terminées avec succès et les ressources disponibles. Elle publie sa progression dans
+    job.tracker et surveille job.cancel_flag ; retourner False signale un échec.
+    """
+
+    def __init__(self, func, label, deps=(), resources=(), cancel_flag=None):
+        self.func = func
+        self.label = label
+        self.deps = tuple(deps)
+        self.resources = frozenset(resources)
+        self.cancel_flag = cancel_flag or CancelFlag()
+        self.tracker = ProgressTracker()
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.profile_files = []
+        self._done = threading.Event()
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def __repr__(self):
+        return f"<Job {self.label!r} {self.status}>"
+
+
+class JobScheduler:
+    """
+    Pool de threads partagé + graphe de dépendances entre jobs.
+    Un job n'est lancé que si toutes ses dépendances sont DONE et si chacune de ses ressources
+    a encore un emplacement libre (DEVICE_SLOTS pour le téléphone, DISK_SLOTS par disque) ;
+    les ressources sont prises en bloc, ce qui évite tout interblocage.
+    Si une dépendance échoue ou est annulée, les jobs qui en dépendent passent à SKIPPED.
+    Les écouteurs reçoivent le job à chaque changement d'état (depuis un thread du pool).
+    from_config() reprend le nombre de threads et d'emplacements de la section concurrency.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, limits=None, disk_slots=DISK_SLOTS, device_slots=DEVICE_SLOTS):
+        self.limits = dict(limits or {})
+        self.disk_slots = disk_slots
+        self.device_slots = device_slots
+        self._jobs = []
+        self._usage = Counter()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._listeners = []
+        for _ in range(max_workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    @classmethod
+    def from_config(cls, config=None):
+        if config is None:
+            from config import get_config
+            config = get_config()
+        c = config.concurrency
+        return cls(max_workers=c.workers, disk_slots=c.disk_slots, device_slots=c.device_slots)
+
+    # --- API publique ---
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def submit(self, func, label, deps=(), resources=(), cancel_flag=None):
+        job = Job(func, label, deps, resources, cancel_flag)
+        with self._lock:
+            self._jobs.append(job)
+        self._dispatch()
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def cancel(self, jobs=None):
+        """Annule les jobs donnés (tous par défaut) : en attente → CANCELLED, en cours → cancel_flag levé."""
+        for job in jobs if jobs is not None else self.jobs():
+            job.cancel_flag.cancelled = True
+        self._dispatch()
+
+    def wait(self, jobs=None, timeout=None):
+        """Attend la fin des jobs donnés (tous par défaut). Retourne True si tous sont terminés."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in jobs if jobs is not None else self.jobs():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not job.wait(remaining):
+                return False
+        return True
+
+    # --- Interne ---
+    def _limit(self, resource):
+        if resource in self.limits:
+            return self.limits[resource]
+        return self.device_slots if resource.startswith("device:") else self.disk_slots
+
+    def _available(self, job):
+        return all(self._usage[r] < self._limit(r) for r in job.resources)
+
+    def _set_status(self, job, status):
+        job.status = status
+        if status in FINISHED:
+            job.finished = time.monotonic()
+            job.tracker.close()
+            job._done.set()
+
+    def _dispatch(self):
+        """Lance les jobs prêts et propage annulations / échecs. Rejoue jusqu'à stabilité."""
+        changed = []
+        with self._lock:
+            progress = True
+            while progress:
+                progress = False
+                for job in self._jobs:
+                    if job.status != PENDING:
+                        continue
+                    if job.cancel_flag.cancelled:
+                        self._set_status(job, CANCELLED)
+                    elif any(dep.status in (FAILED, CANCELLED, SKIPPED) for dep in job.deps):
+                        self._set_status(job, SKIPPED)
+                    elif all(dep.status == DONE for dep in job.deps) and self._available(job):
+                        for r in job.resources:
+                            self._usage[r] += 1
+                        job.started = time.monotonic()
+                        self._set_status(job, RUNNING)
+                        self._queue.put(job)
+                    else:
+                        continue
+                    changed.append(job)
+                    progress = True
+        for job in changed:
+            self._notify(job)
+
+    def _notify(self, job):
+        for callback in list(self._listeners):
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"[ERREUR] Écouteur JobScheduler : {e}")
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                # Profilage éventuel (MEMOREASE_PROFILE ou menu Options), un profil par job
+                with profile_run(job.label) as job.profile_files:
+                    job.result = job.func(job)
+                if job.cancel_flag.cancelled:
+                    status = CANCELLED
+                else:
+                    status = FAILED if job.result is False else DONE
+            except Exception as e:
+                job.error = e
+                status = FAILED
+            with self._lock:
+                for r in job.resources:
+                    self._usage[r] -= 1
+                self._set_status(job, status)
+            self._notify(job)
+            self._dispatch()
@@ -1,11 +1,19 @@
 import os
 import re
+import time
 import shutil
-import imagehash                        # pyright: ignore[reportMissingImports]
 from datetime import datetime
 from PIL import Image                   # pyright: ignore[reportMissingImports]
 from PIL.ExifTags import TAGS           # pyright: ignore[reportMissingImports]
-from utils import file_md5
+from utils import get_hash_service
+from catalog import get_catalog
+from journal import get_journal
+from config import get_config
+from dedup import SeenPhotos, PhotoHashes, MAX_INTERVAL, cached_hashes, store_hashes
+import video_fingerprint
+import media_formats
+from media_formats import PHOTO_EXTS, VIDEO_EXTS
+from metrics import NULL_METRICS
 
 # -------------------------------
 # Formatage des logs
@@ -19,24 +27,21 @@ def format_log(code, action, target=""):
     else:
         return f"{code_col}{action}"
 
-# -------------------------------
-# Extensions reconnues
-# -------------------------------
-PHOTO_EXTS = {".jpg", ".jpeg", ".png"}
-VIDEO_EXTS = {".mp4", ".mov"}
-
 # -------------------------------
 # Regex formats attendus
 # -------------------------------
-PHOTO_PATTERN = re.compile(r"^IMG_(\d{4})_(\d{2})_(\d{2})-(\d{2})_(\d{2})_(\d{2})\.(?:jpg|jpeg|png)$", re.IGNORECASE)
+PHOTO_PATTERN = re.compile(r"^IMG_(\d{4})_(\d{2})_(\d{2})-(\d{2})_(\d{2})_(\d{2})\.(?:"
+                           + "|".join(sorted(ext[1:] for ext in PHOTO_EXTS)) + ")$", re.IGNORECASE)
 VIDEO_PATTERN = re.compile(r"^VID_(\d{4})_(\d{2})_(\d{2})-(\d{2})_(\d{2})_(\d{2})\.(?:mp4|mov)$", re.IGNORECASE)
+# Nom normalisé sans heure (IMG_AAAA_MM_JJ_N0001) : seule la journée est connue
+PHOTO_DAY_PATTERN = re.compile(r"^IMG_(\d{4})_(\d{2})_(\d{2})_N\d{4}\.", re.IGNORECASE)
 
 # -------------------------------
 # Dates
 # -------------------------------
-def _get_exif_datetime(path):
+def _exif_datetime(img):
+    """Date EXIF d'une image déjà ouverte (lecture de l'en-tête seulement, sans décodage)."""
     try:
-        img = Image.open(path)
         exif_data = img._getexif()
         if not exif_data:
             return None
@@ -51,6 +56,36 @@ def _get_exif_datetime(path):
         return None
     return None
 
+def _get_exif_datetime(path, img=None):
+    """Date EXIF d'une photo ; HEIC, WebP et RAW sont lus dans leur conteneur (media_formats)."""
+    if media_formats.is_extended(path):
+        return media_formats.exif_datetime(path)
+    try:
+        return _exif_datetime(img or Image.open(path))
+    except Exception:
+        return None
+
+def _capture_interval(filename, path):
+    """
+    Intervalle (début, fin) de prise de vue en secondes, pour l'élagage des comparaisons :
+    date EXIF, sinon date du nom normalisé (journée entière pour IMG_AAAA_MM_JJ_N0001), sinon None.
+    """
+    try:
+        dt = _get_exif_datetime(path)
+        m = PHOTO_PATTERN.match(filename)
+        if dt is None and m:
+            dt = datetime(*map(int, m.groups()))
+        if dt is not None:
+            ts = dt.timestamp()
+            return ts, ts
+        m = PHOTO_DAY_PATTERN.match(filename)
+        if m:
+            start = datetime(*map(int, m.groups())).timestamp()
+            return start, start + MAX_INTERVAL - 1
+    except (ValueError, OverflowError, OSError):
+        pass
+    return None
+
 def _get_file_datetime(path):
     try:
         ts = os.path.getmtime(path)
@@ -88,16 +123,226 @@ def _normalize_filename(filename, ext, save_path):
 
     return filename
 
+# -------------------------------
+# Étapes unitaires (réutilisées par le mode pipeline)
+# -------------------------------
+def _rename_file(f, save_path, log_callback, metrics=NULL_METRICS):
+    """Étape 1 pour un fichier : normalise son nom dans save_path et retourne le nom final."""
+    ext = os.path.splitext(f)[1].lower()
+    new_name = _normalize_filename(f, ext, save_path)
+    if new_name != f:
+        try:
+            with metrics.timer("move", files=1):
+                os.rename(os.path.join(save_path, f), os.path.join(save_path, new_name))
+            get_catalog().move(os.path.join(save_path, f), os.path.join(save_path, new_name))
+            log_callback(format_log("RENAMED", f, new_name))
+            return new_name
+        except Exception as e:
+            log_callback(format_log("ERREUR", f"Impossible de renommer {f}", str(e)))
+            return f
+    log_callback(format_log("OK", f))
+    return f
+
+def _check_duplicate(filename, path, seen_images, seen_videos, log_callback, known_digest=None,
+                     metrics=NULL_METRICS, video_index=None):
+    """
+    Recherche un doublon du fichier parmi ceux déjà vus et le supprime le cas échéant.
+    known_digest : condensat déjà calculé pendant la copie (algorithme du service de hachage).
+    Sinon, le service de hachage le reprend de son cache ou le calcule.
+    video_index : VideoIndex des vidéos déjà vues ; si fourni et ffmpeg présent, les vidéos
+    ré-encodées (même contenu, octets différents) sont aussi détectées.
+    Retourne True si le fichier était un doublon.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    log_callback(format_log("SEARCH", f"recherche de doublons pour {filename}"))
+
+    if ext in PHOTO_EXTS:
+        try:
+            interval = _capture_interval(filename, path)
+            rgb = None
+            photo = cached_hashes(path)
+            if photo is None:
+                with metrics.timer("decode", files=1):
+                    # HEIC / RAW : aperçu embarqué, sans décodage de l'image pleine résolution
+                    rgb = media_formats.open_image(path).convert("RGB")
+                with metrics.timer("phash", files=1):
+                    photo = PhotoHashes.compute(rgb)
+                store_hashes(path, photo)
+            else:
+                metrics.count("hachés photo en cache")
+
+            rotation_time = 0.0
+
+            def rotated():
+                # pHash des rotations : seulement si un candidat a passé les filtres bon marché
+                nonlocal rgb, rotation_time
+                t = time.perf_counter()
+                if rgb is None:
+                    with metrics.timer("decode", files=1):
+                        rgb = media_formats.open_image(path).convert("RGB")
+                with metrics.timer("phash", files=1):
+                    rotations = photo.compute_rotated(rgb)
+                store_hashes(path, photo)
+                metrics.count("rotations pHash calculées")
+                rotation_time += time.perf_counter() - t
+                return rotations
+
+            # Seules les photos prises à moins de time_window secondes (ou non datées) sont comparées
+            candidates = seen_images.candidates(interval)
+            # Comparaisons évitées par la seule fenêtre de date, avant le filtre RAW / JPEG
+            metrics.count("comparaisons évitées", len(seen_images) - len(candidates))
+            # Un RAW n'est jamais supprimé comme doublon d'un JPEG (ni l'inverse) : paires RAW + JPEG
+            raw = media_formats.is_raw(filename)
+            candidates = [k for k in candidates if media_formats.is_raw(k) == raw]
+            metrics.count("comparaisons photo", len(candidates))
+            t = time.perf_counter()
+            duplicate_of = seen_images.find_duplicate(photo, candidates, rotated)
+            metrics.add("compare", time.perf_counter() - t - rotation_time)
+            if duplicate_of is not None:
+                with metrics.timer("delete", files=1):
+                    os.remove(path)
+                get_catalog().remove(path)
+                metrics.count("doublons")
+                log_callback(format_log("DUPLICAT", f"{filename} supprimé", f"similaire à {duplicate_of}"))
+                return True
+
+            seen_images.add(filename, photo, interval)
+            get_catalog().record(path, phash=f"{photo.phash:016x}")
+
+        except Exception as e:
+            log_callback(format_log("ERREUR", f"Impossible d’analyser {filename}", str(e)))
+
+    elif ext in VIDEO_EXTS:
+        h = known_digest
+        if h is None:
+            with metrics.timer("hash", files=1, nbytes=os.path.getsize(path)):
+                h = get_hash_service().digest(path)
+        with metrics.timer("compare"):
+            duplicate_of = next((k for k, v in seen_videos.items() if v == h), None)
+        if duplicate_of is not None:
+            with metrics.timer("delete", files=1):
+                os.remove(path)
+            get_catalog().remove(path)
+            metrics.count("doublons")
+            log_callback(format_log("DUPLICAT", f"{filename} supprimé", f"identique à {duplicate_of}"))
+            return True
+        seen_videos[filename] = h
+        get_catalog().record(path, digest=h, digest_algo=get_hash_service().algo)
+
+        if video_index is not None and video_fingerprint.available():
+            with metrics.timer("fingerprint", files=1):
+                fp = video_fingerprint.fingerprint(path)
+            with metrics.timer("compare"):
+                duplicate_of = video_index.match(fp)
+            if duplicate_of is not None:
+                with metrics.timer("delete", files=1):
+                    os.remove(path)
+                get_catalog().remove(path)
+                del seen_videos[filename]
+                metrics.count("doublons")
+                metrics.count("doublons vidéo ré-encodés")
+                log_callback(format_log("DUPLICAT", f"{filename} supprimé", f"même vidéo que {duplicate_of}"))
+                return True
+            video_index.add(filename, fp)
+
+    return False
+
+def _move_to_archive(filename, path, photos_path, videos_path, error_dir, log_callback,
+                     metrics=NULL_METRICS):
+    """Déplace un fichier (déjà renommé) vers <photos|videos>/<année>, ou vers Erreur_tri."""
+    ext = os.path.splitext(filename)[1].lower()
+    captured = None
+    try:
+        match_photo = PHOTO_PATTERN.match(filename)
+        match_video = VIDEO_PATTERN.match(filename)
+
+        if match_photo or match_video:
+            g = (match_photo or match_video).groups()
+            captured = f"{g[0]}-{g[1]}-{g[2]}T{g[3]}:{g[4]}:{g[5]}"
+        if match_photo:
+            year = match_photo.group(1)
+            dest_dir = os.path.join(photos_path, year)
+        elif match_video:
+            year = match_video.group(1)
+            dest_dir = os.path.join(videos_path, year)
+        elif ext in PHOTO_EXTS | VIDEO_EXTS:
+            is_photo = ext in PHOTO_EXTS
+            with metrics.timer("decode" if is_photo else "stat", files=1):
+                dt = _get_exif_datetime(path) if is_photo else _get_file_datetime(path)
+            prefix = "IMG" if is_photo else "VID"
+            if dt:
+                filename = f"{prefix}_{dt.strftime('%Y_%m_%d-%H_%M_%S')}{ext}"
+                captured = dt.strftime("%Y-%m-%dT%H:%M:%S")
+                year = dt.strftime("%Y")
+                dest_dir = os.path.join(photos_path if is_photo else videos_path, year)
+            else:
+                dest_dir = error_dir
+                log_callback(format_log("ERREUR", f"{filename} déplacé vers Erreur_tri", "pas de date"))
+        else:
+            log_callback(format_log("IGNORÉ", filename, "extension non prise en charge"))
+            return
+
+        os.makedirs(dest_dir, exist_ok=True)
+        final_path = os.path.join(dest_dir, filename)
+        with metrics.timer("move", files=1):
+            shutil.move(path, final_path)
+        get_catalog().move(path, final_path, captured=captured)
+        # Noté sans attendre l'événement inotify : le prochain backup incrémental le prendra
+        if get_config().journal.enabled:
+            get_journal().record(final_path)
+        log_callback(format_log("MOVE", f"{filename} déplacé", final_path))
+
+    except Exception as e:
+        err_path = os.path.join(error_dir, filename)
+        try:
+            shutil.move(path, err_path)
+            get_catalog().move(path, err_path)
+            log_callback(format_log("ERREUR", f"{filename} déplacé vers Erreur_tri", str(e)))
+        except Exception as move_error:
+            log_callback(format_log("ERREUR", f"Échec déplacement de {filename}", str(move_error)))
+
+def sort_single_file(filename, save_path, photos_path, videos_path, log_callback,
+                     seen_images, seen_videos, check_duplicates=True, known_digest=None,
+                     metrics=NULL_METRICS, video_index=None):
+    """
+    Renomme, déduplique et archive un seul fichier de save_path.
+    seen_images (SeenPhotos), seen_videos et video_index sont partagés entre les appels pour la détection des doublons.
+    """
+    error_dir = os.path.join(save_path, "Erreur_tri")
+    os.makedirs(error_dir, exist_ok=True)
+
+    filename = _rename_file(filename, save_path, log_callback, metrics)
+    path = os.path.join(save_path, filename)
+    if not os.path.exists(path):
+        return
+    if check_duplicates and _check_duplicate(filename, path, seen_images, seen_videos,
+                                             log_callback, known_digest=known_digest, metrics=metrics,
+                                             video_index=video_index):
+        return
+    _move_to_archive(filename, path, photos_path, videos_path, error_dir, log_callback, metrics)
+
 # -------------------------------
 # Fonction principale
 # -------------------------------
-def process_files_individually(save_path, photos_path, videos_path, log_callback, progress_callback, cancel_flag, check_duplicates=True):
+def _media_matches(filename, media):
+    """media : None (tout), "videos" (VIDEO_EXTS) ou "photos" (tout le reste, y compris les fichiers inconnus)."""
+    if media is None:
+        return True
+    is_video = os.path.splitext(filename)[1].lower() in VIDEO_EXTS
+    return is_video if media == "videos" else not is_video
+
+def process_files_individually(save_path, photos_path, videos_path, log_callback, progress_callback, cancel_flag, check_duplicates=True, media=None,
+                               metrics=NULL_METRICS, time_window=None):
+    """time_window : fenêtre (s) de comparaison des photos, None = valeur de config.json (dedup.time_window)."""
     if not os.path.isdir(save_path):
         log_callback(format_log("ERREUR", "Dossier de sauvegarde introuvable", save_path))
         return
 
-    files = sorted([f for f in os.listdir(save_path) if os.path.isfile(os.path.join(save_path, f))])
+    with metrics.timer("walk"):
+        files = sorted([f for f in os.listdir(save_path)
+                        if os.path.isfile(os.path.join(save_path, f)) and _media_matches(f, media)])
     total_files = len(files)
+    metrics.count("fichiers", total_files)
     total_ops = total_files * 3
     done_ops = 0
 
@@ -107,31 +352,39 @@ def process_files_individually(save_path, photos_path, videos_path, log_callback
         if cancel_flag.cancelled:
             log_callback(format_log("STOP", "Opération interrompue par l'utilisateur"))
             return
-        ext = os.path.splitext(f)[1].lower()
-        new_name = _normalize_filename(f, ext, save_path)
-        if new_name != f:
-            try:
-                os.rename(os.path.join(save_path, f), os.path.join(save_path, new_name))
-                log_callback(format_log("RENAMED", f, new_name))
-                renamed_files.append(new_name)
-            except Exception as e:
-                log_callback(format_log("ERREUR", f"Impossible de renommer {f}", str(e)))
-                renamed_files.append(f)
-        else:
-            log_callback(format_log("OK", f))
-            renamed_files.append(f)
+        renamed_files.append(_rename_file(f, save_path, log_callback, metrics))
 
         done_ops += 1
         progress_callback(int(done_ops / total_ops * 100))
 
     etape2_label = "Étape 2 : Détection doublons et déplacement..." if check_duplicates else "Étape 2 : Déplacement des fichiers..."
     log_callback(format_log("INFO", etape2_label))
-    seen_images = {}
+    seen_images = SeenPhotos(get_config().dedup.time_window if time_window is None else time_window)
     seen_videos = {}
+    video_index = None
     error_dir = os.path.join(save_path, "Erreur_tri")
     os.makedirs(error_dir, exist_ok=True)
 
-    for filename in sorted(renamed_files):
+    # Vidéos : la plus lourde passe en premier, c'est donc elle qui est gardée face à ses
+    # copies ré-encodées ; leurs empreintes sont calculées d'avance dans un pool de processus
+    def _order(name):
+        is_video = os.path.splitext(name)[1].lower() in VIDEO_EXTS
+        try:
+            size = os.path.getsize(os.path.join(save_path, name)) if is_video else 0
+        except OSError:
+            size = 0
+        return (is_video, -size, name)
+
+    if check_duplicates and video_fingerprint.available():
+        video_index = video_fingerprint.VideoIndex()
+        videos = [os.path.join(save_path, f) for f in renamed_files
+                  if os.path.splitext(f)[1].lower() in VIDEO_EXTS]
+        if videos:
+            log_callback(format_log("INFO", f"Empreintes de {len(videos)} vidéo(s)..."))
+            with metrics.timer("fingerprint", files=len(videos)):
+                video_fingerprint.fingerprint_many(videos)
+
+    for filename in sorted(renamed_files, key=_order):
         if cancel_flag.cancelled:
             log_callback(format_log("STOP", "Opération interrompue par l'utilisateur"))
             break
@@ -142,100 +395,22 @@ def process_files_individually(save_path, photos_path, videos_path, log_callback
             progress_callback(int(done_ops / total_ops * 100))
             continue
 
-        ext = os.path.splitext(filename)[1].lower()
-
         is_duplicate = False
-        duplicate_of = None
-
         if check_duplicates:
-            log_callback(format_log("SEARCH", f"recherche de doublons pour {filename}"))
-
-            if ext in PHOTO_EXTS:
-                try:
-                    img = Image.open(path).convert("RGB")
-                    h = imagehash.phash(img)
-                    # Pré-calcul des 3 rotations une seule fois (et non à chaque comparaison)
-                    all_hashes = [h] + [
-                        imagehash.phash(img.rotate(angle, expand=True))
-                        for angle in (90, 180, 270)
-                    ]
-
-                    for prev, prev_hash in seen_images.items():
-                        if any((rh - prev_hash) <= 1 for rh in all_hashes):
-                            is_duplicate = True
-                            duplicate_of = prev
-                            break
-
-                    if is_duplicate:
-                        os.remove(path)
-                        log_callback(format_log("DUPLICAT", f"{filename} supprimé", f"similaire à {duplicate_of}"))
-                    else:
-                        seen_images[filename] = h
-
-                except Exception as e:
-                    log_callback(format_log("ERREUR", f"Impossible d’analyser {filename}", str(e)))
-
-            elif ext in VIDEO_EXTS:
-                h = file_md5(path)
-                if h in seen_videos.values():
-                    duplicate_of = next(k for k, v in seen_videos.items() if v == h)
-                    os.remove(path)
-                    log_callback(format_log("DUPLICAT", f"{filename} supprimé", f"identique à {duplicate_of}"))
-                    is_duplicate = True
-                else:
-                    seen_videos[filename] = h
+            is_duplicate = _check_duplicate(filename, path, seen_images, seen_videos, log_callback, metrics=metrics,
+                                            video_index=video_index)
 
         done_ops += 1
         progress_callback(int(done_ops / total_ops * 100))
 
-        if is_duplicate:
-            done_ops += 1
-            progress_callback(int(done_ops / total_ops * 100))
-            continue
-
-        try:
-            match_photo = PHOTO_PATTERN.match(filename)
-            match_video = VIDEO_PATTERN.match(filename)
-
-            if match_photo:
-                year = match_photo.group(1)
-                dest_dir = os.path.join(photos_path, year)
-            elif match_video:
-                year = match_video.group(1)
-                dest_dir = os.path.join(videos_path, year)
-            elif ext in PHOTO_EXTS | VIDEO_EXTS:
-                is_photo = ext in PHOTO_EXTS
-                dt = _get_exif_datetime(path) if is_photo else _get_file_datetime(path)
-                prefix = "IMG" if is_photo else "VID"
-                if dt:
-                    filename = f"{prefix}_{dt.strftime('%Y_%m_%d-%H_%M_%S')}{ext}"
-                    year = dt.strftime("%Y")
-                    dest_dir = os.path.join(photos_path if is_photo else videos_path, year)
-                else:
-                    dest_dir = error_dir
-                    log_callback(format_log("ERREUR", f"{filename} déplacé vers Erreur_tri", "pas de date"))
-            else:
-                log_callback(format_log("IGNORÉ", filename, "extension non prise en charge"))
-                done_ops += 1
-                progress_callback(int(done_ops / total_ops * 100))
-                continue
-
-            os.makedirs(dest_dir, exist_ok=True)
-            final_path = os.path.join(dest_dir, filename)
-            shutil.move(path, final_path)
-            log_callback(format_log("MOVE", f"{filename} déplacé", final_path))
-
-        except Exception as e:
-            err_path = os.path.join(error_dir, filename)
-            try:
-                shutil.move(path, err_path)
-                log_callback(format_log("ERREUR", f"{filename} déplacé vers Erreur_tri", str(e)))
-            except Exception as move_error:
-                log_callback(format_log("ERREUR", f"Échec déplacement de {filename}", str(move_error)))
+        if not is_duplicate:
+            _move_to_archive(filename, path, photos_path, videos_path, error_dir, log_callback, metrics)
 
         done_ops += 1
         progress_callback(int(done_ops / total_ops * 100))
 
     # Fin de boucle fichiers
     progress_callback(100)
+    get_hash_service().flush()
+    get_catalog().flush()
     log_callback(format_log("FIN", "Traitement terminé"))
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Mesure du démarrage de MemorEase.
+
+Dans l'application : StartupProbe enregistre des jalons (fin des imports, premier affichage,
+imports préchargés en arrière-plan). Si la variable d'environnement MEMOREASE_STARTUP_BENCH
+est définie, le rapport JSON est écrit dans le fichier qu'elle désigne (ou startup_bench.json)
+et, avec MEMOREASE_STARTUP_BENCH_EXIT=1, l'application se ferme une fois le préchargement terminé.
+
+En ligne de commande : lance N fois une commande (par défaut `python main.py`, ou l'exécutable
+PyInstaller : `python startup_bench.py dist/MemorEase`) et affiche les médianes.
+"""
+import os
+import sys
+import json
+import time
+import importlib
+import statistics
+import subprocess
+import tempfile
+
+ENV_REPORT = "MEMOREASE_STARTUP_BENCH"
+ENV_EXIT = "MEMOREASE_STARTUP_BENCH_EXIT"
+
+
+def process_age():
+    """
+    Secondes écoulées depuis la création du processus (Linux, via /proc).
+    Inclut le temps d'extraction du bootloader PyInstaller, invisible depuis Python.
+    """
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Le nom du processus peut contenir des espaces : on repart après la parenthèse fermante
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProbe:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.offset = process_age() or 0.0
+        self.marks = {}
+        self.imports = {}
+        self.report_path = os.environ.get(ENV_REPORT)
+        self.exit_when_done = os.environ.get(ENV_EXIT) == "1"
+
+    @property
+    def enabled(self):
+        return bool(self.report_path)
+
+    def elapsed(self):
+        """Secondes depuis la création du processus (ou, à défaut, depuis l'import de ce module)."""
+        return self.offset + time.perf_counter() - self.t0
+
+    def mark(self, name):
+        self.marks.setdefault(name, round(self.elapsed(), 4))
+
+    def timed_import(self, module_name):
+        """Importe un module en mesurant sa durée (0 s s'il était déjà chargé)."""
+        t = time.perf_counter()
+        module = importlib.import_module(module_name)
+        self.imports[module_name] = round(time.perf_counter() - t, 4)
+        return module
+
+    def report(self):
+        return {
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "process_start_offset": round(self.offset, 4),
+            "marks": self.marks,
+            "background_imports": self.imports,
+        }
+
+    def write(self):
+        if not self.enabled:
+            return
+        path = self.report_path if self.report_path not in ("1", "true") else "startup_bench.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=4)
+
+
+def main(argv):
+    runs = 5
+    if argv[:1] == ["-n"]:
+        runs, argv = int(argv[1]), argv[2:]
+    command = argv or [sys.executable, "main.py"]
+
+    reports = []
+    for _ in range(runs):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        env = dict(os.environ, **{ENV_REPORT: path, ENV_EXIT: "1"})
+        subprocess.run(command, env=env, check=True, timeout=120)
+        with open(path, "r", encoding="utf-8") as f:
+            reports.append(json.load(f))
+        os.remove(path)
+
+    def median(key, section="marks"):
+        values = [r[section][key] for r in reports if key in r[section]]
+        return round(statistics.median(values), 4) if values else None
+
+    summary = {
+        "command": command,
+        "runs": runs,
+        "marks": {k: median(k) for k in reports[0]["marks"]},
+        "background_imports": {k: median(k, "background_imports") for k in reports[0]["background_imports"]},
+    }
+    print(json.dumps(summary, indent=4))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,77 @@
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import merkle
+from catalog import MediaCatalog, set_catalog
+from config import ConfigStore, set_store
+from journal import ChangeJournal, set_journal
+from utils import DigestCache, HashService, set_hash_service
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Sert server.body, avec ou sans requêtes Range / Content-Length, ETag et 304 conditionnel."""
+
+    def do_GET(self):
+        server = self.server
+        rng = self.headers.get("Range")
+        server.requests.append({"path": self.path, "range": rng,
+                                "if_none_match": self.headers.get("If-None-Match")})
+        body = server.body
+        if server.etag and self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if rng and server.ranges:
+            start, end = rng.split("=", 1)[1].split("-")
+            start, end = int(start), int(end) if end else len(body) - 1
+            body = body[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{start + len(body) - 1}/{len(server.body)}")
+        else:
+            self.send_response(200)
+        if server.length:
+            self.send_header("Content-Length", str(len(body)))
+        if server.etag:
+            self.send_header("ETag", server.etag)
+        self.send_header("Content-Type", server.content_type)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """Serveur HTTP local : régler body, ranges, length, etag, content_type ; requests liste les requêtes reçues."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.body, server.ranges, server.length = b"", True, True
+    server.etag, server.content_type = '"v1"', "application/octet-stream"
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def isolated_state(tmp_path, monkeypatch):
+    """
+    Configuration, cache de condensats, catalogue, journal et empreintes de dossiers propres au test
+    (dans tmp_path/state), comme _fresh_hash_cache des benchmarks. Retourne le ConfigStore.
+    """
+    state = tmp_path / "state"
+    state.mkdir()
+    store = ConfigStore(str(state / "config.json"))
+    journal = ChangeJournal(str(state / "journal.sqlite"))
+    previous = (set_store(store), set_hash_service(HashService(cache=DigestCache(str(state / "digests.sqlite")))),
+                set_catalog(MediaCatalog(str(state / "catalog.sqlite"))), set_journal(journal))
+    monkeypatch.setattr(merkle, "SOURCE_TREES_FILE", os.path.join(str(state), "trees.sqlite"))
+    yield store
+    for restore, value in zip((set_store, set_hash_service, set_catalog, set_journal), previous):
+        restore(value)
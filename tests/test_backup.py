@@ -0,0 +1,65 @@
+import os
+from backup import run_backup
+
+
+def _library(tmp_path):
+    photos = tmp_path / "photos"
+    for year in ("2019", "2020"):
+        (photos / year).mkdir(parents=True)
+        for i in range(3):
+            (photos / year / f"IMG_{year}_{i}.jpg").write_bytes(f"{year}-{i}".encode() * 500)
+    return photos
+
+
+def _backup(photos, dest, **kwargs):
+    logs = []
+    ok, _, _ = run_backup(str(photos), str(photos), str(dest), log_callback=logs.append,
+                          backup_videos=False, **kwargs)
+    assert ok
+    return logs
+
+
+def test_forced_full_pass_repairs_file_modified_in_backup(tmp_path, isolated_state):
+    photos, dest = _library(tmp_path), tmp_path / "disque"
+    _backup(photos, dest)
+
+    # Modification sur place dans le backup : le mtime du dossier 2019 ne change pas
+    damaged = dest / "MemorEase_backup" / "Photos" / "2019" / "IMG_2019_0.jpg"
+    folder_mtime = os.stat(damaged.parent).st_mtime_ns
+    damaged.write_bytes(b"abime")
+    assert os.stat(damaged.parent).st_mtime_ns == folder_mtime
+
+    # Journal non tenu : backup complet, aucun dossier sauté sur la foi des empreintes
+    logs = _backup(photos, dest)
+    assert not any("inchangé" in line or "aucun changement" in line for line in logs)
+    assert damaged.read_bytes() == (photos / "2019" / "IMG_2019_0.jpg").read_bytes()
+
+
+def test_unchanged_subtrees_are_skipped_without_journal(tmp_path, isolated_state):
+    isolated_state.update("journal", enabled=False)
+    photos, dest = _library(tmp_path), tmp_path / "disque"
+    _backup(photos, dest)
+
+    (photos / "2020" / "IMG_2020_9.jpg").write_bytes(b"nouvelle")
+    logs = _backup(photos, dest)
+    assert any("1 dossier(s) inchangé(s)" in line for line in logs)
+    assert (dest / "MemorEase_backup" / "Photos" / "2020" / "IMG_2020_9.jpg").exists()
+
+    logs = _backup(photos, dest)
+    assert any("aucun changement" in line for line in logs)
+
+
+def test_periodic_full_backup_rereads_cached_digests(tmp_path, isolated_state):
+    isolated_state.update("journal", full_every_days=0)
+    photos, dest = _library(tmp_path), tmp_path / "disque"
+    _backup(photos, dest)
+
+    # Contenu altéré sans changer ni la taille ni la date : le cache de condensats le croit intact
+    damaged = dest / "MemorEase_backup" / "Photos" / "2020" / "IMG_2020_1.jpg"
+    st = os.stat(damaged)
+    damaged.write_bytes(bytes(b ^ 0xFF for b in damaged.read_bytes()))
+    os.utime(damaged, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    logs = _backup(photos, dest)
+    assert any("condensats relus" in line for line in logs)
+    assert damaged.read_bytes() == (photos / "2020" / "IMG_2020_1.jpg").read_bytes()
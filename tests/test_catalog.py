@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from catalog import MediaCatalog, PHOTO, VIDEO
+
+
+def _file(path, data=b"contenu"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+def _bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+
+
+def test_record_move_remove(tmp_path):
+    catalog = MediaCatalog(str(tmp_path / "catalog.sqlite"))
+    src = _file(tmp_path / "dl" / "IMG_1.jpg")
+    catalog.record(src, digest="d1", digest_algo="blake2b", device="Pixel")
+    row = catalog.get(src)
+    assert (row["name"], row["kind"], row["size"], row["device"]) == ("IMG_1.jpg", PHOTO, 7, "Pixel")
+
+    # Renommage / archivage : la ligne suit le fichier, avec ses champs
+    dst = str(tmp_path / "photos" / "2024" / "IMG_2024_01_01_N0001.jpg")
+    os.makedirs(os.path.dirname(dst))
+    os.rename(src, dst)
+    catalog.move(src, dst, captured="2024-01-01T10:00:00")
+    assert catalog.get(src) is None
+    row = catalog.get(dst)
+    assert (row["device"], row["digest"], row["captured"]) == ("Pixel", "d1", "2024-01-01T10:00:00")
+    assert [r["path"] for r in catalog.find_digest("d1")] == [dst]
+    assert catalog.names_under(str(tmp_path / "photos")) == {"IMG_2024_01_01_N0001.jpg"}
+
+    catalog.remove(dst)
+    assert catalog.get(dst) is None
+    # Champ inconnu : erreur de programmation, levée malgré le mode best effort
+    with pytest.raises(TypeError):
+        catalog.record(src, inconnu=1)
+
+
+def test_content_change_clears_digest_and_backup_state(tmp_path):
+    catalog = MediaCatalog(str(tmp_path / "catalog.sqlite"))
+    path = _file(tmp_path / "photos" / "a.jpg")
+    catalog.record(path, digest="d1", digest_algo="blake2b", phash="00ff")
+    catalog.mark_backed_up(path, str(tmp_path / "backup" / "a.jpg"))
+    assert catalog.pending_backup() == []
+    assert catalog.stats()["sauvegardés"] == 1
+
+    _file(tmp_path / "photos" / "a.jpg", b"autre contenu")
+    catalog.record(path, captured="2024-05-01T08:00:00")
+    row = catalog.get(path)
+    assert row["digest"] is None and row["phash"] is None and row["backed_up_at"] is None
+    assert row["captured"] == "2024-05-01T08:00:00"
+    assert [r["path"] for r in catalog.pending_backup([str(tmp_path / "photos")])] == [path]
+
+
+def test_reconcile_syncs_with_disk(tmp_path):
+    catalog = MediaCatalog(str(tmp_path / "catalog.sqlite"))
+    photos, videos = tmp_path / "photos", tmp_path / "videos"
+    kept = _file(photos / "2023" / "a.jpg")
+    changed = _file(photos / "2023" / "b.jpg")
+    gone = _file(photos / "2024" / "c.jpg")
+    clip = _file(videos / "2024" / "d.mp4")
+    _file(photos / "notes.txt")
+    counts = catalog.reconcile([str(photos), str(videos)])
+    assert counts == {"ajoutés": 4, "modifiés": 0, "supprimés": 0, "inchangés": 0}
+    assert catalog.get(clip)["kind"] == VIDEO
+
+    catalog.record(changed, digest="d1")
+    _bump_mtime(changed)
+    os.remove(gone)
+    counts = catalog.reconcile([str(photos), str(videos)])
+    assert counts == {"ajoutés": 0, "modifiés": 1, "supprimés": 1, "inchangés": 2}
+    assert catalog.get(changed)["digest"] is None
+    assert catalog.get(gone) is None
+    assert catalog.get(kept) is not None
+    assert [r["path"] for r in catalog.files_under(str(photos), PHOTO)] == sorted([kept, changed])
+
+
+def test_catalog_persists_after_flush(tmp_path):
+    path = str(tmp_path / "catalog.sqlite")
+    media = _file(tmp_path / "photos" / "a.jpg")
+    catalog = MediaCatalog(path)
+    catalog.record(media, captured="2020-01-01T00:00:00")
+    catalog.flush()
+    other = MediaCatalog(path)
+    assert other.captured_between("2019-12-31T00:00:00", "2020-01-02T00:00:00")[0]["path"] == media
+    assert other.stats()["fichiers"] == 1
@@ -0,0 +1,46 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cli_imports_without_tkinter():
+    # Serveur sans python3-tk : ni la CLI ni les moteurs qu'elle charge ne doivent importer tkinter
+    modules = "memorease, backup, sort_tools, mtp_tools, pipeline, scheduler, watcher"
+    code = f"import sys; sys.modules['tkinter'] = sys.modules['customtkinter'] = None; import {modules}"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def _run_all(monkeypatch, tmp_path, download):
+    import metrics
+    import pipeline
+    import memorease
+    monkeypatch.setattr(metrics.RunMetrics, "write", lambda self, report_dir=None: None)
+
+    def schedule(scheduler, *args, log_callback, **kwargs):
+        return [scheduler.submit(lambda job: download(log_callback), "Téléchargement")]
+
+    monkeypatch.setattr(pipeline, "schedule_full_import", schedule)
+    return memorease.main(["--format", "text", "all", "--dest", str(tmp_path)])
+
+
+def test_all_without_device_exits_no_device(monkeypatch, tmp_path):
+    from mtp_tools import NO_DEVICE_MESSAGE
+    import memorease
+
+    def download(log):
+        log(NO_DEVICE_MESSAGE)
+        return False
+
+    assert _run_all(monkeypatch, tmp_path, download) == memorease.EXIT_NO_DEVICE
+
+
+def test_all_with_crashed_download_exits_error(monkeypatch, tmp_path):
+    import memorease
+
+    def download(log):
+        raise RuntimeError("boom")
+
+    assert _run_all(monkeypatch, tmp_path, download) == memorease.EXIT_ERROR
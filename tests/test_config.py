@@ -0,0 +1,122 @@
+import os
+import json
+
+import pytest
+
+import config
+from config import Config, ConfigStore
+
+
+def _write(path, data, mtime_offset=0):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    # mtime décalé : deux écritures dans la même tranche d'horloge restent distinctes
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + mtime_offset))
+
+
+def test_update_writes_atomically(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path))
+    assert not path.exists()
+
+    store.update("dedup", time_window=30)
+    assert json.loads(path.read_text(encoding="utf-8"))["dedup"] == {"time_window": 30.0}
+    assert os.listdir(tmp_path) == ["config.json"]
+
+    # Valeur inchangée : aucune écriture
+    mtime = os.stat(path).st_mtime_ns
+    store.update("dedup", time_window=30.0)
+    assert os.stat(path).st_mtime_ns == mtime
+
+    with pytest.raises(KeyError):
+        store.update("dedup", fenetre=3)
+
+
+def test_failed_write_keeps_previous_file(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path))
+    store.update("backup", path="/media/disque")
+    before = path.read_bytes()
+
+    def broken(*args, **kwargs):
+        raise OSError("disque plein")
+
+    monkeypatch.setattr(config.json, "dump", broken)
+    with pytest.raises(OSError):
+        store.update("backup", path="/media/autre")
+    assert path.read_bytes() == before
+    assert os.listdir(tmp_path) == ["config.json"]
+
+
+def test_external_change_is_reloaded_and_notified(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path))
+    store.update("journal", full_every_days=3)
+    seen = []
+    unsubscribe = store.subscribe(lambda cfg, sections: seen.append((cfg.journal.full_every_days, sections)))
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["journal"]["full_every_days"] = 14
+    _write(path, data, mtime_offset=1_000_000)
+    assert store.get().journal.full_every_days == 14.0
+    assert seen == [(14.0, {"journal"})]
+
+    # Fichier inchangé : pas de relecture, pas de notification
+    assert store.check() is False
+    unsubscribe()
+    store.update("journal", full_every_days=1)
+    assert len(seen) == 1
+
+
+def test_unreadable_file_keeps_config_in_memory(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path))
+    store.update("watch", workers=3)
+    path.write_text("{ tronqué", encoding="utf-8")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert store.get().watch.workers == 3
+    assert path.read_text(encoding="utf-8") == "{ tronqué"
+
+
+def test_legacy_keys_are_migrated_on_save(tmp_path):
+    path = tmp_path / "config.json"
+    _write(path, {"save": "/home/u/Téléchargements", "photos": "/home/u/Photos", "videos": "/home/u/Vidéos",
+                  "backup": "/media/disque", "update_check_interval": 60, "fenetre": "gardée"})
+    store = ConfigStore(str(path))
+    cfg = store.get()
+    assert cfg.paths.photos == "/home/u/Photos"
+    assert cfg.backup.path == "/media/disque"
+    assert cfg.cache.update_check_interval == 60.0
+
+    store.update("dedup", time_window=10)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert not {"save", "photos", "videos", "update_check_interval"} & set(data)
+    assert data["backup"]["path"] == "/media/disque"
+    assert data["paths"]["save"] == "/home/u/Téléchargements"
+    assert data["fenetre"] == "gardée"
+
+
+def test_invalid_values_fall_back_to_defaults():
+    default = Config()
+    cfg = Config.from_dict({
+        "paths": {"save": "C:\\Users\\u", "photos": "/p", "videos": "/v"},
+        "backup": {"path": "relatif", "photos": "oui"},
+        "concurrency": {"workers": 0, "hash_workers": -2},
+        "cache": {"update_check_interval": -1, "hash_algo": "crc"},
+        "dedup": {"time_window": -5},
+        "journal": {"full_every_days": -1, "enabled": 1},
+        "transfer": {"sync_window_mb": 0, "streaming": True},
+        "watch": "pas une section",
+    })
+    assert cfg.paths == default.paths
+    assert cfg.backup == default.backup
+    assert cfg.concurrency.workers == default.concurrency.workers
+    assert cfg.concurrency.hash_workers == 0
+    assert cfg.cache == default.cache
+    assert cfg.dedup.time_window == 0.0
+    assert cfg.journal == default.journal
+    assert cfg.transfer.sync_window_mb == default.transfer.sync_window_mb
+    assert cfg.transfer.streaming is True
+    assert cfg.watch == default.watch
@@ -0,0 +1,49 @@
+from dedup import MAX_INTERVAL, PhotoHashes, SeenPhotos
+
+
+def _photo(phash=0):
+    return PhotoHashes(None, phash, None)
+
+
+def _seen(window):
+    seen = SeenPhotos(window)
+    seen.add("matin", _photo(), (1000, 1000))
+    seen.add("midi", _photo(), (5000, 5001))
+    seen.add("soir", _photo(), (9000, 9000))
+    seen.add("sans_date", _photo())
+    # Nom IMG_AAAA_MM_JJ_N0001 : seule la journée est connue
+    seen.add("journée", _photo(), (0, MAX_INTERVAL))
+    return seen
+
+
+def test_no_window_compares_everything():
+    seen = _seen(0)
+    assert sorted(seen.candidates((5000, 5000))) == sorted(seen.hashes)
+    assert sorted(seen.candidates(None)) == sorted(seen.hashes)
+
+
+def test_window_keeps_close_dates_and_undated_photos():
+    seen = _seen(120)
+    assert sorted(seen.candidates((5100, 5100))) == ["journée", "midi", "sans_date"]
+    assert sorted(seen.candidates((1120, 1120))) == ["journée", "matin", "sans_date"]
+    assert sorted(seen.candidates((1121, 1121))) == ["journée", "sans_date"]
+    # Photo sans date : comparée à toutes
+    assert sorted(seen.candidates(None)) == sorted(seen.hashes)
+
+
+def test_window_overlaps_long_intervals():
+    seen = SeenPhotos(60)
+    seen.add("journée", _photo(), (0, MAX_INTERVAL))
+    seen.add("veille", _photo(), (-MAX_INTERVAL, -1))
+    assert seen.candidates((MAX_INTERVAL + 60, MAX_INTERVAL + 60)) == ["journée"]
+    assert seen.candidates((MAX_INTERVAL + 61, MAX_INTERVAL + 61)) == []
+    assert sorted(seen.candidates((30, 30))) == ["journée", "veille"]
+
+
+def test_find_duplicate_uses_phash_distance():
+    seen = SeenPhotos(0)
+    seen.add("a", _photo(0b1010))
+    seen.add("b", _photo(0xffff))
+    far = lambda: (1 << 63, 1 << 62, 1 << 61)
+    assert seen.find_duplicate(_photo(0b1011), seen.candidates(), far) == "a"
+    assert seen.find_duplicate(_photo(0b0101), seen.candidates(), far) is None
@@ -0,0 +1,86 @@
+import os
+import time
+import shutil
+
+from benchmarks.corpus import make_fake_gvfs
+from device_monitor import DeviceMonitor, scan_mounts
+
+
+def _until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_scan_mounts_finds_dcim(tmp_path):
+    gvfs_base, dcim, _ = make_fake_gvfs(str(tmp_path), 2)
+    empty = os.path.join(gvfs_base, "mtp:host=Locked")
+    os.makedirs(empty)
+    assert scan_mounts(gvfs_base) == {os.path.dirname(os.path.dirname(os.path.dirname(dcim))): dcim,
+                                      empty: None}
+    assert scan_mounts(str(tmp_path / "absent")) == {}
+
+
+def test_monitor_reports_mount_and_unmount(tmp_path):
+    gvfs_base = tmp_path / "gvfs"
+    gvfs_base.mkdir()
+    seen = []
+
+    monitor = DeviceMonitor(gvfs_base=str(gvfs_base), rescan_interval=0.2, auto_mount=False)
+    monitor.add_listener(seen.append)
+    monitor.start()
+    try:
+        assert monitor.wait_ready(5)
+        assert seen == [{}]
+
+        # Le montage peut être vu avant son DCIM : re-sondé jusqu'à ce qu'il apparaisse
+        _, dcim, _ = make_fake_gvfs(str(tmp_path), 1)
+        assert _until(lambda: monitor.dcim_root() == dcim)
+        assert seen[-1] == {os.path.join(str(gvfs_base), "mtp:host=BenchPhone"): dcim}
+
+        shutil.rmtree(os.path.join(str(gvfs_base), "mtp:host=BenchPhone"))
+        assert _until(lambda: not monitor.is_connected())
+        assert _until(lambda: seen[-1] == {})
+    finally:
+        monitor.stop()
+
+
+def test_listener_error_goes_to_log_callback(tmp_path):
+    logs = []
+    monitor = DeviceMonitor(gvfs_base=str(tmp_path), auto_mount=False, log_callback=logs.append)
+
+    def broken(mounts):
+        raise ValueError("boom")
+
+    monitor.add_listener(broken)
+    monitor.refresh(force_notify=True)
+    assert logs == ["[ERREUR] Écouteur DeviceMonitor : ValueError: boom"]
+
+
+def test_find_dcim_mounts_device_plugged_after_monitor_start(tmp_path, monkeypatch):
+    import device_monitor
+    import mtp_tools
+
+    gvfs_base = tmp_path / "gvfs"
+    gvfs_base.mkdir()
+    mounted = []
+
+    def gio_mount():
+        # Le montage gio fait apparaître l'appareil dans le dossier GVFS
+        mounted.append(make_fake_gvfs(str(tmp_path), 1)[1])
+        return True
+
+    monkeypatch.setattr(device_monitor, "try_gio_mount", lambda: False)
+    monkeypatch.setattr(mtp_tools, "try_gio_mount", gio_mount)
+    monitor = DeviceMonitor(gvfs_base=str(gvfs_base), rescan_interval=60)
+    monitor.start()
+    try:
+        assert monitor.wait_ready(5)
+        logs = []
+        assert mtp_tools._find_mtp_dcim(logs.append, monitor) == mounted[0]
+        assert logs == ["[INFO] Tentative de montage automatique de l'appareil..."]
+    finally:
+        monitor.stop()
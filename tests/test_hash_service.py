@@ -0,0 +1,17 @@
+import os
+
+from utils import DigestCache, HashService
+
+
+def test_refresh_rereads_content_hidden_by_cache(tmp_path):
+    service = HashService(algo="md5", cache=DigestCache(str(tmp_path / "digests.sqlite")))
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"a" * 100)
+    before = service.digest(str(path))
+
+    # Contenu altéré, taille et mtime conservés : le cache ne le voit pas
+    st = os.stat(path)
+    path.write_bytes(b"b" * 100)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert service.digest(str(path)) == before
+    assert service.submit(str(path), refresh=True).result() != before
@@ -0,0 +1,139 @@
+import os
+import time
+import sqlite3
+
+import pytest
+
+from inotify_tools import available as inotify_available
+from journal import ChangeJournal, JournalWatcher
+
+
+def test_changes_after_purge_are_planned(tmp_path):
+    root, target = tmp_path / "photos", tmp_path / "backup"
+    root.mkdir()
+    target.mkdir()
+    journal = ChangeJournal(str(tmp_path / "journal.sqlite"))
+    journal.open_session([str(root)], "S")
+
+    journal.record(str(root / "a.jpg"))
+    session, upto = journal.snapshot(str(root))
+    journal.advance(str(root), str(target), session, upto, full=True)
+
+    # Entrées purgées par advance() : la numérotation ne doit pas repartir sous le curseur
+    journal.record(str(root / "b.jpg"))
+    (session, upto, paths), reason = journal.plan(str(root), str(target), 7)
+    assert reason is None
+    assert paths == [os.path.join(str(root), "b.jpg")]
+    journal.advance(str(root), str(target), session, upto)
+
+    journal.record(str(root / "c.jpg"))
+    (session, upto, paths), _ = journal.plan(str(root), str(target), 7)
+    assert paths == [os.path.join(str(root), "c.jpg")]
+
+
+def test_journal_without_counter_starts_above_cursors(tmp_path):
+    # Journal créé avant le compteur : entrées déjà purgées, curseur à 5
+    path = str(tmp_path / "journal.sqlite")
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE entries (path TEXT PRIMARY KEY, seq INTEGER NOT NULL);
+        CREATE TABLE targets (root TEXT NOT NULL, target TEXT NOT NULL, session TEXT,
+                              cursor INTEGER NOT NULL DEFAULT 0, last_full REAL, PRIMARY KEY (root, target));
+        INSERT INTO targets VALUES ('/x', '/y', 'S', 5, 0);
+    """)
+    db.close()
+    journal = ChangeJournal(path)
+    journal.record("/x/a.jpg")
+    assert journal._db.execute("SELECT seq FROM entries").fetchone()[0] == 6
+
+
+def _targets(tmp_path):
+    root, target = tmp_path / "photos", tmp_path / "backup"
+    root.mkdir()
+    target.mkdir()
+    return str(root), str(target)
+
+
+def test_plan_requires_reference_backup_and_live_session(tmp_path):
+    root, target = _targets(tmp_path)
+    journal = ChangeJournal(str(tmp_path / "journal.sqlite"))
+
+    found, reason = journal.plan(root, target, 7)
+    assert found is None and "référence" in reason
+    assert journal.full_due(root, target, 7)
+
+    # Backup complet pris sans surveillance : pas de session à reconnaître ensuite
+    session, upto = journal.snapshot(root)
+    assert session is None
+    journal.advance(root, target, session, upto, full=True)
+    found, reason = journal.plan(root, target, 7)
+    assert found is None and "non tenu" in reason
+
+    journal.open_session([root], "S1")
+    session, upto = journal.snapshot(root)
+    assert session == "S1"
+    journal.advance(root, target, session, upto, full=True)
+    (session, _, paths), reason = journal.plan(root, target, 7)
+    assert reason is None and session == "S1" and paths == []
+    assert not journal.full_due(root, target, 7)
+
+    # Surveillance redémarrée : le journal a pu manquer des changements
+    journal.open_session([root], "S2")
+    found, reason = journal.plan(root, target, 7)
+    assert found is None and "interrompue" in reason
+
+
+def test_plan_forces_periodic_full_backup(tmp_path):
+    root, target = _targets(tmp_path)
+    journal = ChangeJournal(str(tmp_path / "journal.sqlite"))
+    journal.open_session([root], "S")
+    session, upto = journal.snapshot(root)
+    journal.advance(root, target, session, upto, full=True)
+
+    assert journal.plan(root, target, 7)[1] is None
+    found, reason = journal.plan(root, target, 0)
+    assert found is None and "périodique" in reason
+    assert journal.full_due(root, target, 0)
+
+    # Dernier backup complet vieux de huit jours
+    journal._db.execute("UPDATE targets SET last_full=last_full - 8 * 86400")
+    assert journal.full_due(root, target, 7)
+    assert "périodique" in journal.plan(root, target, 7)[1]
+
+
+def _until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify indisponible")
+def test_watcher_records_changes_in_its_session(tmp_path):
+    root, target = _targets(tmp_path)
+    journal = ChangeJournal(str(tmp_path / "journal.sqlite"))
+    logs = []
+    watcher = JournalWatcher([root], journal=journal, log_callback=logs.append)
+    watcher.start()
+    try:
+        assert _until(lambda: journal.live_session(root) is not None)
+        session, upto = journal.snapshot(root)
+        journal.advance(root, target, session, upto, full=True)
+
+        os.makedirs(os.path.join(root, "2024"))
+        with open(os.path.join(root, "2024", "a.jpg"), "wb") as f:
+            f.write(b"photo")
+        with open(os.path.join(root, "b.jpg"), "wb") as f:
+            f.write(b"photo")
+
+        def planned():
+            found, _ = journal.plan(root, target, 7)
+            return found and set(found[2]) >= {os.path.join(root, "2024"), os.path.join(root, "b.jpg")}
+        assert _until(planned)
+    finally:
+        watcher.stop(wait=True)
+    # Session fermée à l'arrêt : le backup suivant redevient complet
+    assert journal.live_session(root) is None
+    assert logs == []
@@ -0,0 +1,99 @@
+import io
+import random
+import struct
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+import media_formats
+
+
+def _jpeg(size):
+    """JPEG de bruit (assez gros pour ne pas être pris pour un marqueur vide)."""
+    rng = random.Random(size[0] * 1000 + size[1])
+    img = Image.new("L", size)
+    img.putdata([rng.randrange(256) for _ in range(size[0] * size[1])])
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=95)
+    assert len(out.getvalue()) >= media_formats.MIN_PREVIEW_BYTES
+    return out.getvalue()
+
+
+def _ifd(entries, next_ifd):
+    """IFD TIFF little-endian : entries = [(tag, type, valeur)] (SHORT / LONG, une valeur)."""
+    raw = struct.pack("<H", len(entries))
+    for tag, typ, value in sorted(entries):
+        raw += struct.pack("<HHI", tag, typ, 1) + (struct.pack("<HH", value, 0) if typ == 3 else struct.pack("<I", value))
+    return raw + struct.pack("<I", next_ifd)
+
+
+def _raw(tmp_path, preview_size, width=40, height=30):
+    """DNG minimal : IFD0 = image principale 8 bits non compressée, IFD1 = aperçu JPEG."""
+    preview = _jpeg(preview_size)
+    ifd0_entries = 10
+    ifd0_at = 8
+    ifd1_at = ifd0_at + 2 + 12 * ifd0_entries + 4
+    pixels_at = ifd1_at + 2 + 12 * 2 + 4
+    preview_at = pixels_at + width * height
+    ifd0 = _ifd([
+        (0x00FE, 4, 0), (0x0100, 3, width), (0x0101, 3, height), (0x0102, 3, 8), (0x0103, 3, 1),
+        (0x0106, 3, 1), (0x0111, 4, pixels_at), (0x0115, 3, 1), (0x0116, 3, height),
+        (0x0117, 4, width * height),
+    ], ifd1_at)
+    ifd1 = _ifd([(0x0201, 4, preview_at), (0x0202, 4, len(preview))], 0)
+    path = tmp_path / "photo.dng"
+    pixels = bytes(i % 256 for i in range(width * height))
+    path.write_bytes(b"II*\0" + struct.pack("<I", ifd0_at) + ifd0 + ifd1 + pixels + preview)
+    return str(path)
+
+
+def _box(kind, payload, full=None):
+    if full is not None:
+        payload = struct.pack(">I", full) + payload
+    return struct.pack(">I4s", 8 + len(payload), kind.encode()) + payload
+
+
+def _heic(tmp_path, thumbnail_size, width=4000, height=3000):
+    """HEIF minimal : item principal 1 (ispe width x height), item 2 Exif avec vignette JPEG en IFD1."""
+    thumbnail = _jpeg(thumbnail_size)
+    ifd0 = _ifd([], 8 + 6)              # IFD0 vide, IFD1 juste après
+    tiff = b"II*\0" + struct.pack("<I", 8) + ifd0
+    ifd1_at = len(tiff)
+    tiff += _ifd([(0x0201, 4, ifd1_at + 2 + 24 + 4), (0x0202, 4, len(thumbnail))], 0) + thumbnail
+    exif = struct.pack(">I", 6) + b"Exif\0\0" + tiff
+
+    def meta(exif_at):
+        ispe = _box("ispe", struct.pack(">II", width, height), full=0)
+        ipma = _box("ipma", struct.pack(">IHBB", 1, 1, 1, 0x81), full=0)
+        infe = _box("infe", struct.pack(">HH", 2, 0) + b"Exif", full=2 << 24)
+        iloc = _box("iloc", bytes([0x44, 0x00]) + struct.pack(">HHHHII", 1, 2, 0, 1, exif_at, len(exif)), full=0)
+        return _box("meta", _box("pitm", struct.pack(">H", 1), full=0)
+                    + _box("iinf", struct.pack(">H", 1) + infe, full=0)
+                    + iloc + _box("iprp", _box("ipco", ispe) + ipma), full=0)
+
+    ftyp = _box("ftyp", b"heic" + struct.pack(">I", 0) + b"mif1heic")
+    exif_at = len(ftyp) + len(meta(0)) + 8
+    path = tmp_path / "photo.heic"
+    path.write_bytes(ftyp + meta(exif_at) + _box("mdat", exif))
+    return str(path)
+
+
+def test_raw_preview_matching_the_image_is_used(tmp_path):
+    assert media_formats.open_image(_raw(tmp_path, (80, 60))).size == (80, 60)
+
+
+def test_raw_preview_with_another_aspect_is_ignored(tmp_path):
+    # Aperçu carré d'une image 4:3 : resté d'avant un recadrage, l'image elle-même est décodée
+    assert media_formats.open_image(_raw(tmp_path, (64, 64))).size == (40, 30)
+
+
+def test_heif_thumbnail_is_checked_against_primary_item(tmp_path):
+    path = _heic(tmp_path, (80, 60))
+    assert media_formats._scan(path)[3] == (4000, 3000)
+    assert media_formats.open_image(path).size == (80, 60)
+
+    # Vignette portrait d'une image paysage : jamais hachée à la place de l'image
+    path = _heic(tmp_path, (60, 80))
+    if media_formats._pillow_heif() is None:
+        with pytest.raises(ValueError):
+            media_formats.open_image(path)
@@ -0,0 +1,113 @@
+import os
+import merkle
+
+
+def _library(tmp_path):
+    root = tmp_path / "Photos"
+    for year, names in (("2019", ("a.jpg", "b.jpg")), ("2020", ("c.jpg",)), ("2021", ("d.jpg",))):
+        (root / year).mkdir(parents=True)
+        for name in names:
+            (root / year / name).write_bytes(name.encode() * 100)
+    return root
+
+
+def _touch(path, mtime):
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_scan_digests_every_directory(tmp_path):
+    root = _library(tmp_path)
+    tree = merkle.scan(str(root))
+    assert set(tree) == {"", "2019", "2020", "2021"}
+    assert all(digest and files for digest, files in tree.values())
+    assert merkle.scan(str(tmp_path / "absent")) == {}
+
+    # Même arborescence ailleurs, mêmes tailles et dates : mêmes empreintes
+    copy = tmp_path / "copie"
+    for rel in ("2019", "2020", "2021"):
+        (copy / rel).mkdir(parents=True)
+        for name in os.listdir(root / rel):
+            (copy / rel / name).write_bytes((root / rel / name).read_bytes())
+            _touch(copy / rel / name, (root / rel / name).stat().st_mtime_ns)
+    assert merkle.scan(str(copy)) == tree
+
+
+def test_scan_sees_size_and_mtime_changes(tmp_path):
+    root = _library(tmp_path)
+    before = merkle.scan(str(root))
+
+    (root / "2020" / "c.jpg").write_bytes(b"autre contenu, autre taille")
+    after = merkle.scan(str(root))
+    assert after["2020"] != before["2020"]
+    assert after[""] != before[""]
+    assert after["2019"] == before["2019"]
+
+    # Même taille, date décalée au-delà de la résolution FAT
+    mtime = (root / "2019" / "a.jpg").stat().st_mtime_ns
+    _touch(root / "2019" / "a.jpg", mtime + 2 * merkle.MTIME_RESOLUTION_NS)
+    assert merkle.scan(str(root))["2019"] != before["2019"]
+
+
+def test_unchanged_subtrees_lists_topmost_directories(tmp_path):
+    root = _library(tmp_path)
+    stored = merkle.scan(str(root))
+    assert merkle.unchanged_subtrees(stored, stored) == [""]
+
+    (root / "2021" / "e.jpg").write_bytes(b"nouvelle")
+    source = merkle.scan(str(root))
+    assert merkle.unchanged_subtrees(source, stored) == ["2019", "2020"]
+
+    # Dossier illisible : jamais considéré comme inchangé
+    source["2019"] = (None, None)
+    assert merkle.unchanged_subtrees(source, stored) == ["2020"]
+
+
+def test_diff_reports_differing_subtrees(tmp_path):
+    root = _library(tmp_path)
+    backup = merkle.scan(str(root))
+    assert merkle.diff(backup, backup) == []
+
+    (root / "2020" / "c.jpg").unlink()
+    (root / "2022").mkdir()
+    (root / "2021").rename(root / "2021-bis")
+    source = merkle.scan(str(root))
+    assert merkle.diff(source, backup) == [
+        ("2020", merkle.FILES_DIFFER),
+        ("2021", merkle.MISSING_IN_SOURCE),
+        ("2021-bis", merkle.MISSING_IN_BACKUP),
+        ("2022", merkle.MISSING_IN_BACKUP),
+    ]
+
+    source["2019"] = (None, None)
+    assert ("2019", merkle.UNKNOWN) in merkle.diff(source, backup)
+
+
+def test_tree_store_invalidates_modified_directories(tmp_path):
+    root = _library(tmp_path)
+    store = merkle.TreeStore(str(tmp_path / "trees.sqlite"))
+    assert store.load("Photos", str(root)) == {}
+
+    tree = merkle.scan(str(root))
+    store.save("Photos", tree, str(root))
+    assert store.load("Photos", str(root)) == tree
+    assert store.load("Videos", str(root)) == {}
+
+    # Fichier ajouté dans 2020 : son empreinte et celle de la racine sont invalidées
+    (root / "2020" / "x.jpg").write_bytes(b"ajout")
+    mtime = (root / "2020").stat().st_mtime_ns
+    _touch(root / "2020", mtime + 1)
+    loaded = store.load("Photos", str(root))
+    assert loaded["2020"] == (None, None)
+    assert loaded[""] == (None, None)
+    assert loaded["2019"] == tree["2019"]
+
+    # Dossier disparu : retiré, ses parents invalidés
+    for name in os.listdir(root / "2021"):
+        (root / "2021" / name).unlink()
+    (root / "2021").rmdir()
+    loaded = store.load("Photos", str(root))
+    assert "2021" not in loaded
+    assert loaded["2019"] == tree["2019"]
+
+    store.clear("Photos")
+    assert store.load("Photos", str(root)) == {}
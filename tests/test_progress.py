@@ -0,0 +1,44 @@
+import pytest
+
+from progress import ProgressTracker, poll
+
+TclError = pytest.importorskip("tkinter").TclError
+
+
+class FakeWidget:
+    """after() mémorise le rappel ; destroyed simule une fenêtre détruite."""
+
+    def __init__(self):
+        self.pending = None
+        self.destroyed = False
+
+    def after(self, interval, callback):
+        if self.destroyed:
+            raise TclError('invalid command name ".!frame"')
+        self.pending = callback
+
+    def run_pending(self):
+        callback, self.pending = self.pending, None
+        callback()
+
+
+def test_destroyed_widget_stops_polling():
+    widget, tracker, seen = FakeWidget(), ProgressTracker(), []
+    poll(widget, tracker, seen.append)
+    widget.run_pending()
+    assert len(seen) == 1 and widget.pending is not None
+    widget.destroyed = True
+    widget.run_pending()
+    assert tracker.closed
+
+
+def test_render_bug_is_not_swallowed():
+    widget, tracker = FakeWidget(), ProgressTracker()
+
+    def render(snapshot):
+        raise KeyError("files_done")
+
+    poll(widget, tracker, render)
+    with pytest.raises(KeyError):
+        widget.run_pending()
+    assert not tracker.closed
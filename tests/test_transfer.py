@@ -0,0 +1,29 @@
+import os
+import resource
+from transfer import copy_file, Writeback, MAX_PENDING
+
+
+def test_streaming_copy_matches_default(tmp_path):
+    src = tmp_path / "src.bin"
+    src.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+    writeback = Writeback(window=1024 * 1024)
+    digest = copy_file(str(src), str(tmp_path / "a.bin"), hash_algo="md5", writeback=writeback)
+    writeback.close()
+    assert digest == copy_file(str(src), str(tmp_path / "b.bin"), hash_algo="md5")
+    assert (tmp_path / "a.bin").read_bytes() == src.read_bytes()
+
+
+def test_streaming_many_small_files_stays_under_fd_limit(tmp_path):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(256, hard), hard))
+    try:
+        writeback = Writeback()
+        for i in range(1000):
+            src = tmp_path / f"{i}.src"
+            src.write_bytes(b"x" * 8192)
+            copy_file(str(src), str(tmp_path / f"{i}.jpg"), writeback=writeback)
+            assert len(writeback._pending) <= MAX_PENDING
+        writeback.close()
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+    assert (tmp_path / "999.jpg").read_bytes() == b"x" * 8192
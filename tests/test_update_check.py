@@ -0,0 +1,27 @@
+import json
+
+import update_maker
+
+
+def test_conditional_get_and_forced_check(http_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(update_maker, "LATEST_JSON_URL", http_server.url + "/latest.json")
+    monkeypatch.setattr(update_maker, "UPDATE_CACHE_FILE", str(tmp_path / "update_cache.json"))
+    monkeypatch.setattr(update_maker, "load_update_interval", lambda: 600.0)
+    http_server.content_type = "application/json"
+    http_server.body = json.dumps({"version": "9.0.0"}).encode()
+
+    assert update_maker.get_remote_info() == {"version": "9.0.0"}
+    assert len(http_server.requests) == 1
+
+    # Dans l'intervalle minimal : le cache disque suffit, aucune requête
+    assert update_maker.get_remote_info() == {"version": "9.0.0"}
+    assert len(http_server.requests) == 1
+
+    # Vérification demandée : requête conditionnelle, le 304 réutilise le cache
+    assert update_maker.get_remote_info(force=True) == {"version": "9.0.0"}
+    assert http_server.requests[-1]["if_none_match"] == '"v1"'
+
+    # Nouvelle publication : ETag différent, 200 avec le nouveau contenu
+    http_server.body, http_server.etag = json.dumps({"version": "9.1.0"}).encode(), '"v2"'
+    assert update_maker.get_remote_info(force=True) == {"version": "9.1.0"}
+    assert len(http_server.requests) == 3
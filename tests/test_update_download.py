@@ -0,0 +1,61 @@
+import os
+import json
+import hashlib
+
+import pytest
+
+import update_maker
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(update_maker.tempfile, "gettempdir", lambda: str(tmp_path))
+    monkeypatch.setattr(update_maker, "PARALLEL_MIN_SIZE", 1024)
+    return tmp_path
+
+
+def _paths(temp_dir):
+    final = temp_dir / update_maker.TEMP_EXE_NAME
+    return final, temp_dir / (final.name + ".part"), temp_dir / (final.name + ".part.json")
+
+
+def test_parallel_ranges(http_server, temp_dir):
+    http_server.body = os.urandom(256 * 1024 + 3)
+    path = update_maker.download_update(http_server.url + "/app", sha256=hashlib.sha256(http_server.body).hexdigest())
+    assert path and open(path, "rb").read() == http_server.body
+    ranges = [r["range"] for r in http_server.requests if r["range"] != "bytes=0-0"]
+    assert len(ranges) == update_maker.DOWNLOAD_CONNECTIONS
+
+
+def test_resume_from_part_state(http_server, temp_dir):
+    http_server.body = body = os.urandom(64 * 1024)
+    final, part, state = _paths(temp_dir)
+    half = len(body) // 2
+    part.write_bytes(body[:1000] + b"\0" * (len(body) - 1000))
+    state.write_text(json.dumps({"url": http_server.url + "/app", "size": len(body), "validator": '"v1"',
+                                 "segments": [[0, half - 1, 1000], [half, len(body) - 1, 0]]}))
+    path = update_maker.download_update(http_server.url + "/app", sha256=hashlib.sha256(body).hexdigest())
+    assert path and open(path, "rb").read() == body
+    ranges = sorted(r["range"] for r in http_server.requests if r["range"] != "bytes=0-0")
+    assert ranges == [f"bytes=1000-{half - 1}", f"bytes={half}-{len(body) - 1}"]
+    assert not state.exists()
+
+
+def test_sha_mismatch_discards_download(http_server, temp_dir):
+    http_server.body = os.urandom(64 * 1024)
+    messages = []
+    assert update_maker.download_update(http_server.url + "/app", log_callback=messages.append,
+                                        sha256="0" * 64) is None
+    final, part, _ = _paths(temp_dir)
+    assert not part.exists() and not final.exists()
+    assert any("SHA-256 invalide" in m for m in messages)
+
+
+def test_stale_longer_part_is_truncated(http_server, temp_dir):
+    # Ni Range ni Content-Length : aucune reprise possible, l'ancien .part doit être écrasé
+    http_server.body = os.urandom(4096)
+    http_server.ranges = http_server.length = False
+    _, part, _ = _paths(temp_dir)
+    part.write_bytes(b"x" * 10000)
+    path = update_maker.download_update(http_server.url + "/app")
+    assert path and open(path, "rb").read() == http_server.body
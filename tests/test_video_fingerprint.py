@@ -0,0 +1,40 @@
+import video_fingerprint
+from video_fingerprint import VideoIndex
+
+FADE = 0x00000000000000ff
+SCENE_A = (0x0f0f0f0f0f0f0f0f, 0x3333333333333333, 0x5555555555555555, 0x6969696969696969)
+SCENE_B = (0xf0f0f0f0f0f0f0f0, 0xcccccccccccccccc, 0xaaaaaaaaaaaaaaaa, 0x9696969696969696)
+
+
+def _flip(h, bits=2):
+    """Même image après ré-encodage : quelques bits du pHash changent."""
+    return h ^ ((1 << bits) - 1) << 20
+
+
+def test_reencoded_copy_is_matched():
+    index = VideoIndex()
+    index.add("original.mp4", (60.0, (FADE,) + SCENE_A))
+    copy = (60.4, tuple(_flip(h) for h in (FADE,) + SCENE_A))
+    assert index.match(copy) == "original.mp4"
+
+
+def test_different_videos_with_black_intros_are_not_matched():
+    # Deux vidéos distinctes ouvertes par le même fondu : la seconde a une intro plus longue,
+    # ses trois premières images ressemblent toutes à la première image de l'autre
+    index = VideoIndex()
+    index.add("a.mp4", (60.0, (FADE,) + SCENE_A))
+    other = (60.0, (FADE, FADE, FADE) + SCENE_B[:2])
+    assert index.match(other) is None
+
+
+def test_duration_mismatch_is_not_matched():
+    index = VideoIndex()
+    index.add("long.mp4", (60.0, (FADE,) + SCENE_A))
+    shorter = (30.0, (FADE,) + SCENE_A)
+    assert index.match(shorter) is None
+
+
+def test_fingerprint_cache_roundtrip():
+    fp = (12.5, (None, 0x0123456789abcdef, 0xfedcba9876543210, None, 0x1))
+    assert video_fingerprint._decode(video_fingerprint._encode(fp)) == fp
+    assert video_fingerprint._decode(video_fingerprint._encode(None)) is None
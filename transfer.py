@@ -0,0 +1,273 @@
+import os
+import sys
+import time
+import shutil
+import ctypes
+import ctypes.util
+import threading
+from utils import new_hasher
+from config import get_config
+
+# Bornes de la taille de bloc adaptative
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 16 * 1024 * 1024
+START_CHUNK = 1024 * 1024
+
+# Durée visée pour un bloc : assez court pour réagir vite à l'annulation,
+# assez long pour amortir le coût des appels système (surtout via MTP/GVFS)
+TARGET_CHUNK_SECONDS = (0.05, 0.25)
+
+# Intervalle minimal entre deux remontées de progression octets
+REPORT_INTERVAL = 0.2
+
+PART_SUFFIX = ".part"
+
+# Mode "flux" (Writeback) : blocs multiples du MiB, écritures rendues au disque par fenêtres
+STREAM_MIN_CHUNK = 1024 * 1024
+SYNC_WINDOW = 32 * 1024 * 1024
+# Fenêtres en attente au plus (un descripteur dupliqué chacune) : les petits fichiers vont par lots
+MAX_PENDING = 64
+
+# sync_file_range (cf. <fcntl.h>), absent du module os
+SYNC_FILE_RANGE_WAIT_BEFORE = 1
+SYNC_FILE_RANGE_WRITE = 2
+SYNC_FILE_RANGE_WAIT_AFTER = 4
+
+_sync_file_range = None
+
+
+def _load_sync_file_range():
+    """sync_file_range de la libc (Linux), ou False si indisponible : repli sur os.fdatasync."""
+    global _sync_file_range
+    if _sync_file_range is None:
+        _sync_file_range = False
+        if sys.platform.startswith("linux"):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                func = libc.sync_file_range
+                func.argtypes = (ctypes.c_int, ctypes.c_int64, ctypes.c_int64, ctypes.c_uint)
+                func.restype = ctypes.c_int
+                _sync_file_range = func
+            except (OSError, AttributeError):
+                pass
+    return _sync_file_range
+
+
+def _fadvise(fd, advice, offset=0, length=0):
+    """os.posix_fadvise(fd, offset, length, POSIX_FADV_<advice>) ; simple conseil, ignoré là où il n'existe pas."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, offset, length, getattr(os, "POSIX_FADV_" + advice))
+        except OSError:
+            pass
+
+
+class TransferCancelled(Exception):
+    """Levée quand la copie est annulée entre deux blocs (le fichier partiel est supprimé)."""
+
+
+class ThroughputMeter:
+    """Débit lissé (moyenne exponentielle) et estimation du temps restant."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.rate = 0.0
+        self._last = None
+
+    def update(self, nbytes):
+        now = time.monotonic()
+        if self._last is not None:
+            elapsed = now - self._last
+            if elapsed > 0:
+                instant = nbytes / elapsed
+                self.rate = instant if self.rate == 0 else \
+                    self.alpha * instant + (1 - self.alpha) * self.rate
+        self._last = now
+        return self.rate
+
+    def eta(self, remaining):
+        if self.rate <= 0:
+            return None
+        return remaining / self.rate
+
+
+def format_rate(rate):
+    """Formate un débit en octets/s (ex: '32.4 Mo/s')."""
+    for unit in ("o/s", "Ko/s", "Mo/s"):
+        if rate < 1024:
+            return f"{rate:.1f} {unit}"
+        rate /= 1024
+    return f"{rate:.1f} Go/s"
+
+
+def format_eta(seconds):
+    """Formate un temps restant en h:mm:ss ou m:ss ('--:--' si inconnu)."""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
+
+
+class Writeback:
+    """
+    Mode "flux" de copy_file, pour les gros volumes écrits une seule fois (backup, import).
+    Par défaut, tout ce qui est copié passe par le cache de pages et en chasse l'espace de travail
+    du bureau, alors que ces données ne seront pas relues. Avec un Writeback :
+    - la source est lue séquentiellement (POSIX_FADV_SEQUENTIAL) puis retirée du cache ;
+    - les blocs sont lus dans un tampon réutilisé, par multiples du MiB ;
+    - chaque fenêtre de SYNC_WINDOW octets écrits est envoyée au disque sans attendre
+      (sync_file_range), et la fenêtre précédente est attendue puis retirée du cache
+      (POSIX_FADV_DONTNEED). Le disque écrit en continu pendant la lecture de la suite, et le
+      cache ne garde qu'une ou deux fenêtres de données sales, fichiers successifs compris
+      (au plus MAX_PENDING fichiers en attente, pour borner les descripteurs ouverts).
+    Sans sync_file_range (hors Linux), les fenêtres sont attendues par os.fdatasync.
+    Un seul Writeback par moteur ; close() attend les dernières écritures. Thread-safe.
+    """
+
+    def __init__(self, window=SYNC_WINDOW):
+        self.window = window
+        self._pending = []          # (fd dupliqué, début, fin) envoyés au disque, pas encore attendus
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        self._buffers = threading.local()
+
+    def buffer(self):
+        """Tampon de lecture de MAX_CHUNK octets, propre au thread appelant."""
+        buf = getattr(self._buffers, "buf", None)
+        if buf is None:
+            buf = self._buffers.buf = bytearray(MAX_CHUNK)
+        return buf
+
+    def written(self, fd, start, end):
+        """Envoie [start, end) de fd au disque, et attend les fenêtres plus anciennes au-delà de window."""
+        if end <= start:
+            return
+        sync_file_range = _load_sync_file_range()
+        if sync_file_range:
+            sync_file_range(fd, start, end - start, SYNC_FILE_RANGE_WRITE)
+        with self._lock:
+            while self._pending and (self._pending_bytes >= self.window or len(self._pending) >= MAX_PENDING):
+                self._wait(*self._pending.pop(0))
+            try:
+                dup = os.dup(fd)
+            except OSError:
+                # Plus de descripteur disponible : la fenêtre est attendue tout de suite
+                self._settle(fd, start, end)
+                return
+            self._pending.append((dup, start, end))
+            self._pending_bytes += end - start
+
+    @staticmethod
+    def _settle(fd, start, end):
+        """Attend l'écriture de [start, end) de fd puis la retire du cache."""
+        try:
+            sync_file_range = _load_sync_file_range()
+            if sync_file_range:
+                sync_file_range(fd, start, end - start,
+                                SYNC_FILE_RANGE_WAIT_BEFORE | SYNC_FILE_RANGE_WRITE | SYNC_FILE_RANGE_WAIT_AFTER)
+            else:
+                os.fdatasync(fd)
+            _fadvise(fd, "DONTNEED", start, end - start)
+        except OSError:
+            pass
+
+    def _wait(self, fd, start, end):
+        try:
+            self._settle(fd, start, end)
+        finally:
+            self._pending_bytes -= end - start
+            os.close(fd)
+
+    def close(self):
+        """Attend les écritures en cours et les retire du cache."""
+        with self._lock:
+            while self._pending:
+                self._wait(*self._pending.pop(0))
+
+
+def configured_writeback(streaming=None):
+    """Writeback pour un moteur de copie, ou None (copie par défaut). streaming : None = config.json (transfer)."""
+    config = get_config().transfer
+    if streaming is None:
+        streaming = config.streaming
+    return Writeback(config.sync_window_mb * 1024 * 1024) if streaming else None
+
+
+def copy_file(src, dst, cancel_flag=None, progress_callback=None, hash_algo=None, writeback=None):
+    """
+    Copie src vers dst par blocs de taille adaptative, métadonnées comprises (comme shutil.copy2).
+    - progress_callback(copied, total, rate, eta) est appelé au plus toutes les REPORT_INTERVAL s ;
+    - l'annulation est vérifiée entre chaque bloc (TransferCancelled) ;
+    - la copie se fait dans dst + '.part', renommé à la fin : aucun fichier partiel ne subsiste ;
+    - writeback : mode "flux", qui épargne le cache de pages (voir Writeback).
+    Retourne le condensat hexadécimal si hash_algo est fourni (calculé pendant la copie, voir utils.new_hasher), sinon None.
+    """
+    total = os.path.getsize(src)
+    hasher = new_hasher(hash_algo) if hash_algo else None
+    meter = ThroughputMeter()
+    part = dst + PART_SUFFIX
+    chunk = START_CHUNK
+    min_chunk = STREAM_MIN_CHUNK if writeback else MIN_CHUNK
+    view = memoryview(writeback.buffer()) if writeback else None
+    copied = 0
+    synced = 0
+    last_report = 0.0
+
+    try:
+        with open(src, "rb", buffering=0 if writeback else -1) as fsrc, open(part, "wb") as fdst:
+            if writeback:
+                _fadvise(fsrc.fileno(), "SEQUENTIAL")
+            meter.update(0)
+            while True:
+                if cancel_flag and cancel_flag.cancelled:
+                    raise TransferCancelled(src)
+
+                t0 = time.monotonic()
+                if writeback:
+                    data = view[:fsrc.readinto(view[:chunk])]
+                else:
+                    data = fsrc.read(chunk)
+                if not data:
+                    break
+                fdst.write(data)
+                if hasher:
+                    hasher.update(data)
+                copied += len(data)
+                if writeback and copied - synced >= writeback.window:
+                    fdst.flush()
+                    writeback.written(fdst.fileno(), synced, copied)
+                    _fadvise(fsrc.fileno(), "DONTNEED", synced, copied - synced)
+                    synced = copied
+                elapsed = time.monotonic() - t0
+
+                # Ajustement de la taille de bloc selon la durée du dernier bloc
+                if elapsed < TARGET_CHUNK_SECONDS[0]:
+                    chunk = min(chunk * 2, MAX_CHUNK)
+                elif elapsed > TARGET_CHUNK_SECONDS[1]:
+                    chunk = max(chunk // 2, min_chunk)
+
+                meter.update(len(data))
+                now = time.monotonic()
+                if progress_callback and now - last_report >= REPORT_INTERVAL:
+                    last_report = now
+                    progress_callback(copied, total, meter.rate, meter.eta(total - copied))
+
+            if writeback:
+                fdst.flush()
+                writeback.written(fdst.fileno(), synced, copied)
+                _fadvise(fsrc.fileno(), "DONTNEED")
+
+        shutil.copystat(src, part)
+        os.replace(part, dst)
+    except BaseException:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        raise
+
+    if progress_callback:
+        progress_callback(copied, total, meter.rate, 0)
+    return hasher.hexdigest() if hasher else None
@@ -4,12 +4,53 @@ import tempfile
 import subprocess
 import json
 import time
-from utils import resource_path, VERSION_FILE  # pyright: ignore[reportMissingImports]
+import hashlib
+import threading
+from utils import resource_path, external_path, load_update_interval, VERSION_FILE  # pyright: ignore[reportMissingImports]
 
 TEST_LOCAL = False
-LATEST_JSON_URL = "https://raw.githubusercontent.com/Alcatrax28/MemorEase/main/latest.json"
+# Surcharge possible (ex: serveur HTTP local pour les essais)
+LATEST_JSON_URL = os.environ.get(
+    "MEMOREASE_UPDATE_URL",
+    "https://raw.githubusercontent.com/Alcatrax28/MemorEase/main/latest.json"
+)
 TEMP_EXE_NAME = "MemorEase_Update"
 
+# Cache disque de latest.json (ETag / Last-Modified + date de la dernière vérification)
+UPDATE_CACHE_FILE = external_path(os.path.join("assets", "update_cache.json"))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Session HTTP partagée (connexions keep-alive réutilisées entre vérification et téléchargement)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers["User-Agent"] = f"MemorEase/{get_local_version()}"
+        return _session
+
+def _load_cache():
+    try:
+        with open(UPDATE_CACHE_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+            if isinstance(cache, dict):
+                return cache
+    except Exception:
+        pass
+    return {}
+
+def _save_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(UPDATE_CACHE_FILE), exist_ok=True)
+        tmp = UPDATE_CACHE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=4, ensure_ascii=False)
+        os.replace(tmp, UPDATE_CACHE_FILE)
+    except OSError:
+        pass
+
 # --- Lecture de la version locale ---
 def get_local_version():
     try:
@@ -19,17 +60,51 @@ def get_local_version():
         return "0.0.0"
 
 # --- Lecture des infos distantes ---
-def get_remote_info():
+def get_remote_info(force=False):
+    """
+    Retourne le contenu de latest.json.
+    - sous l'intervalle minimal de vérification (config : update_check_interval), le cache disque suffit ;
+    - sinon requête conditionnelle (If-None-Match / If-Modified-Since) : un 304 réutilise le cache.
+    force=True ignore l'intervalle (mais garde la requête conditionnelle).
+    """
     try:
         if TEST_LOCAL:
             with open("latest.json", "r", encoding="utf-8") as f:
                 return json.load(f)
-        else:
-            r = requests.get(LATEST_JSON_URL, timeout=5)
-            if r.status_code == 200:
-                return r.json()
+
+        cache = _load_cache()
+        cached_data = cache.get("data")
+        now = time.time()
+        if (not force and cached_data
+                and cache.get("url") == LATEST_JSON_URL
+                and now - cache.get("checked_at", 0) < load_update_interval()):
+            return cached_data
+
+        headers = {}
+        if cached_data and cache.get("url") == LATEST_JSON_URL:
+            if cache.get("etag"):
+                headers["If-None-Match"] = cache["etag"]
+            if cache.get("last_modified"):
+                headers["If-Modified-Since"] = cache["last_modified"]
+
+        r = get_session().get(LATEST_JSON_URL, headers=headers, timeout=5)
+        if r.status_code == 304 and cached_data:
+            cache["checked_at"] = now
+            _save_cache(cache)
+            return cached_data
+        if r.status_code == 200:
+            data = r.json()
+            _save_cache({
+                "url": LATEST_JSON_URL,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "checked_at": now,
+                "data": data,
+            })
+            return data
     except Exception:
         return None
+    return None
 
 # --- Comparaison des versions ---
 def normalize_version(v):
@@ -42,9 +117,9 @@ def is_update_available(local_version, remote_version):
     return normalize_version(remote_version) > normalize_version(local_version)
 
 # --- Vérification de mise à jour ---
-def check_for_update():
+def check_for_update(force=False):
     local = get_local_version()
-    remote_data = get_remote_info()
+    remote_data = get_remote_info(force=force)
     if not remote_data:
         return None, local, None
 
@@ -54,47 +129,240 @@ def check_for_update():
             "new_version": remote_version,
             "url": remote_data.get("url"),
             "changelog": remote_data.get("changelog", []),
-            "mandatory": remote_data.get("mandatory", False)
+            "mandatory": remote_data.get("mandatory", False),
+            "sha256": remote_data.get("sha256")
         }, local, remote_version
 
     return None, local, remote_version
 
+def check_for_update_async(callback, force=False):
+    """
+    Lance check_for_update() dans un thread et appelle callback(update_info, local, remote)
+    depuis ce thread : c'est à l'appelant de repasser dans le thread Tk (after).
+    """
+    def worker():
+        callback(*check_for_update(force=force))
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
+
 # --- Téléchargement du fichier de mise à jour ---
-def download_update(url, log_callback=None, progress_callback=None, cancel_flag=None):
+DOWNLOAD_CHUNK = 1024 * 1024            # gros blocs : moins d'appels système et de réveils
+DOWNLOAD_CONNECTIONS = 4                # connexions parallèles si le serveur accepte les Range
+PARALLEL_MIN_SIZE = 8 * 1024 * 1024     # en dessous, une seule connexion suffit
+SEGMENT_RETRIES = 3
+STATE_SAVE_INTERVAL = 1.0
+
+class _Segment:
+    """Plage [start, end] du fichier ; done = octets déjà écrits depuis start."""
+
+    def __init__(self, start, end, done=0):
+        self.start = start
+        self.end = end          # None si la taille totale est inconnue
+        self.done = done
+        self.complete = end is not None and done > end - start
+
+    @property
+    def length(self):
+        return None if self.end is None else self.end - self.start + 1
+
+def _probe(url):
+    """Retourne (taille, accepte_range, validateur ETag/Last-Modified, Content-Type)."""
+    r = get_session().get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=10)
+    try:
+        content_type = r.headers.get("Content-Type", "")
+        validator = r.headers.get("ETag") or r.headers.get("Last-Modified") or ""
+        if r.status_code == 206:
+            total = r.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+            if total.isdigit():
+                return int(total), True, validator, content_type
+        r.raise_for_status()
+        return int(r.headers.get("Content-Length", 0)), False, validator, content_type
+    finally:
+        r.close()
+
+def _load_state(state_path, url, size, validator):
+    """Segments d'un téléchargement interrompu compatible (même URL, taille, validateur), sinon None."""
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if (state.get("url"), state.get("size"), state.get("validator")) != (url, size, validator):
+            return None
+        return [_Segment(start, end, done) for start, end, done in state["segments"]]
+    except Exception:
+        return None
+
+def _save_state(state_path, url, size, validator, segments):
+    tmp = state_path + ".tmp"
     try:
-        r = requests.get(url, stream=True, timeout=10)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "url": url, "size": size, "validator": validator,
+                "segments": [[seg.start, seg.end, seg.done] for seg in segments],
+            }, f)
+        os.replace(tmp, state_path)
+    except OSError:
+        pass
+
+def _split(size, connections):
+    step = -(-size // connections)
+    return [_Segment(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+def _download_segment(url, fd, seg, use_range, session, cancel_flag, errors):
+    """Télécharge un segment par pwrite, avec reprise à la position courante en cas d'erreur."""
+    last_error = None
+    for _ in range(SEGMENT_RETRIES if use_range else 1):
+        headers = {"Range": f"bytes={seg.start + seg.done}-{seg.end}"} if use_range else {}
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=10) as r:
+                if use_range and r.status_code != 206:
+                    raise IOError(f"réponse HTTP {r.status_code} à une requête Range")
+                r.raise_for_status()
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                    if cancel_flag and cancel_flag.cancelled:
+                        return
+                    if chunk:
+                        os.pwrite(fd, chunk, seg.start + seg.done)
+                        seg.done += len(chunk)
+            if seg.end is None or seg.done >= seg.length:
+                seg.complete = True
+                return
+            last_error = IOError("connexion fermée avant la fin du segment")
+        except Exception as e:
+            last_error = e
+    errors.append(last_error)
+
+def _contiguous(segments):
+    """Nombre d'octets écrits sans trou depuis le début du fichier."""
+    for seg in segments:
+        if not seg.complete:
+            return seg.start + seg.done
+    last = segments[-1]
+    return last.start + last.done
+
+def _hash_upto(fd, hasher, hashed, frontier):
+    """Ajoute au condensat les octets [hashed, frontier[ fraîchement écrits (encore en cache)."""
+    while hashed < frontier:
+        data = os.pread(fd, min(DOWNLOAD_CHUNK, frontier - hashed), hashed)
+        if not data:
+            break
+        hasher.update(data)
+        hashed += len(data)
+    return hashed
+
+def download_update(url, log_callback=None, progress_callback=None, cancel_flag=None, sha256=None):
+    """
+    Télécharge la mise à jour dans le dossier temporaire et retourne son chemin (None en cas d'échec).
+    - requêtes Range réparties sur plusieurs connexions quand le serveur les accepte ;
+    - reprise après interruption grâce à <fichier>.part + <fichier>.part.json ;
+    - SHA-256 (champ "sha256" de latest.json) calculé au fil de l'eau, sur la partie
+      contiguë déjà reçue, pendant que les segments suivants arrivent.
+    """
+    def log(msg):
+        if log_callback: log_callback(msg)
+
+    temp_path = os.path.join(tempfile.gettempdir(), TEMP_EXE_NAME)
+    part_path = temp_path + ".part"
+    state_path = part_path + ".json"
+
+    try:
+        size, use_range, validator, content_type = _probe(url)
 
         # Vérifie que le lien pointe bien vers un fichier binaire
-        content_type = r.headers.get("Content-Type", "")
         if "text/html" in content_type:
-            if log_callback: log_callback("Le lien ne pointe pas vers un fichier exécutable.")
+            log("Le lien ne pointe pas vers un fichier exécutable.")
             return None
 
-        total_size = int(r.headers.get('content-length', 0))
-        temp_path = os.path.join(tempfile.gettempdir(), TEMP_EXE_NAME)
-
-        with open(temp_path, "wb") as f:
-            downloaded = 0
-            for chunk in r.iter_content(chunk_size=8192):
-                if cancel_flag and cancel_flag.cancelled:
-                    if log_callback: log_callback("Téléchargement annulé.")
-                    return None
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if progress_callback:
-                        progress_callback(downloaded, total_size)
+        segments = _load_state(state_path, url, size, validator) if use_range and os.path.exists(part_path) else None
+        resumed = bool(segments)
+        if resumed:
+            log(f"Reprise du téléchargement ({sum(seg.done for seg in segments)} / {size} octets déjà reçus).")
+        elif use_range and size:
+            segments = _split(size, DOWNLOAD_CONNECTIONS if size >= PARALLEL_MIN_SIZE else 1)
+        else:
+            segments = [_Segment(0, size - 1 if size else None)]
+            use_range = False
+
+        # Sans reprise, un .part plus long laissé par un essai précédent ne doit rien garder
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT | (0 if resumed else os.O_TRUNC), 0o644)
+        sessions = []
+        try:
+            if size and os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+
+            if len(segments) > 1:
+                log(f"Téléchargement sur {len(segments)} connexions parallèles.")
+            errors = []
+            workers = []
+            for seg in segments:
+                if seg.complete:
+                    continue
+                if len(segments) > 1:
+                    session = requests.Session()
+                    sessions.append(session)
+                else:
+                    session = get_session()
+                t = threading.Thread(target=_download_segment,
+                                     args=(url, fd, seg, use_range, session, cancel_flag, errors),
+                                     daemon=True)
+                t.start()
+                workers.append(t)
+
+            hasher = hashlib.sha256()
+            hashed = 0
+            last_save = time.monotonic()
+            while True:
+                alive = [t for t in workers if t.is_alive()]
+                if alive:
+                    alive[0].join(0.1)
+                hashed = _hash_upto(fd, hasher, hashed, _contiguous(segments))
+                if progress_callback:
+                    progress_callback(sum(seg.done for seg in segments), size)
+                if use_range and time.monotonic() - last_save >= STATE_SAVE_INTERVAL:
+                    _save_state(state_path, url, size, validator, segments)
+                    last_save = time.monotonic()
+                if not alive:
+                    break
+
+            if use_range:
+                _save_state(state_path, url, size, validator, segments)
+            if cancel_flag and cancel_flag.cancelled:
+                log("Téléchargement annulé (reprise possible au prochain essai)." if use_range
+                    else "Téléchargement annulé.")
+                return None
+            if errors or not all(seg.complete for seg in segments):
+                log(f"Erreur : {errors[0] if errors else 'téléchargement incomplet'}")
+                return None
+            hashed = _hash_upto(fd, hasher, hashed, _contiguous(segments))
+        finally:
+            os.close(fd)
+            for session in sessions:
+                session.close()
+
+        digest = hasher.hexdigest()
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
+        if sha256:
+            if digest.lower() != sha256.strip().lower():
+                os.remove(part_path)
+                log("Empreinte SHA-256 invalide : fichier corrompu, téléchargement supprimé.")
+                return None
+            log("Empreinte SHA-256 vérifiée.")
+        else:
+            log("Aucune empreinte SHA-256 publiée : vérification limitée à la taille.")
 
         # Vérifie que le fichier est suffisamment grand pour être valide
-        if os.path.getsize(temp_path) < 1024:
-            if log_callback: log_callback("Fichier téléchargé trop petit ou invalide.")
+        if os.path.getsize(part_path) < 1024:
+            log("Fichier téléchargé trop petit ou invalide.")
             return None
 
-        if log_callback: log_callback(f"Téléchargement terminé : {temp_path}")
+        os.replace(part_path, temp_path)
+        log(f"Téléchargement terminé : {temp_path}")
         return temp_path
 
     except Exception as e:
-        if log_callback: log_callback(f"Erreur : {e}")
+        log(f"Erreur : {e}")
         return None
 
 # --- Lancement de la nouvelle version ---
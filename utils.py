@@ -1,9 +1,7 @@
 import os
 import sys
-import json
 import hashlib
-import imagehash        # pyright: ignore[reportMissingImports]
-from PIL import Image   # pyright: ignore[reportMissingImports]
+import threading
 
 def resource_path(relative_path: str) -> str:
     """
@@ -41,14 +39,218 @@ def read_version() -> str:
     except FileNotFoundError:
         return ""
 
-def file_md5(path, block_size=65536):
-    md5 = hashlib.md5()
+# -------------------------------
+# Service de hachage partagé (tri, backup, import)
+# -------------------------------
+# Condensats déjà calculés, indexés par (disque, inode, algo) et validés par taille + mtime :
+# un fichier renommé ou déplacé sur le même disque garde son entrée.
+HASH_CACHE_FILE = external_path(os.path.join("assets", "digest_cache.sqlite"))
+HASH_ALGOS = ("xxh3", "blake2b", "md5")
+HASH_BLOCK_SIZE = 1024 * 1024
+HASH_MMAP_THRESHOLD = 64 * 1024 * 1024
+HASH_COMMIT_EVERY = 200
+
+def _xxhash():
+    try:
+        import xxhash    # pyright: ignore[reportMissingImports]
+        return xxhash
+    except ImportError:
+        return None
+
+def default_hash_algo():
+    """xxh3 si le module xxhash est installé (le plus rapide), sinon BLAKE2b."""
+    return "xxh3" if _xxhash() else "blake2b"
+
+def new_hasher(algo):
+    """Objet de hachage (update / hexdigest) pour xxh3, blake2b, md5 ou tout algorithme de hashlib."""
+    if algo == "xxh3":
+        module = _xxhash()
+        if module is None:
+            raise ValueError("xxh3 nécessite le module xxhash")
+        return module.xxh3_128()
+    return hashlib.new(algo)
+
+def _hash_file(path, algo, size):
+    """Hache un fichier : mmap pour les gros fichiers, hashlib.file_digest sinon (lecture par blocs en repli)."""
     with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(block_size), b""):
-            md5.update(chunk)
-    return md5.hexdigest()
+        if size >= HASH_MMAP_THRESHOLD:
+            import mmap
+            hasher = new_hasher(algo)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                if hasattr(m, "madvise"):
+                    m.madvise(mmap.MADV_SEQUENTIAL)
+                hasher.update(m)
+            return hasher.hexdigest()
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, lambda: new_hasher(algo)).hexdigest()
+        hasher = new_hasher(algo)
+        for chunk in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+class DigestCache:
+    """
+    Cache persistant (SQLite) des condensats. Une entrée n'est valable que si la taille
+    et le mtime (ns) du fichier n'ont pas changé. Écritures groupées (HASH_COMMIT_EVERY).
+    En cas d'erreur d'accès au fichier, le cache reste en mémoire pour la session.
+    """
+
+    def __init__(self, path=HASH_CACHE_FILE):
+        import sqlite3
+        self._lock = threading.Lock()
+        self._pending = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+        except (OSError, sqlite3.Error) as e:
+            print(f"[ERREUR] Cache de condensats indisponible ({e}), cache en mémoire.")
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            " dev INTEGER, ino INTEGER, algo TEXT, size INTEGER, mtime_ns INTEGER,"
+            " path TEXT, digest TEXT, PRIMARY KEY (dev, ino, algo))"
+        )
+
+    def get(self, st, algo):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, mtime_ns, digest FROM digests WHERE dev=? AND ino=? AND algo=?",
+                (st.st_dev, st.st_ino, algo)
+            ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        return None
+
+    def put(self, path, st, algo, digest):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (st.st_dev, st.st_ino, algo, st.st_size, st.st_mtime_ns, path, digest)
+            )
+            self._pending += 1
+            if self._pending >= HASH_COMMIT_EVERY:
+                self._db.commit()
+                self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._db.commit()
+                self._pending = 0
+
+    def prune(self):
+        """Supprime les entrées dont le fichier n'existe plus. Retourne le nombre d'entrées supprimées."""
+        with self._lock:
+            rows = self._db.execute("SELECT dev, ino, algo, path FROM digests").fetchall()
+        stale = [(dev, ino, algo) for dev, ino, algo, path in rows if not os.path.exists(path)]
+        with self._lock:
+            self._db.executemany("DELETE FROM digests WHERE dev=? AND ino=? AND algo=?", stale)
+            self._db.commit()
+        return len(stale)
+
+class HashService:
+    """
+    Point d'entrée unique pour hacher des fichiers : consulte le cache, calcule si besoin
+    et mémorise le résultat. submit() / digest_many() hachent en parallèle sur un pool de
+    threads (hashlib relâche le GIL pendant le calcul).
+    """
+
+    def __init__(self, algo=None, cache=None, workers=None):
+        self.algo = algo or default_hash_algo()
+        self.cache = cache if cache is not None else DigestCache()
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._pool = None
+
+    def digest(self, path, algo=None, refresh=False):
+        """refresh : relit le fichier même si le cache a une entrée valide (vérification du contenu)."""
+        algo = algo or self.algo
+        st = os.stat(path)
+        cached = None if refresh else self.cache.get(st, algo)
+        if cached:
+            return cached
+        digest = _hash_file(path, algo, st.st_size)
+        # Le fichier a pu changer pendant la lecture : on ne mémorise que si son stat est stable
+        st_after = os.stat(path)
+        if (st_after.st_size, st_after.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+            self.cache.put(path, st, algo, digest)
+        return digest
+
+    def remember(self, path, digest, algo=None, before=None):
+        """
+        Enregistre un condensat calculé ailleurs (pendant une copie par exemple).
+        before : stat pris avant le calcul ; si le fichier a changé depuis, rien n'est enregistré.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if before is not None and (before.st_size, before.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+            return
+        self.cache.put(path, st, algo or self.algo, digest)
+
+    def submit(self, path, algo=None, refresh=False):
+        """Hache path en arrière-plan et retourne un Future."""
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hash")
+        return self._pool.submit(self.digest, path, algo, refresh)
+
+    def digest_many(self, paths, algo=None):
+        """{chemin: condensat} pour une liste de fichiers (None si le fichier est illisible)."""
+        futures = {path: self.submit(path, algo) for path in paths}
+        results = {}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except OSError:
+                results[path] = None
+        return results
+
+    def flush(self):
+        self.cache.flush()
+
+_hash_service = None
+_hash_service_lock = threading.Lock()
+
+def get_hash_service():
+    """Service de hachage partagé par tout le processus (créé au premier appel)."""
+    global _hash_service
+    with _hash_service_lock:
+        if _hash_service is None:
+            import atexit
+            from config import get_config, subscribe
+            settings = get_config()
+            _hash_service = HashService(algo=settings.cache.hash_algo or None,
+                                        workers=settings.concurrency.hash_workers or None)
+            atexit.register(_hash_service.flush)
+            subscribe(_on_config_change)
+        return _hash_service
+
+def _on_config_change(config, sections):
+    # Changement d'algorithme : s'applique aux prochains fichiers hachés
+    if "cache" in sections and _hash_service is not None:
+        _hash_service.algo = config.cache.hash_algo or default_hash_algo()
+
+def set_hash_service(service):
+    """Remplace le service partagé (benchmarks, cache isolé). Retourne le précédent."""
+    global _hash_service
+    with _hash_service_lock:
+        previous, _hash_service = _hash_service, service
+    return previous
+
+def file_digest(path, algo=None):
+    """Condensat de path via le service partagé (algorithme par défaut du service si algo est None)."""
+    return get_hash_service().digest(path, algo)
+
+def file_md5(path):
+    """MD5 d'un fichier (compatibilité), via le service et son cache."""
+    return file_digest(path, "md5")
 
 def image_hash(path):
+    import imagehash        # pyright: ignore[reportMissingImports]
+    from PIL import Image   # pyright: ignore[reportMissingImports]
     try:
         img = Image.open(path).convert("RGB")
         return imagehash.phash(img)
@@ -66,76 +268,55 @@ def get_default_paths():
     videos = os.path.join(base, "Videos")
     return save, photos, videos
 
+# -------------------------------
+# Configuration : raccourcis vers config.ConfigStore (import différé, config importe utils)
+# -------------------------------
 def ensure_config_exists():
     """
     Crée config.json avec les valeurs par défaut si le fichier est absent.
     """
     if not os.path.isfile(CONFIG_FILE):
-        os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-        save, photos, videos = get_default_paths()
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump({
-                "save": save,
-                "photos": photos,
-                "videos": videos
-            }, f, indent=4, ensure_ascii=False)
+        from config import get_store
+        get_store().save()
 
 def load_paths():
     """
-    Tente de charger les chemins depuis config.json (externe).
-    Si le fichier est manquant, mal formé, incomplet ou contient des chemins
-    Windows (ex: C:\\), retourne les valeurs par défaut Linux.
+    Chemins (save, photos, videos) de la configuration. Si le fichier est manquant, mal formé,
+    incomplet ou contient des chemins Windows (ex: C:\\), retourne les valeurs par défaut Linux.
     """
-    try:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            save, photos, videos = (
-                data.get("save"),
-                data.get("photos"),
-                data.get("videos"),
-            )
-            if all(isinstance(p, str) and p and p.startswith("/")
-                   for p in (save, photos, videos)):
-                return save, photos, videos
-    except Exception:
-        pass  # Silencieux, fallback automatique
-
-    return get_default_paths()
+    from config import get_config
+    paths = get_config().paths
+    return paths.save, paths.photos, paths.videos
 
 def save_paths(save, photos, videos):
-    """
-    Sauvegarde les chemins dans config.json (externe), en préservant les autres clés (ex: backup).
-    """
-    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-    try:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
-        data = {}
-    data.update({"save": save, "photos": photos, "videos": videos})
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    """Sauvegarde les chemins dans config.json (écriture atomique, autres sections préservées)."""
+    from config import update
+    update("paths", save=save, photos=photos, videos=videos)
 
 def load_backup_path() -> str:
-    """Lit le chemin de backup depuis config.json (externe)."""
-    try:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            path = data.get("backup", "")
-            if isinstance(path, str) and path.startswith("/"):
-                return path
-    except Exception:
-        pass
-    return ""
+    """Chemin de backup de la configuration ("" si absent ou invalide)."""
+    from config import get_config
+    return get_config().backup.path
+
+def load_update_interval() -> float:
+    """Intervalle minimal de vérification des mises à jour (secondes)."""
+    from config import get_config
+    return get_config().cache.update_check_interval
 
 def save_backup_path(backup: str):
     """Sauvegarde uniquement le chemin de backup dans config.json, en préservant les autres clés."""
-    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-    try:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
-        data = {}
-    data["backup"] = backup
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
\ No newline at end of file
+    from config import update
+    update("backup", path=backup)
+
+def log_code(line):
+    """Extrait le code d'une ligne de log ('[ERREUR] ...' -> 'ERREUR'), ou '' s'il n'y en a pas."""
+    if line.startswith("["):
+        end = line.find("]")
+        if end > 1:
+            return line[1:end]
+    return ""
+
+class CancelFlag:
+    """Drapeau d'annulation partagé entre l'appelant (interface, CLI) et les moteurs."""
+    def __init__(self):
+        self.cancelled = False
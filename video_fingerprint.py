@@ -0,0 +1,239 @@
+"""
+Empreinte perceptuelle des vidéos : pHash de quelques images prises à des positions
+relatives fixes (POSITIONS), extraites par le binaire ffmpeg local s'il est présent.
+
+Chaque image coûte un appel ffmpeg qui saute (-ss avant -i) à l'image clé précédant la position,
+décode au plus un GOP jusqu'à elle et ne sort qu'une image en 32x32 niveaux de gris. Le coût dépend
+donc du nombre d'images échantillonnées et non de la taille du fichier. Viser l'instant exact plutôt
+que l'image clé rend l'empreinte indépendante de l'espacement des images clés, que les
+ré-encodages (messageries) changent presque toujours.
+Les empreintes sont gardées dans le cache de condensats (clé disque/inode, validée par
+taille + mtime) ; fingerprint_many() calcule les manquantes dans un pool de processus.
+Deux vidéos sont quasi identiques si leurs durées diffèrent d'au plus DURATION_TOLERANCE et si au
+moins MIN_MATCHING_FRAMES de leurs images, comparées position par position, sont à une distance de
+Hamming <= FRAME_DISTANCE (VideoIndex, même index que pour les photos). Comparer l'image i à
+n'importe quelle image de l'autre vidéo rapprochait deux vidéos distinctes ouvertes par le même
+fondu au noir.
+"""
+import os
+import re
+import shutil
+import subprocess
+from hamming import HammingIndex
+from utils import get_hash_service
+
+FFMPEG_ENV = "MEMOREASE_FFMPEG"
+FFMPEG_TIMEOUT = 30
+
+POSITIONS = (0.1, 0.3, 0.5, 0.7, 0.9)
+FRAME_SIZE = 32
+FRAME_DISTANCE = 8
+MIN_MATCHING_FRAMES = 3
+# Écart relatif de durée toléré entre une vidéo et sa copie ré-encodée
+DURATION_TOLERANCE = 0.02
+# Images presque unies (fondu au noir, écran blanc) : aucun pouvoir discriminant
+MIN_FRAME_STDDEV = 6.0
+
+# Entrée du cache de condensats (à changer si le calcul de l'empreinte change)
+CACHE_ALGO = "vphash2"
+CACHE_FAILED = "-"
+
+DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+
+
+def ffmpeg_path():
+    """Binaire ffmpeg : variable MEMOREASE_FFMPEG, sinon celui du PATH, sinon None."""
+    path = os.environ.get(FFMPEG_ENV)
+    if path and os.path.isfile(path):
+        return path
+    return shutil.which("ffmpeg")
+
+
+def available():
+    return ffmpeg_path() is not None
+
+
+def _duration(ffmpeg, path):
+    """Durée en secondes lue dans l'en-tête (ffmpeg -i), ou None."""
+    try:
+        result = subprocess.run([ffmpeg, "-nostdin", "-hide_banner", "-i", path],
+                                capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    m = DURATION_PATTERN.search(result.stderr)
+    if not m:
+        return None
+    hours, minutes, seconds = m.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _grab_frame(ffmpeg, path, t):
+    """Image à t secondes, en FRAME_SIZE x FRAME_SIZE niveaux de gris (octets bruts), ou None."""
+    cmd = [
+        ffmpeg, "-nostdin", "-v", "error",
+        "-ss", f"{t:.3f}", "-i", path,
+        "-frames:v", "1", "-an", "-sn",
+        "-vf", f"scale={FRAME_SIZE}:{FRAME_SIZE}", "-pix_fmt", "gray", "-f", "rawvideo", "-",
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    data = result.stdout
+    return data if len(data) == FRAME_SIZE * FRAME_SIZE else None
+
+
+def compute(path, ffmpeg=None):
+    """
+    Empreinte d'une vidéo : (durée en secondes, tuple d'un pHash (entier 64 bits) par position,
+    None pour une image absente ou unie). Retourne None si la vidéo est illisible.
+    Exécutée dans le pool de processus.
+    """
+    import imagehash                            # pyright: ignore[reportMissingImports]
+    from PIL import Image, ImageStat            # pyright: ignore[reportMissingImports]
+
+    ffmpeg = ffmpeg or ffmpeg_path()
+    duration = _duration(ffmpeg, path) if ffmpeg else None
+    if not duration:
+        return None
+    hashes = []
+    for position in POSITIONS:
+        data = _grab_frame(ffmpeg, path, duration * position)
+        if data is None:
+            hashes.append(None)
+            continue
+        img = Image.frombytes("L", (FRAME_SIZE, FRAME_SIZE), data)
+        if ImageStat.Stat(img).stddev[0] < MIN_FRAME_STDDEV:
+            hashes.append(None)
+        else:
+            hashes.append(int(str(imagehash.phash(img)), 16))
+    if all(h is None for h in hashes):
+        return None
+    return duration, tuple(hashes)
+
+
+def _encode(fingerprint):
+    if fingerprint is None:
+        return CACHE_FAILED
+    duration, hashes = fingerprint
+    return f"{duration:.3f};" + ",".join("" if h is None else f"{h:016x}" for h in hashes)
+
+def _decode(text):
+    if text == CACHE_FAILED:
+        return None
+    duration, hashes = text.split(";")
+    return float(duration), tuple(int(h, 16) if h else None for h in hashes.split(","))
+
+
+def _cached(cache, path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    text = cache.get(st, CACHE_ALGO)
+    return st, text
+
+
+def cached(path):
+    """Empreinte de path si elle est déjà dans le cache (aucun calcul), sinon None."""
+    _, text = _cached(get_hash_service().cache, path)
+    return _decode(text) if text else None
+
+
+def fingerprint(path):
+    """Empreinte de path (cache d'abord, calcul dans le processus courant sinon)."""
+    cache = get_hash_service().cache
+    st, text = _cached(cache, path)
+    if st is None:
+        return None
+    if text is not None:
+        return _decode(text)
+    result = compute(path)
+    cache.put(path, st, CACHE_ALGO, _encode(result))
+    return result
+
+
+def fingerprint_many(paths, workers=None):
+    """
+    {chemin: empreinte} pour une liste de vidéos. Les empreintes absentes du cache sont calculées
+    en parallèle dans un pool de processus (pHash et décodage hors du GIL de l'interface).
+    """
+    cache = get_hash_service().cache
+    results = {}
+    missing = []
+    for path in paths:
+        st, text = _cached(cache, path)
+        if st is None:
+            results[path] = None
+        elif text is not None:
+            results[path] = _decode(text)
+        else:
+            missing.append((path, st))
+    if not missing:
+        return results
+
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        results.update((path, None) for path, _ in missing)
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or min(len(missing), os.cpu_count() or 1)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            computed = list(pool.map(compute, [p for p, _ in missing], [ffmpeg] * len(missing)))
+    except (OSError, RuntimeError) as e:
+        # Pool de processus indisponible (environnement restreint) : calcul séquentiel
+        print(f"[ERREUR] Pool de processus indisponible ({e}), empreintes calculées une à une.")
+        computed = [compute(p, ffmpeg) for p, _ in missing]
+    for (path, st), result in zip(missing, computed):
+        cache.put(path, st, CACHE_ALGO, _encode(result))
+        results[path] = result
+    return results
+
+
+class VideoIndex:
+    """
+    Vidéos déjà vues : empreinte par clé et un HammingIndex (FRAME_DISTANCE) par position,
+    pour que l'image i ne soit comparée qu'aux images i des autres vidéos.
+    """
+
+    def __init__(self):
+        self._fingerprints = {}
+        self._indexes = [HammingIndex(FRAME_DISTANCE) for _ in POSITIONS]
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def add(self, key, fingerprint):
+        if fingerprint is None:
+            return
+        self._fingerprints[key] = fingerprint
+        for index, h in zip(self._indexes, fingerprint[1]):
+            if h is not None:
+                index.add(key, h)
+
+    def match(self, fingerprint):
+        """
+        Clé de la vidéo de durée voisine (DURATION_TOLERANCE) ayant le plus d'images proches à la même
+        position, s'il y en a au moins MIN_MATCHING_FRAMES, sinon None.
+        """
+        if fingerprint is None:
+            return None
+        duration, hashes = fingerprint
+        if sum(h is not None for h in hashes) < MIN_MATCHING_FRAMES:
+            return None
+        matched = {}
+        for index, h in zip(self._indexes, hashes):
+            if h is None:
+                continue
+            for key, _ in index.query(h):
+                matched[key] = matched.get(key, 0) + 1
+        best = None
+        for key, count in matched.items():
+            other = self._fingerprints[key][0]
+            if count < MIN_MATCHING_FRAMES or abs(duration - other) > DURATION_TOLERANCE * max(duration, other):
+                continue
+            if best is None or count > best[1]:
+                best = (key, count)
+        return best[0] if best else None
@@ -0,0 +1,308 @@
+"""
+Mode surveillance : tri incrémental du dossier de téléchargement, en service de longue durée.
+
+    python -m memorease watch
+
+- inotify sur save_path (IN_CLOSE_WRITE, IN_MOVED_TO) : un fichier est pris une fois fermé après
+  écriture (ou déplacé dans le dossier) et que plus rien ne l'a touché depuis `debounce` secondes.
+  Sans inotify, le dossier est relevé toutes les POLL_INTERVAL secondes et un fichier est pris
+  quand son mtime date d'au moins `debounce` secondes.
+- Les fichiers prêts passent par une file bornée (queue_size) vers `workers` threads. L'analyse
+  coûteuse (condensat, hachés photo, empreinte vidéo) se fait en parallèle et remplit les caches.
+  La décision (doublon ou non) et l'archivage restent séquentiels, sous un verrou, pour que deux
+  copies arrivées ensemble ne se manquent pas.
+- L'état de dédoublonnage est persistant : au démarrage, les photos et vidéos déjà archivées sont
+  reprises du catalogue (pHash, date de prise de vue, condensat) et des caches de hachés. Une
+  arrivée est donc comparée à toute la bibliothèque, pas seulement aux fichiers du même lot.
+Les fichiers déjà présents dans save_path au démarrage sont traités comme des arrivées.
+Le service tient aussi le journal des changements des dossiers triés (journal.py, si activé) :
+un backup lancé pendant qu'il tourne ne traite que les chemins notés.
+"""
+import os
+import time
+import queue
+import threading
+from datetime import datetime
+from inotify_tools import (
+    Inotify, available as inotify_available,
+    IN_CLOSE_WRITE, IN_MOVED_TO, IN_MOVED_FROM, IN_CREATE, IN_MODIFY, IN_DELETE,
+    IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW, IN_ISDIR,
+)
+from sort_tools import format_log, sort_single_file
+from media_formats import PHOTO_EXTS, VIDEO_EXTS
+from dedup import SeenPhotos, PhotoHashes, cached_hashes, prefetch_hashes
+from catalog import PHOTO, VIDEO, get_catalog
+from config import get_config
+from journal import JournalWatcher
+from metrics import NULL_METRICS
+from utils import get_hash_service
+import video_fingerprint
+
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_MODIFY | IN_DELETE
+               | IN_DELETE_SELF | IN_MOVE_SELF)
+
+# Attente maximale entre deux passages de la boucle (annulation, debounce, relevé sans inotify)
+POLL_INTERVAL = 1.0
+
+# Sentinelle de fin de file
+_DONE = object()
+
+
+def _is_media(name):
+    return not name.startswith(".") and os.path.splitext(name)[1].lower() in PHOTO_EXTS | VIDEO_EXTS
+
+
+def _interval(captured):
+    """Intervalle de prise de vue (secondes) d'une date ISO du catalogue, ou None."""
+    try:
+        t = datetime.fromisoformat(captured).timestamp()
+        return t, t
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+class FolderWatcher:
+    """
+    Surveille save_path et trie chaque fichier arrivé. run() bloque jusqu'à cancel_flag.cancelled.
+    debounce, queue_size et workers : None = valeurs de config.json (section watch).
+    progress_callback(triés, triés + en attente) est appelé après chaque fichier.
+    """
+
+    def __init__(self, save_path, photos_path, videos_path, log_callback, cancel_flag,
+                 check_duplicates=True, debounce=None, queue_size=None, workers=None,
+                 progress_callback=None, metrics=NULL_METRICS):
+        config = get_config().watch
+        self.save_path = save_path
+        self.photos_path = photos_path
+        self.videos_path = videos_path
+        self.log_callback = log_callback
+        self.cancel_flag = cancel_flag
+        self.check_duplicates = check_duplicates
+        self.debounce = config.debounce if debounce is None else debounce
+        self.workers = config.workers if workers is None else workers
+        self.progress_callback = progress_callback
+        self.metrics = metrics
+        self.sorted = 0
+
+        self._queue = queue.Queue(maxsize=config.queue_size if queue_size is None else queue_size)
+        self._pending = {}          # nom -> (instant du dernier événement, fichier fermé)
+        self._in_flight = set()     # noms en file ou en cours de traitement
+        self._done = {}             # nom -> (taille, mtime_ns) des fichiers traités restés dans save_path
+        self._renames = {}          # cookie inotify -> nom en cours de traitement renommé par le tri
+        self._aliases = {}          # nom en cours de traitement -> nom normalisé
+        self._lock = threading.Lock()
+        self._sort_lock = threading.Lock()
+
+        self.seen_images = SeenPhotos(get_config().dedup.time_window)
+        self.seen_videos = {}
+        self.video_index = None
+        if check_duplicates and video_fingerprint.available():
+            self.video_index = video_fingerprint.VideoIndex()
+
+    # --- État de dédoublonnage ---
+    def _seed(self):
+        """Reprend les médias déjà archivés (catalogue + caches de hachés) comme fichiers déjà vus."""
+        catalog = get_catalog()
+        algo = get_hash_service().algo
+        photos = videos = 0
+        for row in catalog.files_under(self.photos_path, PHOTO):
+            photo = cached_hashes(row["path"])
+            if photo is None and row["phash"] and os.path.exists(row["path"]):
+                photo = PhotoHashes(None, int(row["phash"], 16), None)
+            if photo is not None:
+                self.seen_images.add(row["path"], photo, _interval(row["captured"]))
+                photos += 1
+        for row in catalog.files_under(self.videos_path, VIDEO):
+            if not os.path.exists(row["path"]):
+                continue
+            if row["digest"] and row["digest_algo"] == algo:
+                self.seen_videos[row["path"]] = row["digest"]
+                videos += 1
+            if self.video_index is not None:
+                self.video_index.add(row["path"], video_fingerprint.cached(row["path"]))
+        self.log_callback(format_log("INFO", "État de dédoublonnage repris du catalogue",
+                                     f"{photos} photo(s), {videos} vidéo(s)"))
+
+    # --- Détection des fichiers prêts ---
+    def _scan(self):
+        """Relevé complet du dossier (démarrage, débordement inotify, mode sans inotify)."""
+        now = time.monotonic()
+        try:
+            names = [e.name for e in os.scandir(self.save_path) if e.is_file(follow_symlinks=False)]
+        except OSError as e:
+            self.log_callback(format_log("ERREUR", "Lecture impossible", f"{self.save_path} ({e})"))
+            return
+        for name in names:
+            if _is_media(name) and name not in self._pending:
+                self._pending[name] = (now - self.debounce, True)
+
+    def _on_event(self, mask, cookie, name):
+        if not name or mask & IN_ISDIR:
+            return
+        # Renommage fait par le tri lui-même (normalisation du nom) : le fichier est déjà pris en charge
+        if mask & IN_MOVED_FROM:
+            with self._lock:
+                if name in self._in_flight:
+                    self._renames[cookie] = name
+        elif mask & IN_MOVED_TO and cookie in self._renames:
+            old = self._renames.pop(cookie)
+            with self._lock:
+                if old in self._in_flight:
+                    self._aliases[old] = name
+                    self._in_flight.add(name)
+                    return
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self._pending.pop(name, None)
+            self._done.pop(name, None)
+        elif _is_media(name):
+            # IN_CREATE / IN_MODIFY : écriture en cours, le fichier attend sa fermeture
+            self._pending[name] = (time.monotonic(), bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO)))
+
+    def _dispatch(self):
+        """Met en file les fichiers fermés et stables depuis debounce secondes (tant que la file a de la place)."""
+        now = time.monotonic()
+        for name, (t, closed) in list(self._pending.items()):
+            if not closed or now - t < self.debounce:
+                continue
+            with self._lock:
+                if name in self._in_flight:
+                    continue
+            path = os.path.join(self.save_path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._pending.pop(name)
+                continue
+            # Sans inotify, seul le mtime indique qu'une copie est terminée
+            if time.time() - st.st_mtime < self.debounce:
+                continue
+            signature = (st.st_size, st.st_mtime_ns)
+            if self._done.get(name) == signature:
+                self._pending.pop(name)
+                continue
+            try:
+                self._queue.put_nowait((name, signature))
+            except queue.Full:
+                return              # file pleine : les fichiers restent en attente jusqu'au prochain passage
+            with self._lock:
+                self._in_flight.add(name)
+            self._pending.pop(name)
+
+    # --- Analyse et tri ---
+    def _analyse(self, path):
+        """Partie parallélisable : remplit les caches que le tri consultera ensuite."""
+        ext = os.path.splitext(path)[1].lower()
+        try:
+            if ext in PHOTO_EXTS:
+                with self.metrics.timer("phash", files=1):
+                    prefetch_hashes(path)
+            elif ext in VIDEO_EXTS:
+                with self.metrics.timer("hash", files=1, nbytes=os.path.getsize(path)):
+                    get_hash_service().digest(path)
+                if self.video_index is not None:
+                    with self.metrics.timer("fingerprint", files=1):
+                        video_fingerprint.fingerprint(path)
+        except Exception:
+            pass                    # le tri reprendra le calcul et journalisera l'erreur
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                break
+            name, signature = item
+            path = os.path.join(self.save_path, name)
+            try:
+                if self.check_duplicates and not self.cancel_flag.cancelled:
+                    self._analyse(path)
+                with self._sort_lock:
+                    if not self.cancel_flag.cancelled:
+                        sort_single_file(name, self.save_path, self.photos_path, self.videos_path,
+                                         self.log_callback, self.seen_images, self.seen_videos,
+                                         check_duplicates=self.check_duplicates, metrics=self.metrics,
+                                         video_index=self.video_index)
+                        self.metrics.count("fichiers")
+            except Exception as e:
+                self.log_callback(format_log("ERREUR", f"Tri impossible pour {name}", str(e)))
+            finally:
+                with self._lock:
+                    self._in_flight.discard(name)
+                    final = self._aliases.pop(name, None) or name
+                    self._in_flight.discard(final)
+                    # Fichier resté dans save_path (échec du déplacement) : pas de nouveau passage
+                    if os.path.exists(os.path.join(self.save_path, final)):
+                        self._done[final] = signature
+                    self.sorted += 1
+                    waiting = len(self._in_flight)
+                if waiting == 0:
+                    get_hash_service().flush()
+                    get_catalog().flush()
+                if self.progress_callback:
+                    self.progress_callback(self.sorted, self.sorted + waiting)
+
+    # --- Boucle principale ---
+    def _watch(self, notifier):
+        if notifier is None:
+            return False
+        try:
+            notifier.add_watch(self.save_path, _WATCH_MASK)
+            return True
+        except OSError:
+            return False
+
+    def run(self):
+        if not os.path.isdir(self.save_path):
+            self.log_callback(format_log("ERREUR", "Dossier de sauvegarde introuvable", self.save_path))
+            return
+        os.makedirs(os.path.join(self.save_path, "Erreur_tri"), exist_ok=True)
+        journal_watcher = None
+        if get_config().journal.enabled:
+            journal_watcher = JournalWatcher([self.photos_path, self.videos_path], log_callback=self.log_callback)
+            journal_watcher.start()
+        if self.check_duplicates:
+            self._seed()
+
+        notifier = None
+        if inotify_available():
+            try:
+                notifier = Inotify()
+            except OSError:
+                notifier = None
+        # Le watch est posé avant le premier relevé pour ne manquer aucune arrivée
+        watched = self._watch(notifier)
+        mode = "inotify" if watched else f"relevé toutes les {POLL_INTERVAL:g} s"
+        self.log_callback(format_log("INFO", f"Surveillance de {self.save_path}", mode))
+        self._scan()
+
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while not self.cancel_flag.cancelled:
+                if watched:
+                    for _, mask, cookie, name in notifier.read_events(timeout=POLL_INTERVAL):
+                        if mask & IN_Q_OVERFLOW:
+                            self._scan()
+                        elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                            watched = False
+                        else:
+                            self._on_event(mask, cookie, name)
+                    # Les deux moitiés d'un renommage arrivent ensemble : cookies sans suite (archivage) oubliés
+                    self._renames.clear()
+                else:
+                    time.sleep(POLL_INTERVAL)
+                    watched = os.path.isdir(self.save_path) and self._watch(notifier)
+                    self._scan()
+                self._dispatch()
+        finally:
+            for _ in threads:
+                self._queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+            if notifier:
+                notifier.close()
+            if journal_watcher:
+                journal_watcher.stop(wait=True)
+            get_hash_service().flush()
+            get_catalog().flush()
+        self.log_callback(format_log("STOP", "Surveillance arrêtée", f"{self.sorted} fichier(s) traité(s)"))